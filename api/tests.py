@@ -1,3 +1,34 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from sgb.models import Libro
 
-# Create your tests here.
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PronosticoDisponibilidadTests(TestCase):
+    """
+    - /api/pronostico/ (GET y POST)
+    """
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('lector', password='clave-segura-123'))
+        self.libros = [Libro.objects.create(titulo=f'Libro {i}', autor='Autor') for i in range(3)]
+
+    def test_resultados_en_el_orden_pedido(self):
+        ids = [self.libros[2].id, self.libros[0].id, 9999, self.libros[1].id]
+        respuesta = self.client.post('/api/pronostico/', {'libros': ids}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([r['libro_id'] for r in respuesta.json()['resultados']], [ids[0], ids[1], ids[3]])
+
+        respuesta = self.client.get('/api/pronostico/', {'libros': ','.join(map(str, ids))})
+        self.assertEqual([r['libro_id'] for r in respuesta.json()['resultados']], [ids[0], ids[1], ids[3]])
+
+    def test_cuerpo_que_no_es_objeto(self):
+        respuesta = self.client.post('/api/pronostico/', [self.libros[0].id], content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_sin_libros(self):
+        self.assertEqual(self.client.get('/api/pronostico/').status_code, 400)
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/pronostico/', {'libros': '1'}).status_code, 403)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # Pronóstico de disponibilidad
+    path('pronostico/', views.pronostico_disponibilidad, name='api_pronostico'),
+    path('vencimientos/', views.vencimientos, name='api_vencimientos'),
+]
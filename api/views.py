@@ -1,3 +1,67 @@
-from django.shortcuts import render
+from datetime import date, timedelta
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from sgb.models import Libro
+from sgb.operaciones_masivas import parsear_ids_en_orden
+from sgb.pronostico import MAXIMO_LIBROS_LOTE, pronosticar_libros, vencimientos_por_genero
+from sgb.sucursales import sucursal_del_usuario
 
-# Create your views here.
+# Días máximos que puede abarcar una consulta de vencimientos
+MAXIMO_DIAS_RANGO = 366
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def pronostico_disponibilidad(request):
+    """
+    ¿Cuándo estará disponible este título?
+    - GET  /api/pronostico/?libros=1,2,3
+    - POST /api/pronostico/ con {"libros": [1, 2, 3]} (para lotes grandes)
+    Responde un pronóstico por libro, en el orden pedido; los IDs inexistentes se omiten
+    """
+    if request.method == 'POST':
+        if not isinstance(request.data, dict):
+            return Response({'error': 'El cuerpo debe ser un objeto JSON: {"libros": [...]}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        valores = request.data.get('libros', [])
+    else:
+        valores = request.query_params.getlist('libros')
+    if not isinstance(valores, list):
+        valores = [valores]
+    libro_ids = parsear_ids_en_orden(valores)
+    if not libro_ids:
+        return Response({'error': 'Indica al menos un ID de libro en "libros"'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(libro_ids) > MAXIMO_LIBROS_LOTE:
+        return Response({'error': f'Máximo {MAXIMO_LIBROS_LOTE} libros por consulta'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    pronosticos = pronosticar_libros(libro_ids, sucursal_del_usuario(request.user))
+    return Response({'resultados': [pronosticos[libro_id] for libro_id in libro_ids if libro_id in pronosticos]})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def vencimientos(request):
+    """
+    ¿Cuántas copias (de un género) vuelven en un rango de fechas?
+    GET /api/vencimientos/?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&genero=ficcion
+    Por defecto: los próximos 7 días (hoy incluido)
+    """
+    hoy = timezone.now().date()
+    try:
+        desde = date.fromisoformat(request.query_params.get('desde') or hoy.isoformat())
+        hasta = date.fromisoformat(request.query_params.get('hasta') or (desde + timedelta(days=6)).isoformat())
+    except ValueError:
+        return Response({'error': 'Las fechas deben tener el formato AAAA-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if hasta < desde or (hasta - desde).days >= MAXIMO_DIAS_RANGO:
+        return Response({'error': f'El rango debe ser válido y de hasta {MAXIMO_DIAS_RANGO} días'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    genero = request.query_params.get('genero') or None
+    if genero and genero not in dict(Libro.GENEROS):
+        return Response({'error': f'Género desconocido: {genero}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(vencimientos_por_genero(desde, hasta, genero=genero, sucursal_id=sucursal_del_usuario(request.user)))
@@ -0,0 +1,135 @@
+"""
+Benchmark: analítica de circulación desde las tablas de resumen vs. agregando Prestamo
+
+Crea una base SQLite temporal con préstamos repartidos en un año, consolida los días
+(sgb.analitica.consolidar_dias) y compara el tiempo de calcular_estadisticas() con
+NumPy, sin NumPy y el de las mismas series agregadas directamente con el ORM.
+
+Uso:
+    python benchmarks/bench_analitica.py [--libros 5000] [--prestamos 200000] [--dias 365] [--repeticiones 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca.settings')
+
+
+def configurar(directorio):
+    import django
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = str(Path(directorio) / 'bench.sqlite3')
+    django.setup()
+
+
+def poblar(cantidad_libros, cantidad_prestamos):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.utils import timezone
+    from sgb.models import Libro, Prestamo
+
+    call_command('migrate', verbosity=0)
+    usuario = User.objects.create_user('bench', password='bench')
+    generos = [codigo for codigo, _ in Libro.GENEROS]
+    Libro.objects.bulk_create(
+        [Libro(titulo=f'Libro {i}', autor=f'Autor {i % 500}', genero=generos[i % len(generos)])
+         for i in range(cantidad_libros)],
+        batch_size=2000,
+    )
+    libro_ids = list(Libro.objects.values_list('id', flat=True))
+
+    # Préstamos ya devueltos durante el último año (fecha_prestamo se fija después:
+    # es auto_now_add y bulk_create la sobrescribiría)
+    aleatorio = random.Random(1)
+    hoy = timezone.now().date()
+    prestamos = []
+    for _ in range(cantidad_prestamos):
+        fecha = hoy - timedelta(days=aleatorio.randint(30, 400))
+        esperada = fecha + timedelta(days=14)
+        real = fecha + timedelta(days=aleatorio.randint(1, 25))
+        prestamos.append(Prestamo(
+            usuario=usuario, libro_id=aleatorio.choice(libro_ids), fecha_devolucion_esperada=esperada,
+            fecha_devolucion_real=real, multa=Decimal(max(0, (real - esperada).days) * 500),
+        ))
+    Prestamo.objects.bulk_create(prestamos, batch_size=2000)
+    for prestamo, creado in zip(prestamos, Prestamo.objects.order_by('id').values_list('id', flat=True)):
+        prestamo.id = creado
+        prestamo.fecha_prestamo = prestamo.fecha_devolucion_esperada - timedelta(days=14)
+    Prestamo.objects.bulk_update(prestamos, ['fecha_prestamo'], batch_size=2000)
+
+
+def estadisticas_orm(dias):
+    # Las mismas series sin tablas de resumen: agrupar Prestamo en cada request
+    from django.db.models import Count, F, Q, Sum
+    from django.utils import timezone
+    from sgb.models import Prestamo
+
+    hasta = timezone.now().date() - timedelta(days=1)
+    desde = hasta - timedelta(days=dias - 1)
+    prestados = Prestamo.objects.filter(fecha_prestamo__range=(desde, hasta)).order_by()
+    devueltos = Prestamo.objects.filter(fecha_devolucion_real__range=(desde, hasta)).order_by()
+    list(prestados.values('fecha_prestamo', 'libro__genero').annotate(total=Count('id')))
+    list(devueltos.values('fecha_devolucion_real', 'libro__genero').annotate(
+        total=Count('id'),
+        atrasadas=Count('id', filter=Q(fecha_devolucion_real__gt=F('fecha_devolucion_esperada'))),
+        multas=Sum('multa'),
+    ))
+    list(prestados.values('libro_id').annotate(total=Count('id')).order_by('-total')[:10])
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def resumen(nombre, tiempos):
+    print(f'{nombre:<28} p50={statistics.median(tiempos):8.2f} ms  max={max(tiempos):8.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--libros', type=int, default=5000)
+    parser.add_argument('--prestamos', type=int, default=200000)
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(directorio)
+        import sgb.analitica as analitica
+
+        poblar(args.libros, args.prestamos)
+        print(f'Base de prueba: {args.libros} libros, {args.prestamos} préstamos')
+
+        inicio = time.perf_counter()
+        dias = analitica.consolidar_dias()
+        print(f'Consolidación inicial: {dias} día(s) en {time.perf_counter() - inicio:.2f} s')
+
+        inicio = time.perf_counter()
+        analitica.consolidar_dias()
+        print(f'Consolidación nocturna (sin días nuevos): {(time.perf_counter() - inicio) * 1000:.1f} ms')
+
+        if analitica.np is not None:
+            resumen('Resumen + NumPy', medir(lambda: analitica.calcular_estadisticas(args.dias), args.repeticiones))
+        numpy, analitica.np = analitica.np, None
+        try:
+            resumen('Resumen + Python puro', medir(lambda: analitica.calcular_estadisticas(args.dias), args.repeticiones))
+        finally:
+            analitica.np = numpy
+        resumen('Agregando Prestamo (ORM)', medir(lambda: estadisticas_orm(args.dias), args.repeticiones))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: tiempo de arranque por rol de proceso (SGB_ROL) y perfil de importaciones
+
+Lanza varias veces un proceso nuevo por rol, mide el tiempo hasta quedar listo para atender
+(aplicación WSGI cargada y URLconf importado; para batch, django.setup() y el registro de tareas)
+y resume la salida de 'python -X importtime' con los módulos que más tardan en importarse.
+
+Uso:
+    python benchmarks/bench_arranque.py [--repeticiones 5] [--roles web circulacion api batch] [--detalle 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+ARRANQUE_WEB = (
+    "from biblioteca.wsgi import application\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+ARRANQUE_BATCH = (
+    "import django\n"
+    "django.setup()\n"
+    "import tareas.registro\n"
+)
+ROLES = ['web', 'circulacion', 'api', 'batch']
+
+
+def arrancar(rol, importtime=False):
+    """
+    Ejecuta el arranque del rol en un proceso nuevo
+    Retorna (segundos, salida de importtime)
+    """
+    entorno = dict(os.environ, SGB_ROL=rol, DJANGO_SETTINGS_MODULE='biblioteca.settings')
+    comando = [sys.executable]
+    if importtime:
+        comando += ['-X', 'importtime']
+    comando += ['-c', ARRANQUE_BATCH if rol == 'batch' else ARRANQUE_WEB]
+
+    inicio = time.perf_counter()
+    resultado = subprocess.run(comando, cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True)
+    return time.perf_counter() - inicio, resultado.stderr
+
+
+def resumir_importtime(salida, limite):
+    """
+    Agrupa las líneas de -X importtime por paquete de primer nivel (tiempo propio, en ms)
+    """
+    por_paquete = {}
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, _, modulo = [parte.strip() for parte in linea[len('import time:'):].split('|')]
+        paquete = modulo.split('.')[0]
+        # Las apps de Django se separan para ver cuánto aporta cada una (admin, auth, ...)
+        if modulo.startswith('django.contrib.'):
+            paquete = '.'.join(modulo.split('.')[:3])
+        por_paquete[paquete] = por_paquete.get(paquete, 0) + int(propio) / 1000
+    return sorted(por_paquete.items(), key=lambda item: -item[1])[:limite]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--roles', nargs='+', default=ROLES, choices=ROLES)
+    parser.add_argument('--detalle', type=int, default=10,
+                        help='Paquetes a mostrar del perfil de importaciones (0 = no mostrar)')
+    args = parser.parse_args()
+
+    for rol in args.roles:
+        tiempos = [arrancar(rol)[0] for _ in range(args.repeticiones)]
+        print(f'{rol:<12} mediana={statistics.median(tiempos) * 1000:7.1f} ms  '
+              f'min={min(tiempos) * 1000:7.1f} ms  max={max(tiempos) * 1000:7.1f} ms')
+
+        if args.detalle:
+            _, salida = arrancar(rol, importtime=True)
+            for paquete, ms in resumir_importtime(salida, args.detalle):
+                print(f'    {ms:8.1f} ms  {paquete}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: impacto del respaldo en línea (backup_db) sobre la latencia de préstamos
+
+Crea una base SQLite temporal, la llena con datos de prueba y mide la latencia
+de préstamo + devolución (sgb.operaciones_masivas) primero sin respaldo y luego
+mientras un hilo ejecuta respaldos en línea de forma continua.
+
+Uso:
+    python benchmarks/bench_backup.py [--libros 20000] [--operaciones 300] [--paginas 256] [--pausa 0.005]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca.settings')
+
+
+def configurar(directorio):
+    import django
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = str(Path(directorio) / 'bench.sqlite3')
+    settings.RESPALDOS_DIR = Path(directorio) / 'respaldos'
+    django.setup()
+
+
+def poblar(cantidad_libros):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from sgb.models import Libro
+
+    call_command('migrate', verbosity=0)
+    usuario = User.objects.create_user('bench', password='bench')
+    Libro.objects.bulk_create(
+        [Libro(titulo=f'Libro {i} ' + 'x' * 150, autor=f'Autor {i % 500}') for i in range(cantidad_libros)],
+        batch_size=2000,
+    )
+    return usuario, list(Libro.objects.values_list('id', flat=True)[:1000])
+
+
+def medir(usuario, libro_ids, operaciones):
+    from sgb.operaciones_masivas import devolver_libros, prestar_libros
+
+    latencias = []
+    for i in range(operaciones):
+        libro_id = libro_ids[i % len(libro_ids)]
+        inicio = time.perf_counter()
+        prestar_libros(usuario, {libro_id}, 7)
+        devolver_libros(usuario, {libro_id})
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def resumen(nombre, latencias):
+    ordenadas = sorted(latencias)
+    p95 = ordenadas[int(len(ordenadas) * 0.95) - 1]
+    print(f'{nombre:<22} p50={statistics.median(ordenadas):7.2f} ms  '
+          f'p95={p95:7.2f} ms  max={ordenadas[-1]:7.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--libros', type=int, default=20000)
+    parser.add_argument('--operaciones', type=int, default=300)
+    parser.add_argument('--paginas', type=int, default=256)
+    parser.add_argument('--pausa', type=float, default=0.005)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(directorio)
+        from django.db import connections
+        from sgb.respaldos import crear_respaldo
+
+        usuario, libro_ids = poblar(args.libros)
+        tamano = os.path.getsize(Path(directorio) / 'bench.sqlite3') / 1024 / 1024
+        print(f'Base de prueba: {args.libros} libros, {tamano:.1f} MiB')
+
+        resumen('Sin respaldo', medir(usuario, libro_ids, args.operaciones))
+
+        detener = threading.Event()
+        duraciones = []
+
+        def respaldar():
+            while not detener.is_set():
+                resultado = crear_respaldo(paginas=args.paginas, pausa=args.pausa, conservar=1)
+                duraciones.append(resultado['duracion_copia'])
+            connections.close_all()
+
+        hilo = threading.Thread(target=respaldar)
+        hilo.start()
+        try:
+            latencias = medir(usuario, libro_ids, args.operaciones)
+        finally:
+            detener.set()
+            hilo.join()
+
+        resumen('Con respaldo en curso', latencias)
+        if duraciones:
+            print(f'Respaldos completados: {len(duraciones)} '
+                  f'(copia promedio {statistics.mean(duraciones) * 1000:.0f} ms)')
+
+
+if __name__ == '__main__':
+    main()
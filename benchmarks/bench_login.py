@@ -0,0 +1,95 @@
+"""
+Benchmark: rendimiento del login bajo una carga similar a un ataque de fuerza bruta
+
+Crea una base SQLite temporal con un usuario y envía intentos de login con contraseña
+incorrecta, primero sin limitador (límites muy altos) y luego con los límites configurados.
+Al final mide un login legítimo desde otra IP mientras el ataque está bloqueado.
+
+Uso:
+    python benchmarks/bench_login.py [--intentos 60] [--ips 3] [--iteraciones 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca.settings')
+
+
+def configurar(directorio, iteraciones):
+    import logging
+    import django
+    from django.conf import settings
+    # Cada 429 se registraría como advertencia de django.request
+    logging.disable(logging.WARNING)
+    settings.DATABASES['default']['NAME'] = str(Path(directorio) / 'bench.sqlite3')
+    settings.PASSWORD_ITERACIONES = iteraciones
+    settings.ALLOWED_HOSTS = ['testserver']
+    django.setup()
+
+
+def atacar(cliente, intentos, ips):
+    """
+    Envía 'intentos' logins fallidos repartidos entre 'ips' direcciones
+    Retorna (segundos totales, respuestas bloqueadas con 429)
+    """
+    bloqueados = 0
+    inicio = time.perf_counter()
+    for i in range(intentos):
+        respuesta = cliente.post(
+            '/login/',
+            {'username': 'lector', 'password': f'incorrecta-{i}'},
+            REMOTE_ADDR=f'10.0.0.{i % ips + 1}',
+        )
+        bloqueados += respuesta.status_code == 429
+    return time.perf_counter() - inicio, bloqueados
+
+
+def resumen(nombre, segundos, intentos, bloqueados):
+    print(f'{nombre:<16} {intentos / segundos:8.1f} intentos/s  '
+          f'{segundos / intentos * 1000:8.2f} ms/intento  bloqueados={bloqueados}/{intentos}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--intentos', type=int, default=60)
+    parser.add_argument('--ips', type=int, default=3)
+    parser.add_argument('--iteraciones', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(directorio, args.iteraciones)
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from django.core.management import call_command
+        from django.test import Client
+        from django.test.utils import override_settings
+
+        call_command('migrate', verbosity=0)
+        User.objects.create_user('lector', password='clave-correcta')
+        cliente = Client()
+        print(f'PBKDF2 con {args.iteraciones} iteraciones, {args.intentos} intentos desde {args.ips} IPs')
+
+        with override_settings(LOGIN_MAXIMO_FALLOS_USUARIO=10**9, LOGIN_MAXIMO_FALLOS_IP=10**9):
+            cache.clear()
+            segundos, bloqueados = atacar(cliente, args.intentos, args.ips)
+        resumen('Sin limitador', segundos, args.intentos, bloqueados)
+
+        cache.clear()
+        segundos, bloqueados = atacar(cliente, args.intentos, args.ips)
+        resumen('Con limitador', segundos, args.intentos, bloqueados)
+
+        # El usuario atacado queda bloqueado por nombre; otro usuario entra normalmente
+        User.objects.create_user('otro', password='clave-correcta')
+        inicio = time.perf_counter()
+        respuesta = cliente.post('/login/', {'username': 'otro', 'password': 'clave-correcta'},
+                                 REMOTE_ADDR='10.0.1.1')
+        print(f'Login legítimo durante el ataque: HTTP {respuesta.status_code} '
+              f'en {(time.perf_counter() - inicio) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
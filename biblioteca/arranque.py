@@ -0,0 +1,92 @@
+"""
+Precalentamiento de procesos web antes de atender el primer request
+
+- precalentar(): carga el URLconf y las vistas (y los módulos que importan al usarse),
+  compila las plantillas del proyecto en el cargador con caché y deja el catálogo
+  (conteos de facetas) en la caché de páginas
+- preparar_para_fork(): para servidores con preload (gunicorn --preload); precalienta en
+  el proceso maestro, cierra las conexiones (no deben compartirse entre procesos) y
+  congela el GC para que los workers compartan la memoria sin copiarla
+- abrir_conexiones(): para el hook post_fork de cada worker
+
+Se activa con SGB_PRECALENTAR=1 (ver biblioteca/wsgi.py y asgi.py)
+Ejemplo de gunicorn.conf.py:
+    preload_app = True
+    def post_fork(server, worker):
+        from biblioteca.arranque import abrir_conexiones
+        abrir_conexiones()
+"""
+import gc
+import time
+from pathlib import Path
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.urls import get_resolver
+
+
+def abrir_conexiones():
+    """
+    Abre la conexión de cada base configurada (ejecuta los PRAGMA de init_command una vez)
+    Con CONN_MAX_AGE la conexión se reutiliza en los requests siguientes
+    """
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _plantillas_del_proyecto():
+    # Solo las plantillas del proyecto (las del admin se cargan si se usan)
+    for motor in engines.all():
+        for directorio in motor.template_dirs:
+            directorio = Path(directorio)
+            if not directorio.is_relative_to(settings.BASE_DIR):
+                continue
+            for ruta in directorio.rglob('*.html'):
+                yield motor, ruta.relative_to(directorio).as_posix()
+
+
+def precalentar():
+    """
+    Carga en memoria lo que el primer request tendría que cargar
+    Retorna un diccionario con los segundos de cada paso
+    """
+    tiempos = {}
+
+    inicio = time.perf_counter()
+    get_resolver().url_patterns  # importa urls.py de cada app y todas las vistas
+    tiempos['urls'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for motor, nombre in _plantillas_del_proyecto():
+        motor.get_template(nombre)
+    tiempos['plantillas'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    abrir_conexiones()
+    if apps.is_installed('sgb'):
+        # Recorre el catálogo una vez (la misma consulta de la búsqueda por facetas)
+        from sgb.facetas import calcular_facetas
+        from sgb.models import Libro
+        calcular_facetas(Libro.objects.all())
+    tiempos['base_datos'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    if apps.is_installed('sgb'):
+        # Módulos que las vistas importan recién al usarse (la analítica carga NumPy)
+        import sgb.analitica  # noqa: F401
+    tiempos['modulos'] = time.perf_counter() - inicio
+
+    return tiempos
+
+
+def preparar_para_fork():
+    """
+    Precalienta en el proceso maestro y lo deja listo para hacer fork de los workers
+    """
+    tiempos = precalentar()
+    connections.close_all()
+    # Los objetos creados hasta aquí no los recorre el GC: sus páginas de memoria
+    # no se tocan y quedan compartidas (copy-on-write) entre los workers
+    gc.freeze()
+    return tiempos
@@ -0,0 +1,59 @@
+"""
+Servidor de archivos estáticos para producción (cuando no hay un servidor web delante)
+
+Sirve los archivos de STATIC_ROOT generados por collectstatic:
+- Entrega la variante .br o .gz si el navegador la acepta
+- Los archivos con hash en el nombre se marcan como inmutables por un año
+- El resto se revalida con Last-Modified
+"""
+import mimetypes
+import os
+from functools import lru_cache
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'public, max-age=0, must-revalidate'
+CODIFICACIONES = [('br', '.br'), ('gzip', '.gz')]
+
+
+@lru_cache(maxsize=1)
+def _nombres_con_hash():
+    # El manifest de collectstatic no cambia mientras el proceso está vivo
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def servir_estatico(request, path):
+    try:
+        ruta = safe_join(settings.STATIC_ROOT, path)
+    except Exception:
+        raise Http404('Archivo no encontrado')
+    if not os.path.isfile(ruta):
+        raise Http404('Archivo no encontrado')
+
+    inmutable = path in _nombres_con_hash()
+    estado = os.stat(ruta)
+    if not inmutable and not was_modified_since(request.headers.get('If-Modified-Since'), estado.st_mtime):
+        return HttpResponseNotModified()
+
+    tipo, _ = mimetypes.guess_type(ruta)
+    aceptadas = request.headers.get('Accept-Encoding', '')
+    codificacion = None
+    ruta_servida = ruta
+    for nombre, extension in CODIFICACIONES:
+        if nombre in aceptadas and os.path.isfile(ruta + extension):
+            codificacion = nombre
+            ruta_servida = ruta + extension
+            break
+
+    response = FileResponse(open(ruta_servida, 'rb'), content_type=tipo or 'application/octet-stream')
+    if codificacion:
+        response.headers['Content-Encoding'] = codificacion
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Last-Modified'] = http_date(estado.st_mtime)
+    response.headers['Cache-Control'] = CACHE_INMUTABLE if inmutable else CACHE_REVALIDAR
+    return response
@@ -0,0 +1,289 @@
+"""
+Perfilado de requests en producción (cProfile o muestreo de pila + traza SQL)
+
+Dos formas de activarlo:
+- Un token firmado en el parámetro ?perfilar=<token> o el header X-Perfilar
+  (solo para usuarios staff; el token se genera con 'python manage.py perfiles --token')
+- Muestreo: 1 de cada PERFILADO_MUESTREO requests (0 = desactivado)
+
+Los perfiles se guardan en PERFILADO_DIR (un JSON por request, más el .prof de cProfile)
+y se conservan los PERFILADO_CONSERVAR más recientes
+Se ven y exportan (pstats / speedscope) con 'python manage.py perfiles'
+
+En los requests no perfilados el costo es un contador y dos búsquedas en diccionarios
+"""
+import cProfile
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+MODO_CPROFILE = 'cprofile'
+MODO_MUESTREO = 'muestreo'
+MODOS = (MODO_CPROFILE, MODO_MUESTREO)
+
+PARAMETRO = 'perfilar'
+HEADER = 'X-Perfilar'
+SALT = 'biblioteca.perfilado'
+
+
+# cProfile usa el hook de perfilado del intérprete y desde Python 3.12 solo puede haber
+# uno activo por proceso (un segundo enable() lanza ValueError): se perfila un request
+# a la vez con cProfile y los concurrentes pasan a muestreo
+_bloqueo_cprofile = threading.Lock()
+
+
+def directorio_perfiles():
+    return Path(getattr(settings, 'PERFILADO_DIR', settings.BASE_DIR / 'perfiles'))
+
+
+def crear_token(modo=MODO_CPROFILE):
+    """
+    Token firmado (con SECRET_KEY) que activa el perfilado de un request
+    Vence después de PERFILADO_TOKEN_VIGENCIA segundos
+    """
+    if modo not in MODOS:
+        raise ValueError(f'Modo de perfilado desconocido: {modo}')
+    return signing.TimestampSigner(salt=SALT).sign(modo)
+
+
+def leer_token(token):
+    """
+    Retorna el modo del token, o None si la firma no es válida o está vencida
+    """
+    try:
+        modo = signing.TimestampSigner(salt=SALT).unsign(token, max_age=settings.PERFILADO_TOKEN_VIGENCIA)
+    except signing.BadSignature:
+        return None
+    return modo if modo in MODOS else None
+
+
+class TrazaSQL:
+    """
+    Registra cada consulta del request (SQL, duración y cantidad de parámetros)
+    Se instala con connection.execute_wrapper() solo en los requests perfilados
+    """
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'parametros': len(params or ()),
+                'ms': round((time.perf_counter() - inicio) * 1000, 3),
+            })
+
+
+class MuestreadorPila:
+    """
+    Perfilador por muestreo: un hilo lee la pila del hilo del request cada 'intervalo'
+    segundos y cuenta las pilas repetidas (menor overhead que cProfile en vistas pesadas)
+    """
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._hilo_objetivo = threading.get_ident()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name='perfilado-muestreo', daemon=True)
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self._hilo_objetivo)
+            if self._detener.is_set():
+                # El request ya terminó (la pila sería la espera de este hilo)
+                break
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append((codigo.co_name, codigo.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            if pila:
+                # De la raíz a la función en ejecución
+                self.pilas[tuple(reversed(pila))] += 1
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+
+
+def guardar_perfil(datos, perfil=None):
+    """
+    Guarda el JSON del perfil (y el .prof si es cProfile) y aplica la rotación
+    Retorna el ID del perfil
+    """
+    directorio = directorio_perfiles()
+    directorio.mkdir(parents=True, exist_ok=True)
+    perfil_id = f"{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    datos['id'] = perfil_id
+
+    if perfil is not None:
+        perfil.dump_stats(directorio / f'{perfil_id}.prof')
+    with open(directorio / f'{perfil_id}.json', 'w') as salida:
+        json.dump(datos, salida)
+
+    rotar_perfiles(directorio)
+    return perfil_id
+
+
+def listar_perfiles(directorio=None):
+    directorio = directorio or directorio_perfiles()
+    return sorted(directorio.glob('*.json'))
+
+
+def cargar_perfil(perfil_id, directorio=None):
+    directorio = directorio or directorio_perfiles()
+    ruta = directorio / f'{perfil_id}.json'
+    if not ruta.exists():
+        raise FileNotFoundError(f'No existe el perfil {perfil_id}')
+    with open(ruta) as entrada:
+        return json.load(entrada)
+
+
+def rotar_perfiles(directorio=None):
+    """
+    Conserva solo los PERFILADO_CONSERVAR perfiles más recientes
+    """
+    directorio = directorio or directorio_perfiles()
+    antiguos = listar_perfiles(directorio)[:-settings.PERFILADO_CONSERVAR]
+    for ruta in antiguos:
+        ruta.unlink()
+        ruta.with_suffix('.prof').unlink(missing_ok=True)
+    return len(antiguos)
+
+
+def exportar_speedscope(datos):
+    """
+    Convierte un perfil por muestreo al formato de speedscope (https://www.speedscope.app)
+    """
+    frames, indices = [], {}
+    muestras, pesos = [], []
+    for *pila, cantidad in datos['pilas']:
+        muestra = []
+        for nombre, archivo, linea in pila:
+            clave = (nombre, archivo, linea)
+            if clave not in indices:
+                indices[clave] = len(frames)
+                frames.append({'name': nombre, 'file': archivo, 'line': linea})
+            muestra.append(indices[clave])
+        muestras.append(muestra)
+        pesos.append(cantidad * datos['intervalo_ms'])
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': f"{datos['metodo']} {datos['ruta']}",
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': sum(pesos),
+            'samples': muestras,
+            'weights': pesos,
+        }],
+        'name': datos['id'],
+        'exporter': 'biblioteca.perfilado',
+    }
+
+
+class PerfiladoMiddleware:
+    """
+    Perfila los requests activados por token (staff) o por muestreo
+    Debe ir después de AuthenticationMiddleware para validar is_staff
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADO_ACTIVO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.muestreo = settings.PERFILADO_MUESTREO
+        self.contador = itertools.count(1)
+
+    def _modo(self, request):
+        token = request.GET.get(PARAMETRO) or request.headers.get(HEADER)
+        if token:
+            modo = leer_token(token)
+            if modo and getattr(request.user, 'is_staff', False):
+                return modo, 'token'
+        if self.muestreo and next(self.contador) % self.muestreo == 0:
+            return settings.PERFILADO_MODO_MUESTREO, 'muestreo'
+        return None, None
+
+    def _iniciar_cprofile(self, pila):
+        """
+        Activa cProfile hasta que se cierre 'pila'
+        Retorna None si ya hay otro perfilador activo en el proceso
+        """
+        if not _bloqueo_cprofile.acquire(blocking=False):
+            return None
+        pila.callback(_bloqueo_cprofile.release)
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Otro perfilador ajeno al middleware (p. ej. un depurador) ocupa el hook
+            return None
+        pila.callback(perfil.disable)
+        return perfil
+
+    def __call__(self, request):
+        modo, origen = self._modo(request)
+        if modo is None:
+            return self.get_response(request)
+
+        traza = TrazaSQL()
+        perfil = muestreador = None
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(traza))
+            if modo == MODO_CPROFILE:
+                perfil = self._iniciar_cprofile(pila)
+                if perfil is None:
+                    modo = MODO_MUESTREO
+            if modo == MODO_MUESTREO:
+                muestreador = pila.enter_context(MuestreadorPila(settings.PERFILADO_INTERVALO_MS / 1000))
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        datos = {
+            'fecha': timezone.now().isoformat(),
+            'metodo': request.method,
+            'ruta': request.path,
+            'estado': response.status_code,
+            'usuario': getattr(request.user, 'username', '') or '',
+            'modo': modo,
+            'origen': origen,
+            'duracion_ms': round(duracion * 1000, 3),
+            'pid': os.getpid(),
+            'sql': traza.consultas,
+        }
+        if muestreador is not None:
+            datos['intervalo_ms'] = settings.PERFILADO_INTERVALO_MS
+            datos['pilas'] = [[*pila_, cantidad] for pila_, cantidad in muestreador.pilas.most_common()]
+
+        perfil_id = guardar_perfil(datos, perfil)
+        if origen == 'token':
+            response['X-Perfil-Id'] = perfil_id
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     'api',
     'sgb',
     'usuarios',
+    'tareas',
     
 ]
 
@@ -51,10 +53,36 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'biblioteca.perfilado.PerfiladoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Rol del proceso (variable de entorno SGB_ROL), para que los workers arranquen livianos
+# - web: sitio completo (por defecto)
+# - circulacion: vistas de préstamos y catálogo, sin admin ni API
+# - api: solo Django REST Framework (solo las URLs /api/), sin admin, mensajes ni estáticos
+# - batch: comandos y run_worker, sin URLs, apps ni middleware de requests
+# Las migraciones deben correrse con el rol web (incluye todas las apps)
+SGB_ROL = os.environ.get('SGB_ROL', 'web')
+
+APPS_OMITIDAS_POR_ROL = {
+    'web': set(),
+    'circulacion': {'django.contrib.admin', 'rest_framework', 'api'},
+    'api': {'django.contrib.admin', 'django.contrib.messages', 'django.contrib.staticfiles'},
+    'batch': {'django.contrib.admin', 'django.contrib.messages', 'django.contrib.staticfiles', 'rest_framework', 'api'},
+}
+MIDDLEWARE_OMITIDO_POR_ROL = {
+    'web': set(),
+    'circulacion': set(),
+    'api': {'django.contrib.messages.middleware.MessageMiddleware'},
+    'batch': set(MIDDLEWARE),
+}
+if SGB_ROL not in APPS_OMITIDAS_POR_ROL:
+    raise ValueError(f"SGB_ROL desconocido: {SGB_ROL!r}")
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in APPS_OMITIDAS_POR_ROL[SGB_ROL]]
+MIDDLEWARE = [m for m in MIDDLEWARE if m not in MIDDLEWARE_OMITIDO_POR_ROL[SGB_ROL]]
+
 ROOT_URLCONF = 'biblioteca.urls'
 
 TEMPLATES = [
@@ -82,6 +110,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL: las lecturas no se bloquean mientras otra sucursal escribe
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            # Tomar el lock de escritura al iniciar la transacción evita errores
+            # "database is locked" al promover una lectura a escritura
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Reutilizar la conexión entre requests (la precalentada al arrancar sigue viva)
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -104,6 +143,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Costo del hash de contraseñas: iteraciones de PBKDF2 (por defecto las de Django)
+# Subirlo hace más caro un ataque offline; bajarlo solo tiene sentido en tests/benchmarks
+PASSWORD_ITERACIONES = int(os.environ.get('SGB_PASSWORD_ITERACIONES', 1_000_000))
+
+PASSWORD_HASHERS = [
+    'usuarios.hashers.PBKDF2ConfigurablePasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Limitador de intentos de login (usuarios/acceso.py)
+# Fallos permitidos por nombre de usuario y por IP dentro de la ventana (segundos)
+LOGIN_MAXIMO_FALLOS_USUARIO = 5
+LOGIN_MAXIMO_FALLOS_IP = 50
+LOGIN_VENTANA = 15 * 60
+
+# Segundos que la analítica del panel queda en caché (se recalcula al cambiar el día)
+ANALITICA_CACHE_SEGUNDOS = 60 * 60
+
+# Caché usado por el limitador de login y la analítica del panel
+# LocMemCache es por proceso: con N workers cada uno lleva sus propios contadores de fallos
+# (el límite efectivo es N veces LOGIN_MAXIMO_FALLOS_*). Con varios procesos en producción
+# usar un caché compartido (Redis o Memcached)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'biblioteca',
+    }
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -124,6 +196,58 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / "biblioteca" / "static"
 ]
+# Destino de collectstatic: archivos con hash en el nombre y variantes .gz/.br
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # El manifest con hash solo existe después de collectstatic, por eso en
+        # desarrollo (y al correr los tests) se usa el almacenamiento simple
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'biblioteca.storage.EstaticosComprimidosStorage'
+        ),
+    },
+}
+
+# Ancho máximo (px) de las imágenes procesadas por collectstatic (requiere Pillow)
+ESTATICOS_ANCHO_MAXIMO_IMAGENES = 1600
+
+# Servir STATIC_ROOT desde Django con caché inmutable cuando no hay servidor web delante
+# (con DEBUG = True los sirve el runserver de django.contrib.staticfiles)
+SERVIR_ESTATICOS = not DEBUG
+
+# Correo electrónico (recordatorios de préstamos)
+# En desarrollo los correos se guardan como archivos en lugar de enviarse por SMTP
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = BASE_DIR / 'correos_enviados'
+DEFAULT_FROM_EMAIL = 'Biblioteca MJV <no-responder@biblioteca-mjv.cl>'
+
+# Respaldos en línea de la base de datos (python manage.py backup_db)
+RESPALDOS_DIR = BASE_DIR / 'respaldos'
+RESPALDOS_CONSERVAR = 7
+
+# Perfilado de requests (biblioteca/perfilado.py, python manage.py perfiles)
+PERFILADO_ACTIVO = True
+# Perfilar 1 de cada N requests (0 = solo con token firmado) y con qué modo
+PERFILADO_MUESTREO = 0
+PERFILADO_MODO_MUESTREO = 'muestreo'
+PERFILADO_INTERVALO_MS = 5
+PERFILADO_TOKEN_VIGENCIA = 60 * 60
+PERFILADO_DIR = BASE_DIR / 'perfiles'
+PERFILADO_CONSERVAR = 200
+
+# Tareas en segundo plano (python manage.py run_worker)
+# Segundos base del backoff exponencial entre reintentos y su máximo
+TAREAS_BACKOFF_BASE = 30
+TAREAS_BACKOFF_MAXIMO = 3600
+# Segundos tras los cuales una tarea 'en proceso' se considera huérfana
+TAREAS_TIEMPO_MAXIMO = 1800
+# Días que se conservan las tareas completadas antes de purgarlas
+TAREAS_DIAS_RETENCION = 7
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
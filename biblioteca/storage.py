@@ -0,0 +1,76 @@
+"""
+Almacenamiento de archivos estáticos para producción (python manage.py collectstatic)
+
+- Agrega un hash del contenido al nombre de cada archivo (ManifestStaticFilesStorage),
+  así pueden cachearse "para siempre" en el navegador
+- Reduce las imágenes demasiado grandes antes de calcular el hash (requiere Pillow)
+- Genera variantes .gz (y .br si está instalado brotli) de los archivos de texto
+"""
+import gzip
+import os
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan variantes .gz
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional: sin él las imágenes se copian tal cual
+    Image = None
+
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.map', '.eot', '.ttf')
+EXTENSIONES_IMAGENES = ('.jpg', '.jpeg', '.png')
+
+
+class EstaticosComprimidosStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for nombre in paths:
+                if nombre.lower().endswith(EXTENSIONES_IMAGENES):
+                    self._reducir_imagen(nombre)
+
+        for nombre, nombre_hash, procesado in super().post_process(paths, dry_run, **options):
+            if not dry_run and nombre_hash and not isinstance(procesado, Exception):
+                self._comprimir(nombre_hash)
+            yield nombre, nombre_hash, procesado
+
+    def _reducir_imagen(self, nombre):
+        """
+        Reduce (en STATIC_ROOT, no en el original) las imágenes más anchas que
+        ESTATICOS_ANCHO_MAXIMO_IMAGENES, antes de que se calcule su hash
+        """
+        ancho_maximo = getattr(settings, 'ESTATICOS_ANCHO_MAXIMO_IMAGENES', None)
+        if Image is None or not ancho_maximo:
+            return
+        ruta = self.path(nombre)
+        with Image.open(ruta) as imagen:
+            if imagen.width <= ancho_maximo:
+                return
+            alto = round(imagen.height * ancho_maximo / imagen.width)
+            reducida = imagen.resize((ancho_maximo, alto), Image.LANCZOS)
+            reducida.save(ruta, format=imagen.format, optimize=True)
+
+    def _comprimir(self, nombre):
+        """
+        Escribe nombre.gz y nombre.br junto al archivo con hash, solo si resultan más pequeños
+        """
+        if not nombre.lower().endswith(EXTENSIONES_COMPRIMIBLES):
+            return
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+
+        variantes = [('.gz', gzip.compress(contenido, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variantes.append(('.br', brotli.compress(contenido)))
+
+        for extension, comprimido in variantes:
+            if len(comprimido) < len(contenido):
+                with open(ruta + extension, 'wb') as archivo:
+                    archivo.write(comprimido)
+            elif os.path.exists(ruta + extension):
+                os.remove(ruta + extension)
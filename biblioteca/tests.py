@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from . import perfilado
+
+# Cada rol se decide al importar settings (SGB_ROL), por eso se prueba en un proceso aparte
+# con su propia base de prueba en memoria
+SCRIPT_ROL = '''
+import json
+import django
+from django.conf import settings
+django.setup()
+settings.DEBUG = False
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import get_resolver
+setup_test_environment()
+connection.creation.create_test_db(verbosity=0)
+get_resolver().url_patterns
+cliente = Client()
+print(json.dumps({
+    'login': cliente.post('/login/', {'username': 'nadie', 'password': 'x'}).status_code,
+    'disponibilidad': cliente.get('/disponibilidad/').status_code,
+    'api': cliente.get('/api/pronostico/', {'libros': '1'}).status_code,
+    'admin': cliente.get('/admin/login/').status_code,
+}))
+'''
+
+
+class RolesTests(SimpleTestCase):
+    """
+    - Cada rol (SGB_ROL) carga su URLconf y atiende solo sus URLs
+    """
+
+    def estados(self, rol):
+        entorno = {**os.environ, 'SGB_ROL': rol, 'DJANGO_SETTINGS_MODULE': 'biblioteca.settings'}
+        resultado = subprocess.run(
+            [sys.executable, '-c', SCRIPT_ROL], env=entorno, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(resultado.returncode, 0, resultado.stderr)
+        return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+    def test_web(self):
+        self.assertEqual(self.estados('web'), {'login': 200, 'disponibilidad': 302, 'api': 403, 'admin': 200})
+
+    def test_circulacion(self):
+        self.assertEqual(self.estados('circulacion'), {'login': 200, 'disponibilidad': 302, 'api': 404, 'admin': 404})
+
+    def test_api(self):
+        # Sin MessageMiddleware las páginas del sitio fallarían: solo se montan las URLs /api/
+        self.assertEqual(self.estados('api'), {'login': 404, 'disponibilidad': 404, 'api': 403, 'admin': 404})
+
+    def test_batch(self):
+        self.assertEqual(self.estados('batch'), {'login': 404, 'disponibilidad': 404, 'api': 404, 'admin': 404})
+
+
+class PerfiladoTests(TestCase):
+    """
+    - Activación por token y escritura de perfiles (perfilado.PerfiladoMiddleware)
+    - Exportación a speedscope (módulo y comando 'perfiles')
+    """
+
+    def setUp(self):
+        self.directorio = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directorio)
+        configuracion = override_settings(PERFILADO_DIR=self.directorio, PERFILADO_MUESTREO=0)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.staff = User.objects.create(username='staff', is_staff=True)
+
+    def perfilar(self, modo=perfilado.MODO_CPROFILE, usuario=None):
+        self.client.force_login(usuario or self.staff)
+        return self.client.get('/login/', {perfilado.PARAMETRO: perfilado.crear_token(modo)})
+
+    def archivos(self):
+        return sorted(ruta.suffix for ruta in self.directorio.iterdir())
+
+    def test_token_firmado(self):
+        token = perfilado.crear_token(perfilado.MODO_MUESTREO)
+        self.assertEqual(perfilado.leer_token(token), perfilado.MODO_MUESTREO)
+        self.assertIsNone(perfilado.leer_token(token + 'x'))
+        self.assertIsNone(perfilado.leer_token('cprofile'))
+        with override_settings(PERFILADO_TOKEN_VIGENCIA=-1):
+            self.assertIsNone(perfilado.leer_token(token))
+        with self.assertRaises(ValueError):
+            perfilado.crear_token('otro')
+
+    def test_solo_staff(self):
+        lector = User.objects.create(username='lector')
+        respuesta = self.perfilar(usuario=lector)
+        self.assertNotIn('X-Perfil-Id', respuesta)
+        self.assertEqual(self.archivos(), [])
+
+    def test_cprofile_guarda_json_y_prof(self):
+        respuesta = self.perfilar()
+        perfil_id = respuesta['X-Perfil-Id']
+        self.assertEqual(self.archivos(), ['.json', '.prof'])
+        datos = perfilado.cargar_perfil(perfil_id)
+        self.assertEqual((datos['modo'], datos['origen'], datos['usuario']), ('cprofile', 'token', 'staff'))
+        self.assertTrue(datos['sql'])
+
+    def test_cprofile_concurrente_pasa_a_muestreo(self):
+        # Otro request ya tiene cProfile activo en el proceso
+        with perfilado._bloqueo_cprofile:
+            respuesta = self.perfilar()
+        datos = perfilado.cargar_perfil(respuesta['X-Perfil-Id'])
+        self.assertEqual(datos['modo'], perfilado.MODO_MUESTREO)
+        self.assertEqual(self.archivos(), ['.json'])
+        self.assertTrue(perfilado._bloqueo_cprofile.acquire(blocking=False))
+        perfilado._bloqueo_cprofile.release()
+
+    def test_rotacion(self):
+        with override_settings(PERFILADO_CONSERVAR=2):
+            for _ in range(3):
+                self.perfilar()
+        self.assertEqual(self.archivos(), ['.json', '.json', '.prof', '.prof'])
+
+    def test_exportar_speedscope(self):
+        datos = {
+            'id': 'p1', 'metodo': 'GET', 'ruta': '/x/', 'intervalo_ms': 5,
+            'pilas': [[['main', 'a.py', 1], ['vista', 'b.py', 2], 3], [['main', 'a.py', 1], 1]],
+        }
+        exportado = perfilado.exportar_speedscope(datos)
+        self.assertEqual(exportado['shared']['frames'], [
+            {'name': 'main', 'file': 'a.py', 'line': 1}, {'name': 'vista', 'file': 'b.py', 'line': 2},
+        ])
+        perfil = exportado['profiles'][0]
+        self.assertEqual((perfil['samples'], perfil['weights'], perfil['endValue']), ([[0, 1], [0]], [15, 5], 20))
+
+    def test_comando_perfiles_exporta_muestreo(self):
+        perfil_id = self.perfilar(perfilado.MODO_MUESTREO)['X-Perfil-Id']
+        ruta = self.directorio / 'exportado.speedscope.json'
+        salida = StringIO()
+        call_command('perfiles', perfil_id, exportar=str(ruta), stdout=salida)
+        self.assertIn('speedscope', salida.getvalue())
+        with open(ruta) as entrada:
+            exportado = json.load(entrada)
+        self.assertEqual(exportado['name'], perfil_id)
+        self.assertEqual(exportado['profiles'][0]['type'], 'sampled')
+
+        salida = StringIO()
+        call_command('perfiles', token='muestreo', stdout=salida)
+        self.assertEqual(perfilado.leer_token(salida.getvalue().strip()), perfilado.MODO_MUESTREO)
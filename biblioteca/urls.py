@@ -14,11 +14,32 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+from django.apps import apps
+from django.conf import settings
+from django.urls import path, include, re_path
+from biblioteca.estaticos import servir_estatico
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('', include('sgb.urls')), # Home + Dashboard
-    path('', include('usuarios.urls')), # Login
-]
+# Páginas del sitio: sus vistas usan messages, que el rol api no carga,
+# y el rol batch no atiende requests (ver SGB_ROL en settings)
+if settings.SGB_ROL in ('web', 'circulacion'):
+    urlpatterns = [
+        path('', include('sgb.urls')), # Home + Dashboard
+        path('', include('usuarios.urls')), # Login
+    ]
+else:
+    urlpatterns = []
+
+# API REST (no se carga en los roles circulacion y batch)
+if apps.is_installed('api'):
+    urlpatterns += [path('api/', include('api.urls'))]
+
+# El admin no se carga en los roles de worker (ver SGB_ROL en settings)
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns = [path('admin/', admin.site.urls)] + urlpatterns
+
+# Archivos estáticos con hash y caché inmutable (ver SERVIR_ESTATICOS en settings)
+if settings.SERVIR_ESTATICOS:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), servir_estatico),
+    ]
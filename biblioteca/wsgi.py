@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca.settings')
 
 application = get_wsgi_application()
+
+# Precalentar antes de atender requests (modo preload / fork, ver biblioteca/arranque.py)
+if os.environ.get('SGB_PRECALENTAR'):
+    from biblioteca.arranque import preparar_para_fork
+    preparar_para_fork()
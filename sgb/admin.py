@@ -1,12 +1,21 @@
 from django.contrib import admin
-from .models import Libro, Prestamo
+from django.db import transaction
+from .eventos import datos_libro, evento, registrar_eventos
+from .models import EventoCirculacion, Libro, Prestamo, Recordatorio, ResumenUsuario, Sucursal
+
+
+@admin.register(Sucursal)
+class SucursalAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'codigo', 'direccion')
+    search_fields = ('nombre', 'codigo')
+
 
 @admin.register(Libro)
 class LibroAdmin(admin.ModelAdmin):
     # Campos a mostrar en la lista
-    list_display = ('titulo', 'autor', 'genero', 'disponible')
+    list_display = ('titulo', 'autor', 'genero', 'sucursal', 'disponible')
     # Filtros laterales
-    list_filter = ('disponible', 'genero')
+    list_filter = ('disponible', 'genero', 'sucursal')
     # Barra de búsqueda
     search_fields = ('titulo', 'autor')
     # Campos editables directamente desde la lista
@@ -14,7 +23,34 @@ class LibroAdmin(admin.ModelAdmin):
     # Ordenar por título
     ordering = ('titulo',)
     # Campos a mostrar en el formulario
-    fields = ('titulo', 'autor', 'genero', 'disponible')
+    fields = ('titulo', 'autor', 'genero', 'sucursal', 'disponible')
+
+    # Los cambios hechos desde el admin (incluida la edición en la lista) también van a la bitácora
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            registrar_eventos([evento(
+                EventoCirculacion.LIBRO_EDITADO if change else EventoCirculacion.LIBRO_CREADO,
+                usuario_id=request.user.id, libro_id=obj.id, sucursal_id=obj.sucursal_id, **datos_libro(obj)
+            )])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            registrar_eventos([evento(
+                EventoCirculacion.LIBRO_ELIMINADO, usuario_id=request.user.id,
+                libro_id=obj.id, sucursal_id=obj.sucursal_id, titulo=obj.titulo
+            )])
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            registrar_eventos([
+                evento(EventoCirculacion.LIBRO_ELIMINADO, usuario_id=request.user.id,
+                       libro_id=libro_id, sucursal_id=sucursal_id, titulo=titulo)
+                for libro_id, sucursal_id, titulo in queryset.values_list('id', 'sucursal_id', 'titulo')
+            ])
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(Prestamo)
 class PrestamoAdmin(admin.ModelAdmin):
@@ -22,7 +58,7 @@ class PrestamoAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'libro', 'fecha_prestamo', 'fecha_devolucion_esperada', 
                     'fecha_devolucion_real', 'multa', 'estado_prestamo')
     # Filtros laterales
-    list_filter = ('fecha_prestamo', 'fecha_devolucion_real')
+    list_filter = ('sucursal', 'fecha_prestamo', 'fecha_devolucion_real')
     # Barra de búsqueda
     search_fields = ('usuario__username', 'libro__titulo')
     # Campos de solo lectura
@@ -32,7 +68,7 @@ class PrestamoAdmin(admin.ModelAdmin):
     # Agrupar campos en el formulario
     fieldsets = (
         ('Información del Préstamo', {
-            'fields': ('usuario', 'libro')
+            'fields': ('usuario', 'libro', 'sucursal')
         }),
         ('Fechas', {
             'fields': ('fecha_prestamo', 'fecha_devolucion_esperada', 'fecha_devolucion_real')
@@ -47,4 +83,41 @@ class PrestamoAdmin(admin.ModelAdmin):
         if obj.fecha_devolucion_real:
             return "✅ Devuelto"
         return "📚 Activo"
-    estado_prestamo.short_description = 'Estado'
\ No newline at end of file
+    estado_prestamo.short_description = 'Estado'
+
+
+@admin.register(Recordatorio)
+class RecordatorioAdmin(admin.ModelAdmin):
+    list_display = ('prestamo', 'tipo', 'fecha_envio')
+    list_filter = ('tipo', 'fecha_envio')
+    search_fields = ('prestamo__usuario__username', 'prestamo__libro__titulo')
+
+
+@admin.register(EventoCirculacion)
+class EventoCirculacionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'fecha', 'usuario_id', 'libro_id', 'prestamo_id', 'sucursal_id')
+    list_filter = ('tipo', 'fecha')
+    ordering = ('-id',)
+
+    # La bitácora es de solo lectura
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResumenUsuario)
+class ResumenUsuarioAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'prestamos_totales', 'prestamos_activos', 'vencidos', 'multas_total', 'fecha_actualizacion')
+    search_fields = ('usuario__username',)
+
+    # Se mantiene desde los préstamos y devoluciones, no se edita a mano
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,287 @@
+"""
+Analítica de circulación por ventanas de tiempo (panel del bibliotecario)
+
+- consolidar_dias(): job nocturno incremental; resume los préstamos y devoluciones de cada
+  día cerrado en CirculacionDiaria (por género y sucursal) y PrestamosLibroDiario
+- calcular_estadisticas(): carga las filas de la ventana como arreglos compactos
+  (días x géneros) y calcula series diarias, semanales, sumas móviles, tasa de atraso
+  y recaudación por multas con operaciones vectorizadas; el ranking de títulos se suma en SQL
+- Usa NumPy (requirements.txt); si no está instalado usa una versión equivalente en Python puro
+- Todo se suma como enteros (las multas en centavos): ambas versiones dan el mismo resultado exacto
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+from .models import CirculacionDiaria, Libro, Prestamo, PrestamosLibroDiario
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usa la versión en Python puro
+    np = None
+
+GENEROS = [codigo for codigo, _ in Libro.GENEROS]
+INDICE_GENERO = {codigo: i for i, codigo in enumerate(GENEROS)}
+TOP_TITULOS = 10
+
+
+def consolidar_dias(desde=None, hasta=None):
+    """
+    Resume los días [desde, hasta] (por defecto: desde el día siguiente al último
+    consolidado hasta ayer). Es idempotente: los días del rango se reemplazan
+    Retorna la cantidad de días procesados
+    """
+    hasta = hasta or timezone.now().date() - timedelta(days=1)
+    if desde is None:
+        ultimo = CirculacionDiaria.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+        primero = Prestamo.objects.aggregate(primero=Min('fecha_prestamo'))['primero']
+        desde = ultimo + timedelta(days=1) if ultimo else primero
+    if desde is None or desde > hasta:
+        return 0
+
+    filas = {}
+
+    def fila(fecha, genero, sucursal_id):
+        clave = (fecha, genero, sucursal_id or 0)
+        if clave not in filas:
+            filas[clave] = CirculacionDiaria(fecha=fecha, genero=genero, sucursal_id=sucursal_id or 0)
+        return filas[clave]
+
+    # Préstamos del rango (índice prestamo_fecha_idx)
+    prestados = Prestamo.objects.filter(fecha_prestamo__range=(desde, hasta)).order_by()
+    for item in prestados.values('fecha_prestamo', 'libro__genero', 'sucursal_id').annotate(total=Count('id')):
+        fila(item['fecha_prestamo'], item['libro__genero'], item['sucursal_id']).prestamos += item['total']
+
+    # Devoluciones del rango (índice parcial prestamo_devuelto_fecha_idx)
+    devueltos = Prestamo.objects.filter(fecha_devolucion_real__range=(desde, hasta)).order_by()
+    for item in devueltos.values('fecha_devolucion_real', 'libro__genero', 'sucursal_id').annotate(
+        total=Count('id'),
+        atrasadas=Count('id', filter=Q(fecha_devolucion_real__gt=F('fecha_devolucion_esperada'))),
+        multas=Sum('multa'),
+    ):
+        resumen = fila(item['fecha_devolucion_real'], item['libro__genero'], item['sucursal_id'])
+        resumen.devoluciones += item['total']
+        resumen.devoluciones_atrasadas += item['atrasadas']
+        resumen.multas += item['multas'] or Decimal('0.00')
+
+    # Cada día consolidado queda con al menos una fila (en cero si no hubo movimiento):
+    # así Max('fecha') es siempre el último día consolidado
+    con_movimiento = {fecha for fecha, _, _ in filas}
+    for dia in range((hasta - desde).days + 1):
+        fecha = desde + timedelta(days=dia)
+        if fecha not in con_movimiento:
+            fila(fecha, 'otro', 0)
+
+    por_libro = [
+        PrestamosLibroDiario(
+            fecha=item['fecha_prestamo'], libro_id=item['libro_id'],
+            sucursal_id=item['sucursal_id'] or 0, prestamos=item['total']
+        )
+        for item in prestados.values('fecha_prestamo', 'libro_id', 'sucursal_id').annotate(total=Count('id'))
+    ]
+
+    with transaction.atomic():
+        CirculacionDiaria.objects.filter(fecha__range=(desde, hasta)).delete()
+        PrestamosLibroDiario.objects.filter(fecha__range=(desde, hasta)).delete()
+        CirculacionDiaria.objects.bulk_create(filas.values(), batch_size=1000)
+        PrestamosLibroDiario.objects.bulk_create(por_libro, batch_size=1000)
+
+    return (hasta - desde).days + 1
+
+
+# Operaciones sobre arreglos: NumPy si está disponible, si no listas de Python
+
+def _matriz(dias, indices_dia, indices_genero, valores):
+    """
+    Arreglo denso días x géneros de enteros a partir de filas dispersas (suma las repetidas)
+    """
+    if np is not None:
+        matriz = np.zeros((dias, len(GENEROS)), dtype=np.int64)
+        np.add.at(matriz, (np.asarray(indices_dia, dtype=int), np.asarray(indices_genero, dtype=int)),
+                  np.asarray(valores, dtype=np.int64))
+        return matriz
+    matriz = [[0] * len(GENEROS) for _ in range(dias)]
+    for dia, genero, valor in zip(indices_dia, indices_genero, valores):
+        matriz[dia][genero] += int(valor)
+    return matriz
+
+
+def _por_dia(matriz):
+    if np is not None:
+        return matriz.sum(axis=1)
+    return [sum(fila) for fila in matriz]
+
+
+def _por_genero(matriz):
+    if np is not None:
+        return matriz.sum(axis=0)
+    return [sum(columna) for columna in zip(*matriz)]
+
+
+def _suma_movil(serie, ventana):
+    """
+    Suma de los últimos 'ventana' días para cada día (los primeros días usan los disponibles)
+    """
+    if np is not None:
+        acumulado = np.concatenate(([0.0], np.cumsum(serie)))
+        inicio = np.maximum(np.arange(1, len(serie) + 1) - ventana, 0)
+        return acumulado[1:] - acumulado[inicio]
+    acumulado = [0.0]
+    for valor in serie:
+        acumulado.append(acumulado[-1] + valor)
+    return [acumulado[i + 1] - acumulado[max(i + 1 - ventana, 0)] for i in range(len(serie))]
+
+
+def _por_semana(serie):
+    """
+    Totales por semana de 7 días contadas hacia atrás desde el último día
+    (la primera semana puede quedar incompleta)
+    """
+    if np is not None:
+        relleno = (-len(serie)) % 7
+        return np.concatenate((np.zeros(relleno), serie)).reshape(-1, 7).sum(axis=1)
+    relleno = [0.0] * ((-len(serie)) % 7)
+    completa = relleno + list(serie)
+    return [sum(completa[i:i + 7]) for i in range(0, len(completa), 7)]
+
+
+def _dividir(numerador, denominador):
+    # Tasa con 0 donde no hay devoluciones
+    if np is not None:
+        return np.divide(numerador, denominador, out=np.zeros(len(numerador)), where=np.asarray(denominador) > 0)
+    return [n / d if d else 0.0 for n, d in zip(numerador, denominador)]
+
+
+def _lista(serie):
+    return [round(float(valor), 4) for valor in serie]
+
+
+def ultimo_dia_consolidado():
+    """
+    Último día resumido por consolidar_dias() (ayer si todavía no hay ninguno)
+    """
+    ultimo = CirculacionDiaria.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+    return ultimo or timezone.now().date() - timedelta(days=1)
+
+
+def calcular_estadisticas(dias=90, sucursal_id=None, hasta=None):
+    """
+    Estadísticas de los 'dias' días que terminan en 'hasta' (por defecto el último consolidado)
+    Solo lee las tablas de resumen: 2 consultas + 1 para los títulos del ranking
+    """
+    hasta = hasta or ultimo_dia_consolidado()
+    desde = hasta - timedelta(days=dias - 1)
+
+    filas = CirculacionDiaria.objects.filter(fecha__range=(desde, hasta))
+    libros_diarios = PrestamosLibroDiario.objects.filter(fecha__range=(desde, hasta))
+    if sucursal_id is not None:
+        filas = filas.filter(sucursal_id=sucursal_id)
+        libros_diarios = libros_diarios.filter(sucursal_id=sucursal_id)
+
+    columnas = list(zip(*filas.values_list(
+        'fecha', 'genero', 'prestamos', 'devoluciones', 'devoluciones_atrasadas', 'multas'
+    ))) or [()] * 6
+    fechas, generos, prestamos, devoluciones, atrasadas, multas = columnas
+    # Multas en centavos: sumar Decimal como float acumula errores de redondeo
+    centavos = [int(multa * 100) for multa in multas]
+    indices_dia = [(fecha - desde).days for fecha in fechas]
+    indices_genero = [INDICE_GENERO.get(genero, INDICE_GENERO['otro']) for genero in generos]
+
+    matrices = {
+        nombre: _matriz(dias, indices_dia, indices_genero, valores)
+        for nombre, valores in (
+            ('prestamos', prestamos), ('devoluciones', devoluciones),
+            ('atrasadas', atrasadas), ('multas', centavos),
+        )
+    }
+    diarios = {nombre: _por_dia(matriz) for nombre, matriz in matrices.items()}
+
+    devoluciones_28 = _suma_movil(diarios['devoluciones'], 28)
+    atrasadas_28 = _suma_movil(diarios['atrasadas'], 28)
+    prestamos_genero = _por_genero(matrices['prestamos'])
+
+    # Ranking de títulos: la tabla por libro es grande, se suma en la base de datos
+    ranking = list(
+        libros_diarios.order_by().values('libro_id').annotate(total=Sum('prestamos'))
+        .order_by('-total', 'libro_id').values_list('libro_id', 'total')[:TOP_TITULOS]
+    )
+    titulos = dict(Libro.objects.filter(id__in=[libro_id for libro_id, _ in ranking]).values_list('id', 'titulo'))
+
+    nombres = dict(Libro.GENEROS)
+    total_devoluciones = float(sum(diarios['devoluciones']))
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'dias': dias,
+        'fechas': [desde + timedelta(days=i) for i in range(dias)],
+        'prestamos_diarios': _lista(diarios['prestamos']),
+        'devoluciones_diarias': _lista(diarios['devoluciones']),
+        'prestamos_7_dias': _lista(_suma_movil(diarios['prestamos'], 7)),
+        'prestamos_semanales': _lista(_por_semana(diarios['prestamos'])),
+        'devoluciones_semanales': _lista(_por_semana(diarios['devoluciones'])),
+        'multas_semanales': [valor / 100 for valor in _lista(_por_semana(diarios['multas']))],
+        'tasa_atraso_28_dias': _lista(_dividir(atrasadas_28, devoluciones_28)),
+        'por_genero': sorted(
+            [
+                {'genero': codigo, 'nombre': nombres[codigo], 'prestamos': int(prestamos_genero[i])}
+                for i, codigo in enumerate(GENEROS) if prestamos_genero[i]
+            ],
+            key=lambda item: -item['prestamos']
+        ),
+        'top_titulos': [
+            {'libro_id': libro_id, 'titulo': titulos.get(libro_id, f'Libro #{libro_id} (eliminado)'), 'prestamos': total}
+            for libro_id, total in ranking
+        ],
+        'totales': {
+            'prestamos': int(sum(diarios['prestamos'])),
+            'devoluciones': int(total_devoluciones),
+            'tasa_atraso': float(sum(diarios['atrasadas'])) / total_devoluciones if total_devoluciones else 0.0,
+            'multas': Decimal(int(sum(diarios['multas']))).scaleb(-2),
+        },
+    }
+
+
+def geometria_barras(valores, ancho=600, alto=140):
+    """
+    Rectángulos de un gráfico de barras SVG (escala al valor máximo de la serie)
+    """
+    maximo = max(valores, default=0) or 1
+    paso = ancho / max(len(valores), 1)
+    return [
+        {
+            'x': round(i * paso, 2),
+            'y': round(alto - valor / maximo * alto, 2),
+            'ancho': round(max(paso - 2, 1), 2),
+            'alto': round(valor / maximo * alto, 2),
+            'valor': valor,
+        }
+        for i, valor in enumerate(valores)
+    ]
+
+
+def geometria_linea(valores, ancho=600, alto=140, maximo=None):
+    """
+    Puntos ("x,y x,y ...") de un gráfico de línea SVG
+    """
+    maximo = maximo or max(valores, default=0) or 1
+    paso = ancho / max(len(valores) - 1, 1)
+    return ' '.join(f'{round(i * paso, 2)},{round(alto - valor / maximo * alto, 2)}' for i, valor in enumerate(valores))
+
+
+def estadisticas_en_cache(dias=90, sucursal_id=None):
+    """
+    calcular_estadisticas() guardado en el caché hasta la próxima consolidación
+    La ventana termina en el último día consolidado (no en "ayer"): antes de que corra
+    la tarea nocturna se muestran los días ya resumidos en lugar de un día en cero,
+    y al consolidar un día nuevo cambia la clave
+    """
+    hasta = ultimo_dia_consolidado()
+    clave = f'analitica:{sucursal_id}:{dias}:{hasta.isoformat()}'
+    return cache.get_or_set(
+        clave,
+        lambda: calcular_estadisticas(dias, sucursal_id, hasta),
+        getattr(settings, 'ANALITICA_CACHE_SEGUNDOS', 3600)
+    )
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SgbConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sgb'
+
+    def ready(self):
+        # Registrar las señales que incrementan la versión del catálogo
+        # y que recalculan el resumen de los usuarios con préstamos eliminados
+        from . import resumenes, versionado  # noqa: F401
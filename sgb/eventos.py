@@ -0,0 +1,71 @@
+from .models import EventoCirculacion
+
+
+def evento(tipo, usuario_id=None, libro_id=None, prestamo_id=None, sucursal_id=None, **datos):
+    """
+    Construye (sin guardar) un evento de circulación
+    Los valores de 'datos' deben ser serializables a JSON
+    """
+    return EventoCirculacion(
+        tipo=tipo,
+        usuario_id=usuario_id,
+        libro_id=libro_id,
+        prestamo_id=prestamo_id,
+        sucursal_id=sucursal_id,
+        datos=datos,
+    )
+
+
+def registrar_eventos(eventos):
+    """
+    Inserta los eventos en un solo INSERT
+    Debe llamarse dentro de la misma transacción que la operación registrada
+    """
+    return EventoCirculacion.objects.bulk_create(eventos)
+
+
+def datos_libro(libro):
+    return {
+        'titulo': libro.titulo,
+        'autor': libro.autor,
+        'genero': libro.genero,
+        'disponible': libro.disponible,
+    }
+
+
+def eventos_prestamo(prestamo):
+    """
+    Evento de préstamo para un Prestamo recién creado
+    """
+    return evento(
+        EventoCirculacion.PRESTAMO,
+        usuario_id=prestamo.usuario_id,
+        libro_id=prestamo.libro_id,
+        prestamo_id=prestamo.id,
+        sucursal_id=prestamo.sucursal_id,
+        fecha_devolucion_esperada=prestamo.fecha_devolucion_esperada.isoformat(),
+    )
+
+
+def eventos_devolucion(prestamo_id, usuario_id, libro_id, sucursal_id, multa):
+    """
+    Evento de devolución y, si corresponde, el evento de multa
+    """
+    eventos = [evento(
+        EventoCirculacion.DEVOLUCION,
+        usuario_id=usuario_id,
+        libro_id=libro_id,
+        prestamo_id=prestamo_id,
+        sucursal_id=sucursal_id,
+        multa=str(multa),
+    )]
+    if multa > 0:
+        eventos.append(evento(
+            EventoCirculacion.MULTA,
+            usuario_id=usuario_id,
+            libro_id=libro_id,
+            prestamo_id=prestamo_id,
+            sucursal_id=sucursal_id,
+            monto=str(multa),
+        ))
+    return eventos
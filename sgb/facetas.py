@@ -0,0 +1,82 @@
+from django.db.models import Count, Q
+from .models import Libro
+
+
+def filtrar_busqueda(libros, busqueda):
+    """
+    Aplica el filtro de texto libre (título, autor o género) a un queryset de libros
+    """
+    if busqueda:
+        libros = libros.filter(
+            Q(titulo__icontains=busqueda) |
+            Q(autor__icontains=busqueda) |
+            Q(genero__icontains=busqueda)
+        )
+    return libros
+
+
+def _q_genero(genero):
+    return Q(genero=genero) if genero else Q()
+
+
+def _q_estado(estado):
+    if estado == 'disponible':
+        return Q(disponible=True)
+    if estado == 'prestado':
+        return Q(disponible=False)
+    return Q()
+
+
+def filtrar_facetas(libros, genero=None, estado=None):
+    """
+    Aplica las facetas seleccionadas (género y estado de disponibilidad)
+    estado puede ser 'disponible' o 'prestado'; cualquier otro valor se ignora
+    """
+    return libros.filter(_q_genero(genero) & _q_estado(estado))
+
+
+def calcular_facetas(libros, genero=None, estado=None):
+    """
+    Calcula los conteos de facetas de un queryset en UNA sola consulta
+    - Conteos por estado (respetando el género seleccionado)
+    - Conteos por género (respetando el estado seleccionado)
+    - Total de resultados con ambas facetas aplicadas
+    Usa agregación condicional (Count con filter=Q) en lugar de un count() por faceta,
+    así el usuario puede navegar entre facetas sin consultas adicionales de conteo
+    """
+    q_genero = _q_genero(genero)
+    q_estado = _q_estado(estado)
+
+    agregados = {
+        'total': Count('id', filter=q_genero & q_estado),
+        'todos': Count('id', filter=q_genero),
+        'disponibles': Count('id', filter=q_genero & Q(disponible=True)),
+        'prestados': Count('id', filter=q_genero & Q(disponible=False)),
+    }
+    for codigo, _ in Libro.GENEROS:
+        agregados[f'genero_{codigo}'] = Count('id', filter=q_estado & Q(genero=codigo))
+
+    resultado = libros.order_by().aggregate(**agregados)
+
+    # Géneros con al menos un libro, ordenados de mayor a menor
+    por_genero = [
+        {
+            'genero': codigo,
+            'nombre': nombre,
+            'total': resultado[f'genero_{codigo}'],
+            'seleccionado': codigo == genero,
+        }
+        for codigo, nombre in Libro.GENEROS
+        if resultado[f'genero_{codigo}']
+    ]
+    por_genero.sort(key=lambda item: -item['total'])
+
+    return {
+        'total': resultado['total'],
+        'todos': resultado['todos'],
+        'disponibles': resultado['disponibles'],
+        'prestados': resultado['prestados'],
+        'por_genero': por_genero,
+        'genero': genero or '',
+        'estado': estado or '',
+    }
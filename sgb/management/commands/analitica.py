@@ -0,0 +1,24 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from sgb.analitica import consolidar_dias
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Fecha inválida: '{valor}' (formato AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = 'Consolida los días cerrados en las tablas de resumen de la analítica de circulación'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha,
+                            help='Primer día a (re)consolidar, AAAA-MM-DD (por defecto el siguiente al último consolidado)')
+        parser.add_argument('--hasta', type=_fecha,
+                            help='Último día a consolidar, AAAA-MM-DD (por defecto ayer)')
+
+    def handle(self, *args, **options):
+        dias = consolidar_dias(options['desde'], options['hasta'])
+        self.stdout.write(self.style.SUCCESS(f'{dias} día(s) consolidado(s)'))
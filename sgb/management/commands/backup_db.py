@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from sgb.respaldos import (
+    RespaldoError, crear_respaldo, listar_respaldos, restaurar, verificar_restauracion
+)
+
+
+class Command(BaseCommand):
+    help = 'Respalda la base SQLite en línea (sin detener el sistema), con instantáneas incrementales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paginas', type=int, default=256,
+                            help='Páginas copiadas por paso de la API de backup (por defecto 256)')
+        parser.add_argument('--pausa', type=float, default=0.005,
+                            help='Segundos de pausa entre pasos para ceder a las escrituras (por defecto 0.005)')
+        parser.add_argument('--sin-compresion', action='store_true',
+                            help='Guarda los bloques sin comprimir')
+        parser.add_argument('--sin-verificar', action='store_true',
+                            help='Omite el PRAGMA integrity_check de la copia')
+        parser.add_argument('--conservar', type=int, default=None,
+                            help='Cantidad de respaldos a conservar (0 = todos; por defecto RESPALDOS_CONSERVAR)')
+        parser.add_argument('--listar', action='store_true',
+                            help='Lista los respaldos existentes y termina')
+        parser.add_argument('--verificar-restauracion', nargs='?', const='ultimo', metavar='MANIFIESTO',
+                            help='Restaura un respaldo (por defecto el último) en un archivo temporal y lo verifica')
+        parser.add_argument('--restaurar-en', nargs=2, metavar=('MANIFIESTO', 'DESTINO'),
+                            help='Reconstruye un respaldo en DESTINO (no modifica la base en uso)')
+
+    def handle(self, *args, **options):
+        try:
+            if options['listar']:
+                for ruta in listar_respaldos():
+                    self.stdout.write(ruta.name)
+                return
+
+            if options['verificar_restauracion']:
+                self._verificar(options['verificar_restauracion'])
+                return
+
+            if options['restaurar_en']:
+                manifiesto, destino = options['restaurar_en']
+                restaurar(manifiesto, destino)
+                self.stdout.write(self.style.SUCCESS(f'Respaldo restaurado en {destino}'))
+                return
+
+            resumen = crear_respaldo(
+                paginas=options['paginas'],
+                pausa=options['pausa'],
+                comprimir=not options['sin_compresion'],
+                verificar=not options['sin_verificar'],
+                conservar=options['conservar'],
+            )
+        except RespaldoError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Respaldo {resumen['manifiesto'].name} creado en {resumen['duracion_copia']:.2f} s "
+            f"({resumen['bloques_nuevos']} de {resumen['bloques_totales']} bloque(s) nuevos)"
+        ))
+        if resumen['respaldos_eliminados']:
+            self.stdout.write(
+                f"Retención: {resumen['respaldos_eliminados']} respaldo(s) y "
+                f"{resumen['bloques_eliminados']} bloque(s) eliminados"
+            )
+
+    def _verificar(self, manifiesto):
+        if manifiesto == 'ultimo':
+            respaldos = listar_respaldos()
+            if not respaldos:
+                raise CommandError('No hay respaldos para verificar')
+            manifiesto = respaldos[-1]
+
+        datos, problemas, conteos = verificar_restauracion(manifiesto)
+        if problemas:
+            raise CommandError('El respaldo restaurado no pasó el chequeo de integridad: ' + '; '.join(problemas[:5]))
+
+        self.stdout.write(self.style.SUCCESS(f"Respaldo del {datos['fecha']} restaurado y verificado (integrity_check: ok)"))
+        for tabla, total in conteos.items():
+            self.stdout.write(f'  {tabla}: {total} fila(s)')
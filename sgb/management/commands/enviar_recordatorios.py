@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from sgb.recordatorios import enviar_recordatorios
+
+
+class Command(BaseCommand):
+    help = 'Envía un correo resumen por usuario con sus préstamos vencidos y por vencer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias-aviso', type=int, default=2,
+                            help='Avisar préstamos que vencen dentro de estos días (por defecto 2)')
+
+    def handle(self, *args, **options):
+        enviados = enviar_recordatorios(dias_aviso=options['dias_aviso'])
+        self.stdout.write(self.style.SUCCESS(f'{enviados} recordatorio(s) enviado(s)'))
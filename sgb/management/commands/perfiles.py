@@ -0,0 +1,96 @@
+import io
+import json
+import pstats
+import shutil
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from biblioteca.perfilado import (
+    MODO_CPROFILE, MODOS, cargar_perfil, crear_token, directorio_perfiles, exportar_speedscope, listar_perfiles
+)
+
+
+class Command(BaseCommand):
+    help = 'Lista, muestra y exporta los perfiles de requests capturados por PerfiladoMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('perfil', nargs='?',
+                            help='ID del perfil a mostrar (sin argumentos lista los perfiles)')
+        parser.add_argument('--token', nargs='?', const=MODO_CPROFILE, choices=MODOS,
+                            help='Genera un token firmado para ?perfilar=<token> o el header X-Perfilar')
+        parser.add_argument('--exportar', metavar='RUTA',
+                            help='Exporta el perfil: .prof (pstats) para cProfile, JSON de speedscope para muestreo')
+        parser.add_argument('--orden', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'],
+                            help='Orden de las funciones de cProfile (por defecto cumulative)')
+        parser.add_argument('--limite', type=int, default=25,
+                            help='Cantidad de funciones, pilas o consultas a mostrar (por defecto 25)')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(crear_token(options['token']))
+            return
+
+        if not options['perfil']:
+            self._listar()
+            return
+
+        try:
+            datos = cargar_perfil(options['perfil'])
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+
+        if options['exportar']:
+            self._exportar(datos, options['exportar'])
+        else:
+            self._mostrar(datos, options['orden'], options['limite'])
+
+    def _listar(self):
+        rutas = listar_perfiles()
+        if not rutas:
+            self.stdout.write('No hay perfiles guardados.')
+            return
+        for ruta in rutas:
+            with open(ruta) as entrada:
+                datos = json.load(entrada)
+            self.stdout.write(
+                f"{datos['id']}  {datos['modo']:<9} {datos['duracion_ms']:>9.1f} ms  "
+                f"{len(datos['sql']):>4} SQL  {datos['estado']}  {datos['metodo']} {datos['ruta']}"
+            )
+
+    def _mostrar(self, datos, orden, limite):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{datos['metodo']} {datos['ruta']} -> {datos['estado']} en {datos['duracion_ms']:.1f} ms "
+            f"({datos['modo']}, {datos['origen']}, usuario '{datos['usuario']}')"
+        ))
+
+        if datos['modo'] == MODO_CPROFILE:
+            salida = io.StringIO()
+            estadisticas = pstats.Stats(str(directorio_perfiles() / f"{datos['id']}.prof"), stream=salida)
+            estadisticas.strip_dirs().sort_stats(orden).print_stats(limite)
+            self.stdout.write(salida.getvalue())
+        else:
+            total = sum(pila[-1] for pila in datos['pilas']) or 1
+            self.stdout.write(f"\nPilas más frecuentes ({total} muestras cada {datos['intervalo_ms']} ms):")
+            for *pila, cantidad in datos['pilas'][:limite]:
+                nombre, archivo, linea = pila[-1]
+                self.stdout.write(f"  {cantidad / total:6.1%}  {nombre} ({archivo}:{linea})")
+
+        # Traza SQL: tiempo total y consultas repetidas (posibles N+1)
+        consultas = datos['sql']
+        tiempo_sql = sum(c['ms'] for c in consultas)
+        self.stdout.write(f"\nSQL: {len(consultas)} consulta(s), {tiempo_sql:.1f} ms")
+        agrupadas = defaultdict(lambda: [0, 0.0])
+        for consulta in consultas:
+            agrupadas[consulta['sql']][0] += 1
+            agrupadas[consulta['sql']][1] += consulta['ms']
+        for sql, (veces, ms) in sorted(agrupadas.items(), key=lambda item: -item[1][1])[:limite]:
+            self.stdout.write(f"  {ms:8.2f} ms  x{veces:<4} {sql[:160]}")
+
+    def _exportar(self, datos, ruta):
+        if datos['modo'] == MODO_CPROFILE:
+            shutil.copyfile(directorio_perfiles() / f"{datos['id']}.prof", ruta)
+            formato = 'pstats'
+        else:
+            with open(ruta, 'w') as salida:
+                json.dump(exportar_speedscope(datos), salida)
+            formato = 'speedscope'
+        self.stdout.write(self.style.SUCCESS(f'Perfil {datos["id"]} exportado en formato {formato}: {ruta}'))
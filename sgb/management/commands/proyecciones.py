@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from sgb.proyecciones import PROYECCIONES, actualizar_proyeccion, reconstruir_proyeccion
+
+
+class Command(BaseCommand):
+    help = 'Actualiza (o reconstruye desde cero) las proyecciones de la bitácora de circulación'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nombres', nargs='*',
+                            help='Proyecciones a procesar (por defecto todas)')
+        parser.add_argument('--reconstruir', action='store_true',
+                            help='Borra cada proyección y la reconstruye repitiendo toda la bitácora')
+
+    def handle(self, *args, **options):
+        nombres = options['nombres'] or list(PROYECCIONES)
+        for nombre in nombres:
+            if nombre not in PROYECCIONES:
+                raise CommandError(f"La proyección '{nombre}' no existe. Disponibles: {', '.join(PROYECCIONES)}")
+
+        for nombre in nombres:
+            proyeccion = PROYECCIONES[nombre]
+            if options['reconstruir']:
+                procesados = reconstruir_proyeccion(proyeccion)
+            else:
+                procesados = actualizar_proyeccion(proyeccion)
+            self.stdout.write(self.style.SUCCESS(f'{nombre}: {procesados} evento(s) procesado(s)'))
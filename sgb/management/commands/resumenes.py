@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from sgb.resumenes import recalcular_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los resúmenes de préstamos por usuario desde la tabla de préstamos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usuarios', nargs='*', type=int,
+                            help='IDs de los usuarios a recalcular (por defecto todos)')
+
+    def handle(self, *args, **options):
+        escritos = recalcular_resumenes(options['usuarios'] or None)
+        self.stdout.write(self.style.SUCCESS(f'{escritos} resumen(es) recalculado(s)'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0003_alter_prestamo_multa'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recordatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('por_vencer', 'Por vencer'), ('vencido', 'Vencido')], max_length=20)),
+                ('fecha_envio', models.DateField()),
+            ],
+            options={
+                'verbose_name': 'Recordatorio',
+                'verbose_name_plural': 'Recordatorios',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('fecha_devolucion_real__isnull', True)), fields=['fecha_devolucion_esperada', 'usuario'], name='prestamo_activo_vence_idx'),
+        ),
+        migrations.AddField(
+            model_name='recordatorio',
+            name='prestamo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recordatorios', to='sgb.prestamo'),
+        ),
+        migrations.AddConstraint(
+            model_name='recordatorio',
+            constraint=models.UniqueConstraint(fields=('prestamo', 'tipo', 'fecha_envio'), name='recordatorio_unico_por_dia'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0005_versionado_catalogo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('codigo', models.SlugField(max_length=30, unique=True)),
+                ('direccion', models.CharField(blank=True, max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Sucursal',
+                'verbose_name_plural': 'Sucursales',
+            },
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='libros', to='sgb.sucursal'),
+        ),
+        migrations.AddField(
+            model_name='prestamo',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='prestamos', to='sgb.sucursal'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['sucursal', 'disponible'], name='libro_sucursal_disp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['sucursal', 'genero'], name='libro_sucursal_genero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('fecha_devolucion_real__isnull', True)), fields=['sucursal', 'fecha_devolucion_esperada'], name='prestamo_activo_sucursal_idx'),
+        ),
+    ]
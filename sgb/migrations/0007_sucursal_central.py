@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def crear_sucursal_central(apps, schema_editor):
+    """
+    Crea la sucursal 'Casa Central' y le asigna los libros y préstamos existentes
+    """
+    Sucursal = apps.get_model('sgb', 'Sucursal')
+    Libro = apps.get_model('sgb', 'Libro')
+    Prestamo = apps.get_model('sgb', 'Prestamo')
+
+    if not Libro.objects.exists() and not Prestamo.objects.exists():
+        return
+    central, _ = Sucursal.objects.get_or_create(codigo='central', defaults={'nombre': 'Casa Central'})
+    Libro.objects.filter(sucursal__isnull=True).update(sucursal=central)
+    Prestamo.objects.filter(sucursal__isnull=True).update(sucursal=central)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0006_sucursales'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_sucursal_central, migrations.RunPython.noop),
+    ]
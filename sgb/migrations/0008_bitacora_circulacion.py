@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:51
+
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0007_sucursal_central'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaLibro',
+            fields=[
+                ('libro_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('prestamos', models.PositiveIntegerField(default=0)),
+                ('devoluciones', models.PositiveIntegerField(default=0)),
+                ('multas', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('ultimo_prestamo', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Estadística de Libro',
+                'verbose_name_plural': 'Estadísticas de Libros',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoCirculacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('prestamo', 'Préstamo'), ('devolucion', 'Devolución'), ('multa', 'Multa'), ('libro_creado', 'Libro creado'), ('libro_editado', 'Libro editado'), ('libro_eliminado', 'Libro eliminado')], max_length=20)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('usuario_id', models.BigIntegerField(blank=True, null=True)),
+                ('libro_id', models.BigIntegerField(blank=True, null=True)),
+                ('prestamo_id', models.BigIntegerField(blank=True, null=True)),
+                ('sucursal_id', models.BigIntegerField(blank=True, null=True)),
+                ('datos', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'verbose_name': 'Evento de Circulación',
+                'verbose_name_plural': 'Eventos de Circulación',
+            },
+        ),
+        migrations.CreateModel(
+            name='OffsetProyeccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('ultimo_evento_id', models.BigIntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Offset de Proyección',
+                'verbose_name_plural': 'Offsets de Proyecciones',
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:59
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+def cargar_resumenes(apps, schema_editor):
+    """
+    Calcula el resumen de los usuarios que ya tienen préstamos (una consulta agrupada)
+    """
+    Prestamo = apps.get_model('sgb', 'Prestamo')
+    ResumenUsuario = apps.get_model('sgb', 'ResumenUsuario')
+
+    hoy = timezone.now().date()
+    activos = Q(fecha_devolucion_real__isnull=True)
+    filas = Prestamo.objects.order_by().values('usuario_id').annotate(
+        totales=Count('id'),
+        activos=Count('id', filter=activos),
+        vencidos=Count('id', filter=activos & Q(fecha_devolucion_esperada__lt=hoy)),
+        multas=Sum('multa', filter=~activos),
+    )
+    ResumenUsuario.objects.bulk_create([
+        ResumenUsuario(
+            usuario_id=fila['usuario_id'],
+            prestamos_totales=fila['totales'],
+            prestamos_activos=fila['activos'],
+            vencidos=fila['vencidos'],
+            multas_total=fila['multas'] or Decimal('0.00'),
+        )
+        for fila in filas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('sgb', '0008_bitacora_circulacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_prestamos', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('prestamos_totales', models.PositiveIntegerField(default=0)),
+                ('prestamos_activos', models.PositiveIntegerField(default=0)),
+                ('vencidos', models.PositiveIntegerField(default=0)),
+                ('multas_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Usuario',
+                'verbose_name_plural': 'Resúmenes de Usuarios',
+            },
+        ),
+        migrations.RunPython(cargar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:07
+
+from django.conf import settings
+from collections import Counter
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def cargar_histograma(apps, schema_editor):
+    """
+    Carga el histograma de vencimientos con los préstamos activos existentes
+    """
+    Prestamo = apps.get_model('sgb', 'Prestamo')
+    VencimientoHistograma = apps.get_model('sgb', 'VencimientoHistograma')
+
+    filas = Prestamo.objects.filter(
+        fecha_devolucion_real__isnull=True
+    ).order_by().values('fecha_devolucion_esperada', 'libro__genero', 'sucursal_id').annotate(total=Count('id'))
+    conteos = Counter()
+    for fila in filas:
+        conteos[(fila['fecha_devolucion_esperada'], fila['libro__genero'], fila['sucursal_id'] or 0)] += fila['total']
+    VencimientoHistograma.objects.bulk_create([
+        VencimientoHistograma(fecha=fecha, genero=genero, sucursal_id=sucursal_id, cantidad=cantidad)
+        for (fecha, genero, sucursal_id), cantidad in conteos.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0009_resumen_usuario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VencimientoHistograma',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('genero', models.CharField(choices=[('ficcion', 'Ficción'), ('no_ficcion', 'No Ficción'), ('ciencia', 'Ciencia'), ('historia', 'Historia'), ('biografia', 'Biografía'), ('fantasia', 'Fantasía'), ('romance', 'Romance'), ('terror', 'Terror'), ('poesia', 'Poesía'), ('otro', 'Otro')], max_length=20)),
+                ('sucursal_id', models.PositiveBigIntegerField(default=0)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Vencimiento (histograma)',
+                'verbose_name_plural': 'Vencimientos (histograma)',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['titulo', 'autor'], name='libro_titulo_autor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('fecha_devolucion_real__isnull', True)), fields=['libro', 'fecha_devolucion_esperada'], name='prestamo_activo_libro_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vencimientohistograma',
+            constraint=models.UniqueConstraint(fields=('fecha', 'genero', 'sucursal_id'), name='vencimiento_histograma_unico'),
+        ),
+        migrations.RunPython(cargar_histograma, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:09
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0010_pronostico_disponibilidad'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculacionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('genero', models.CharField(choices=[('ficcion', 'Ficción'), ('no_ficcion', 'No Ficción'), ('ciencia', 'Ciencia'), ('historia', 'Historia'), ('biografia', 'Biografía'), ('fantasia', 'Fantasía'), ('romance', 'Romance'), ('terror', 'Terror'), ('poesia', 'Poesía'), ('otro', 'Otro')], max_length=20)),
+                ('sucursal_id', models.PositiveBigIntegerField(default=0)),
+                ('prestamos', models.PositiveIntegerField(default=0)),
+                ('devoluciones', models.PositiveIntegerField(default=0)),
+                ('devoluciones_atrasadas', models.PositiveIntegerField(default=0)),
+                ('multas', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Circulación Diaria',
+                'verbose_name_plural': 'Circulación Diaria',
+            },
+        ),
+        migrations.CreateModel(
+            name='PrestamosLibroDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('libro_id', models.BigIntegerField()),
+                ('sucursal_id', models.PositiveBigIntegerField(default=0)),
+                ('prestamos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Préstamos por Libro (diario)',
+                'verbose_name_plural': 'Préstamos por Libro (diario)',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['fecha_prestamo'], name='prestamo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('fecha_devolucion_real__isnull', False)), fields=['fecha_devolucion_real'], name='prestamo_devuelto_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='circulaciondiaria',
+            constraint=models.UniqueConstraint(fields=('fecha', 'genero', 'sucursal_id'), name='circulacion_diaria_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='prestamoslibrodiario',
+            constraint=models.UniqueConstraint(fields=('fecha', 'libro_id'), name='prestamos_libro_diario_unico'),
+        ),
+    ]
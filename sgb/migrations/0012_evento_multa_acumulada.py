@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0011_analitica_circulacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventocirculacion',
+            name='tipo',
+            field=models.CharField(choices=[('prestamo', 'Préstamo'), ('devolucion', 'Devolución'), ('multa', 'Multa'), ('multa_acumulada', 'Multa acumulada'), ('libro_creado', 'Libro creado'), ('libro_editado', 'Libro editado'), ('libro_eliminado', 'Libro eliminado')], max_length=20),
+        ),
+    ]
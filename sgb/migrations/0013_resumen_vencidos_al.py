@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0012_evento_multa_acumulada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumenusuario',
+            name='vencidos_al',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -2,6 +2,27 @@ from django.db import models
 from django.contrib.auth.models import User
 from decimal import Decimal
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+
+# Multa por cada día de atraso en la devolución
+MULTA_POR_DIA = Decimal('1000.00')
+
+class Sucursal(models.Model):
+    """
+    Sucursal (sede) de la biblioteca
+    Libros, préstamos y perfiles de usuario pertenecen a una sucursal
+    """
+    nombre = models.CharField(max_length=100)
+    codigo = models.SlugField(max_length=30, unique=True)
+    direccion = models.CharField(max_length=200, blank=True)
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name = "Sucursal"
+        verbose_name_plural = "Sucursales"
+
 
 class Libro(models.Model):
     GENEROS = [
@@ -21,6 +42,8 @@ class Libro(models.Model):
     autor = models.CharField(max_length=100)
     genero = models.CharField(max_length=20, choices=GENEROS, default='otro')
     disponible = models.BooleanField(default=True)
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, null=True, blank=True, related_name='libros')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.titulo
@@ -45,15 +68,24 @@ class Libro(models.Model):
     class Meta:
         verbose_name = "Libro"
         verbose_name_plural = "Libros"
+        indexes = [
+            # Conteos y listados por sucursal (disponibilidad y género)
+            models.Index(fields=['sucursal', 'disponible'], name='libro_sucursal_disp_idx'),
+            models.Index(fields=['sucursal', 'genero'], name='libro_sucursal_genero_idx'),
+            # Copias de un mismo título (pronóstico de disponibilidad)
+            models.Index(fields=['titulo', 'autor'], name='libro_titulo_autor_idx'),
+        ]
 
 
 class Prestamo(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
     libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, null=True, blank=True, related_name='prestamos')
 
     fecha_prestamo = models.DateField(auto_now_add=True)
     fecha_devolucion_esperada = models.DateField()
     fecha_devolucion_real = models.DateField(null=True, blank=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     # Campo multa con validación mejorada
     multa = models.DecimalField(
@@ -82,4 +114,252 @@ class Prestamo(models.Model):
     
     class Meta:
         verbose_name = "Préstamo"
-        verbose_name_plural = "Préstamos"
\ No newline at end of file
+        verbose_name_plural = "Préstamos"
+        indexes = [
+            # Índice parcial: solo préstamos activos, ordenados por vencimiento
+            models.Index(
+                fields=['fecha_devolucion_esperada', 'usuario'],
+                condition=models.Q(fecha_devolucion_real__isnull=True),
+                name='prestamo_activo_vence_idx',
+            ),
+            models.Index(
+                fields=['sucursal', 'fecha_devolucion_esperada'],
+                condition=models.Q(fecha_devolucion_real__isnull=True),
+                name='prestamo_activo_sucursal_idx',
+            ),
+            # Consolidación diaria de la analítica (préstamos y devoluciones de un rango de días)
+            models.Index(fields=['fecha_prestamo'], name='prestamo_fecha_idx'),
+            models.Index(
+                fields=['fecha_devolucion_real'],
+                condition=models.Q(fecha_devolucion_real__isnull=False),
+                name='prestamo_devuelto_fecha_idx',
+            ),
+            # Pronóstico de disponibilidad: vencimiento del préstamo activo de cada libro
+            models.Index(
+                fields=['libro', 'fecha_devolucion_esperada'],
+                condition=models.Q(fecha_devolucion_real__isnull=True),
+                name='prestamo_activo_libro_idx',
+            ),
+        ]
+
+
+class VersionCatalogo(models.Model):
+    """
+    Contador de generación del catálogo (fila única)
+    Se incrementa con cada cambio de Libro o Prestamo y sirve para calcular
+    el ETag/Last-Modified de las páginas sin consultar los listados
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Catálogo v{self.version}"
+
+    class Meta:
+        verbose_name = "Versión del Catálogo"
+        verbose_name_plural = "Versión del Catálogo"
+
+
+class Recordatorio(models.Model):
+    """
+    Registro de los recordatorios enviados por préstamo
+    Permite que el envío se pueda repetir sin mandar dos veces el mismo aviso en un día
+    """
+    POR_VENCER = 'por_vencer'
+    VENCIDO = 'vencido'
+    TIPOS = [
+        (POR_VENCER, 'Por vencer'),
+        (VENCIDO, 'Vencido'),
+    ]
+
+    prestamo = models.ForeignKey(Prestamo, on_delete=models.CASCADE, related_name='recordatorios')
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    fecha_envio = models.DateField()
+
+    def __str__(self):
+        return f"{self.prestamo} - {self.get_tipo_display()} ({self.fecha_envio})"
+
+    class Meta:
+        verbose_name = "Recordatorio"
+        verbose_name_plural = "Recordatorios"
+        constraints = [
+            models.UniqueConstraint(fields=['prestamo', 'tipo', 'fecha_envio'], name='recordatorio_unico_por_dia'),
+        ]
+
+
+class EventoCirculacion(models.Model):
+    """
+    Bitácora de solo inserción con cada préstamo, devolución, multa y cambio del catálogo
+    Se escribe en la misma transacción que la operación que la origina
+    Los IDs se guardan como enteros (no FK) para conservar el historial de libros eliminados
+    """
+    PRESTAMO = 'prestamo'
+    DEVOLUCION = 'devolucion'
+    MULTA = 'multa'
+    MULTA_ACUMULADA = 'multa_acumulada'
+    LIBRO_CREADO = 'libro_creado'
+    LIBRO_EDITADO = 'libro_editado'
+    LIBRO_ELIMINADO = 'libro_eliminado'
+    TIPOS = [
+        (PRESTAMO, 'Préstamo'),
+        (DEVOLUCION, 'Devolución'),
+        (MULTA, 'Multa'),
+        (MULTA_ACUMULADA, 'Multa acumulada'),
+        (LIBRO_CREADO, 'Libro creado'),
+        (LIBRO_EDITADO, 'Libro editado'),
+        (LIBRO_ELIMINADO, 'Libro eliminado'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    fecha = models.DateTimeField(default=timezone.now)
+    usuario_id = models.BigIntegerField(null=True, blank=True)
+    libro_id = models.BigIntegerField(null=True, blank=True)
+    prestamo_id = models.BigIntegerField(null=True, blank=True)
+    sucursal_id = models.BigIntegerField(null=True, blank=True)
+    datos = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.get_tipo_display()} ({self.fecha:%d/%m/%Y %H:%M})"
+
+    def save(self, *args, **kwargs):
+        """
+        Los eventos no se modifican: solo se permite insertar
+        """
+        if self.pk is not None:
+            raise ValueError("Los eventos de circulación no se pueden modificar")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Los eventos de circulación no se pueden eliminar")
+
+    class Meta:
+        verbose_name = "Evento de Circulación"
+        verbose_name_plural = "Eventos de Circulación"
+
+
+class OffsetProyeccion(models.Model):
+    """
+    Último evento procesado por cada proyección (almacén derivado de la bitácora)
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    ultimo_evento_id = models.BigIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} (evento #{self.ultimo_evento_id})"
+
+    class Meta:
+        verbose_name = "Offset de Proyección"
+        verbose_name_plural = "Offsets de Proyecciones"
+
+
+class EstadisticaLibro(models.Model):
+    """
+    Proyección de la bitácora: totales de circulación por libro
+    (reemplaza recorrer la tabla de préstamos para rankings y recomendaciones)
+    """
+    libro_id = models.BigIntegerField(primary_key=True)
+    prestamos = models.PositiveIntegerField(default=0)
+    devoluciones = models.PositiveIntegerField(default=0)
+    multas = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    ultimo_prestamo = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Libro {self.libro_id}: {self.prestamos} préstamo(s)"
+
+    class Meta:
+        verbose_name = "Estadística de Libro"
+        verbose_name_plural = "Estadísticas de Libros"
+
+
+class ResumenUsuario(models.Model):
+    """
+    Totales precalculados de préstamos y multas por usuario (historial y multas)
+    Se mantienen en la misma transacción que cada préstamo y devolución,
+    así la página del historial no agrega sobre toda la tabla de préstamos
+    - vencidos: préstamos activos atrasados al día vencidos_al; cambia con el paso
+      de los días, por eso además lo recalcula la tarea diaria actualizar_vencidos_resumen
+    - multas_total: suma de las multas cobradas en devoluciones
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='resumen_prestamos')
+    prestamos_totales = models.PositiveIntegerField(default=0)
+    prestamos_activos = models.PositiveIntegerField(default=0)
+    vencidos = models.PositiveIntegerField(default=0)
+    multas_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    vencidos_al = models.DateField(null=True, blank=True)  # Día del último conteo de vencidos
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.usuario.username}: {self.prestamos_totales} préstamo(s), ${self.multas_total} en multas"
+
+    class Meta:
+        verbose_name = "Resumen de Usuario"
+        verbose_name_plural = "Resúmenes de Usuarios"
+
+
+class VencimientoHistograma(models.Model):
+    """
+    Histograma precalculado de préstamos activos por fecha de vencimiento, género y sucursal
+    Responde "cuántos libros de un género vuelven esta semana" con un rango sobre pocas filas
+    Se actualiza en la misma transacción que cada préstamo, devolución o cambio de género
+    sucursal_id es un entero (0 = sin sucursal) para que la restricción única no admita NULL repetidos
+    """
+    fecha = models.DateField()
+    genero = models.CharField(max_length=20, choices=Libro.GENEROS)
+    sucursal_id = models.PositiveBigIntegerField(default=0)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} {self.get_genero_display()}: {self.cantidad}"
+
+    class Meta:
+        verbose_name = "Vencimiento (histograma)"
+        verbose_name_plural = "Vencimientos (histograma)"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'genero', 'sucursal_id'], name='vencimiento_histograma_unico'),
+        ]
+
+
+class CirculacionDiaria(models.Model):
+    """
+    Resumen diario de circulación por género y sucursal (analítica del panel)
+    Lo escribe la consolidación nocturna a partir de los préstamos del día;
+    los gráficos leen estas pocas filas en lugar de la tabla de préstamos
+    """
+    fecha = models.DateField()
+    genero = models.CharField(max_length=20, choices=Libro.GENEROS)
+    sucursal_id = models.PositiveBigIntegerField(default=0)  # 0 = sin sucursal
+    prestamos = models.PositiveIntegerField(default=0)
+    devoluciones = models.PositiveIntegerField(default=0)
+    devoluciones_atrasadas = models.PositiveIntegerField(default=0)
+    multas = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} {self.get_genero_display()}: {self.prestamos} préstamo(s)"
+
+    class Meta:
+        verbose_name = "Circulación Diaria"
+        verbose_name_plural = "Circulación Diaria"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'genero', 'sucursal_id'], name='circulacion_diaria_unica'),
+        ]
+
+
+class PrestamosLibroDiario(models.Model):
+    """
+    Préstamos por libro y día (solo los libros prestados ese día), para el ranking de títulos
+    """
+    fecha = models.DateField()
+    libro_id = models.BigIntegerField()
+    sucursal_id = models.PositiveBigIntegerField(default=0)
+    prestamos = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} libro {self.libro_id}: {self.prestamos}"
+
+    class Meta:
+        verbose_name = "Préstamos por Libro (diario)"
+        verbose_name_plural = "Préstamos por Libro (diario)"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'libro_id'], name='prestamos_libro_diario_unico'),
+        ]
@@ -0,0 +1,248 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, DecimalField, Exists, OuterRef, Value, When
+from django.utils import timezone
+from .eventos import evento, eventos_devolucion, eventos_prestamo, registrar_eventos
+from .models import MULTA_POR_DIA, EventoCirculacion, Libro, Prestamo
+from .pronostico import filas_prestamos_activos, restar_vencimientos, sumar_vencimientos
+from .resumenes import restar_devoluciones, sumar_prestamos
+from .sucursales import filtrar_por_sucursal
+from .versionado import incrementar_version
+
+
+class OperacionMasivaError(Exception):
+    """Error que revierte completa una operación masiva de circulación"""
+
+
+def parsear_ids(valores):
+    """
+    Convierte la lista de IDs recibida por POST a enteros, ignorando valores inválidos
+    Acepta también textos con varios IDs separados por espacios, comas o saltos de línea
+    (por ejemplo lo que deja un lector de código de barras en un textarea)
+    """
+    return set(parsear_ids_en_orden(valores))
+
+
+def parsear_ids_en_orden(valores):
+    """
+    Igual que parsear_ids, pero retorna una lista en el orden recibido (sin repetidos)
+    """
+    ids = {}
+    for valor in valores:
+        for parte in str(valor).replace(',', ' ').split():
+            try:
+                ids[int(parte)] = None
+            except ValueError:
+                continue
+    return list(ids)
+
+
+def _separar_con_prestamo_activo(ids, sucursal_id=None):
+    """
+    Separa los libros seleccionados en una sola consulta (anti-join con préstamos activos)
+    Retorna (queryset de libros sin préstamo activo, títulos de los libros omitidos)
+    """
+    prestamo_activo = Prestamo.objects.filter(
+        libro=OuterRef('pk'),
+        fecha_devolucion_real__isnull=True
+    )
+    seleccionados = filtrar_por_sucursal(Libro.objects.filter(id__in=ids), sucursal_id).annotate(
+        tiene_prestamo=Exists(prestamo_activo)
+    )
+    omitidos = list(
+        seleccionados.filter(tiene_prestamo=True).order_by('titulo').values_list('titulo', flat=True)
+    )
+    return seleccionados.filter(tiene_prestamo=False), omitidos
+
+
+def editar_libros(ids, genero=None, disponible=None, sucursal_id=None, usuario_id=None):
+    """
+    Edición masiva de género y/o disponibilidad en una sola transacción
+    - El género se actualiza en todos los libros seleccionados con un update()
+    - La disponibilidad NO se cambia en libros con préstamo activo (se reportan como omitidos)
+    - Si se indica sucursal_id, solo se modifican libros de esa sucursal
+    - Cada libro modificado queda registrado en la bitácora de circulación
+    Retorna (cantidad de libros actualizados, títulos omitidos)
+    """
+    omitidos = []
+    cambios = {}  # libro_id -> (sucursal_id, campos cambiados)
+    ahora = timezone.now()
+    with transaction.atomic():
+        if genero:
+            en_sucursal = list(
+                filtrar_por_sucursal(Libro.objects.filter(id__in=ids), sucursal_id).values_list('id', 'sucursal_id')
+            )
+            # Los préstamos activos de los libros que cambian de género se mueven en el histograma
+            movidos = [
+                fila for fila in filas_prestamos_activos([libro_id for libro_id, _ in en_sucursal])
+                if fila[1] != genero
+            ]
+            Libro.objects.filter(id__in=[libro_id for libro_id, _ in en_sucursal]).update(
+                genero=genero,
+                fecha_actualizacion=ahora
+            )
+            restar_vencimientos(movidos)
+            sumar_vencimientos([(fecha, genero, sucursal) for fecha, _, sucursal in movidos])
+            for libro_id, libro_sucursal_id in en_sucursal:
+                cambios.setdefault(libro_id, (libro_sucursal_id, {}))[1]['genero'] = genero
+        if disponible is not None:
+            libres, omitidos = _separar_con_prestamo_activo(ids, sucursal_id)
+            libres = list(libres.values_list('id', 'sucursal_id'))
+            Libro.objects.filter(id__in=[libro_id for libro_id, _ in libres]).update(
+                disponible=disponible,
+                fecha_actualizacion=ahora
+            )
+            for libro_id, libro_sucursal_id in libres:
+                cambios.setdefault(libro_id, (libro_sucursal_id, {}))[1]['disponible'] = disponible
+        if cambios:
+            registrar_eventos([
+                evento(EventoCirculacion.LIBRO_EDITADO, usuario_id=usuario_id,
+                       libro_id=libro_id, sucursal_id=libro_sucursal_id, **campos)
+                for libro_id, (libro_sucursal_id, campos) in cambios.items()
+            ])
+            incrementar_version()
+    return len(cambios), omitidos
+
+
+def eliminar_libros(ids, sucursal_id=None, usuario_id=None):
+    """
+    Eliminación masiva en una sola transacción
+    Los libros con préstamo activo no se eliminan y se reportan como omitidos
+    Si se indica sucursal_id, solo se eliminan libros de esa sucursal
+    Retorna (cantidad de libros eliminados, títulos omitidos)
+    """
+    with transaction.atomic():
+        libres, omitidos = _separar_con_prestamo_activo(ids, sucursal_id)
+        libres = list(libres.values_list('id', 'sucursal_id', 'titulo'))
+        registrar_eventos([
+            evento(EventoCirculacion.LIBRO_ELIMINADO, usuario_id=usuario_id,
+                   libro_id=libro_id, sucursal_id=libro_sucursal_id, titulo=titulo)
+            for libro_id, libro_sucursal_id, titulo in libres
+        ])
+        _, por_modelo = Libro.objects.filter(id__in=[libro_id for libro_id, _, _ in libres]).delete()
+    # delete() también cuenta los préstamos históricos eliminados en cascada
+    return por_modelo.get(Libro._meta.label, 0), omitidos
+
+
+def prestar_libros(usuario, ids, dias_prestamo, sucursal_id=None):
+    """
+    Préstamo masivo (mesa de circulación): varios libros para un mismo usuario
+    - Valida todos los libros en una sola consulta
+    - Crea los préstamos con bulk_create y marca los libros con un solo update()
+    - Todo dentro de una transacción: si otro préstamo se adelanta, no se presta nada
+    - Si se indica sucursal_id, solo se prestan libros de esa sucursal
+    Retorna (préstamos creados, títulos/IDs omitidos)
+    """
+    prestamo_activo = Prestamo.objects.filter(
+        libro=OuterRef('pk'),
+        fecha_devolucion_real__isnull=True
+    )
+    fecha_devolucion_esperada = timezone.now().date() + timedelta(days=dias_prestamo)
+
+    with transaction.atomic():
+        seleccionados = filtrar_por_sucursal(Libro.objects.filter(id__in=ids), sucursal_id).annotate(
+            tiene_prestamo=Exists(prestamo_activo)
+        ).values_list('id', 'titulo', 'disponible', 'tiene_prestamo', 'sucursal_id', 'genero')
+
+        validos, omitidos = [], []
+        sucursal_por_libro, genero_por_libro = {}, {}
+        encontrados = set()
+        for libro_id, titulo, disponible, tiene_prestamo, libro_sucursal_id, genero in seleccionados:
+            encontrados.add(libro_id)
+            if disponible and not tiene_prestamo:
+                validos.append(libro_id)
+                sucursal_por_libro[libro_id] = libro_sucursal_id
+                genero_por_libro[libro_id] = genero
+            else:
+                omitidos.append(titulo)
+        omitidos.extend(f'ID {libro_id} (no encontrado)' for libro_id in sorted(ids - encontrados))
+
+        # El update condicional confirma que nadie prestó estos libros mientras tanto
+        marcados = Libro.objects.filter(id__in=validos, disponible=True).update(
+            disponible=False,
+            fecha_actualizacion=timezone.now()
+        )
+        if marcados != len(validos):
+            raise OperacionMasivaError('Algunos libros fueron prestados por otra operación. Intenta nuevamente.')
+
+        prestamos = Prestamo.objects.bulk_create([
+            Prestamo(
+                usuario=usuario,
+                libro_id=libro_id,
+                sucursal_id=sucursal_por_libro[libro_id],
+                fecha_devolucion_esperada=fecha_devolucion_esperada
+            )
+            for libro_id in validos
+        ])
+        if prestamos:
+            registrar_eventos([eventos_prestamo(prestamo) for prestamo in prestamos])
+            sumar_prestamos(usuario.id, len(prestamos))
+            sumar_vencimientos([
+                (fecha_devolucion_esperada, genero_por_libro[libro_id], sucursal_por_libro[libro_id])
+                for libro_id in validos
+            ])
+            incrementar_version()
+    return prestamos, omitidos
+
+
+def devolver_libros(usuario, ids, sucursal_id=None):
+    """
+    Devolución masiva de los préstamos activos de un usuario
+    - Las multas ($1000 por día de atraso) se calculan en la base de datos con un
+      solo UPDATE ... CASE por fecha de vencimiento, no préstamo por préstamo
+    - Los libros vuelven a estar disponibles con un solo update()
+    - El resumen del usuario se actualiza en la misma transacción
+    - Si se indica sucursal_id, solo se devuelven préstamos de esa sucursal
+    Retorna (cantidad devuelta, multa total, IDs omitidos)
+    """
+    hoy = timezone.now().date()
+
+    with transaction.atomic():
+        activos = filtrar_por_sucursal(Prestamo.objects.filter(
+            usuario=usuario,
+            libro_id__in=ids,
+            fecha_devolucion_real__isnull=True
+        ), sucursal_id)
+        filas = list(activos.values_list('id', 'libro_id', 'fecha_devolucion_esperada', 'sucursal_id', 'libro__genero'))
+        prestamo_ids = [prestamo_id for prestamo_id, _, _, _, _ in filas]
+        libro_ids = {libro_id for _, libro_id, _, _, _ in filas}
+        omitidos = sorted(ids - libro_ids)
+
+        # Una rama WHEN por cada fecha de vencimiento atrasada
+        fechas_atrasadas = {fecha for _, _, fecha, _, _ in filas if fecha < hoy}
+        multa = Case(
+            *[
+                When(fecha_devolucion_esperada=fecha, then=Value(MULTA_POR_DIA * (hoy - fecha).days))
+                for fecha in fechas_atrasadas
+            ],
+            default=Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+        ahora = timezone.now()
+        Prestamo.objects.filter(id__in=prestamo_ids).update(
+            fecha_devolucion_real=hoy,
+            multa=multa,
+            fecha_actualizacion=ahora
+        )
+        Libro.objects.filter(id__in=libro_ids).update(disponible=True, fecha_actualizacion=ahora)
+
+        # La misma multa que calculó el CASE, para la bitácora y el total informado
+        multas = {
+            prestamo_id: MULTA_POR_DIA * (hoy - fecha).days if fecha < hoy else Decimal('0.00')
+            for prestamo_id, _, fecha, _, _ in filas
+        }
+        multa_total = sum(multas.values(), Decimal('0.00'))
+        if prestamo_ids:
+            registrar_eventos([
+                evento_
+                for prestamo_id, libro_id, _, prestamo_sucursal_id, _ in filas
+                for evento_ in eventos_devolucion(
+                    prestamo_id, usuario.id, libro_id, prestamo_sucursal_id, multas[prestamo_id]
+                )
+            ])
+            restar_devoluciones(usuario.id, [fecha for _, _, fecha, _, _ in filas], multa_total)
+            restar_vencimientos([(fecha, genero, sucursal) for _, _, fecha, sucursal, genero in filas])
+            incrementar_version()
+
+    return len(prestamo_ids), multa_total, omitidos
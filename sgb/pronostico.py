@@ -0,0 +1,183 @@
+from collections import Counter
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Libro, Prestamo, VencimientoHistograma
+from .sucursales import filtrar_por_sucursal
+
+# Máximo de libros por consulta en lote
+MAXIMO_LIBROS_LOTE = 500
+
+
+def _claves(filas):
+    # (fecha, género, sucursal) -> cantidad; sin sucursal se guarda como 0
+    return Counter((fecha, genero, sucursal_id or 0) for fecha, genero, sucursal_id in filas)
+
+
+def sumar_vencimientos(filas):
+    """
+    Suma al histograma los préstamos nuevos: filas de (fecha de vencimiento, género, sucursal_id)
+    Debe llamarse dentro de la transacción que crea los préstamos
+    Un update() con F() por cada combinación distinta, no uno por préstamo
+    """
+    claves = _claves(filas)
+    if not claves:
+        return
+    VencimientoHistograma.objects.bulk_create(
+        [VencimientoHistograma(fecha=fecha, genero=genero, sucursal_id=sucursal_id)
+         for fecha, genero, sucursal_id in claves],
+        ignore_conflicts=True
+    )
+    for (fecha, genero, sucursal_id), cantidad in claves.items():
+        VencimientoHistograma.objects.filter(fecha=fecha, genero=genero, sucursal_id=sucursal_id).update(
+            cantidad=F('cantidad') + cantidad
+        )
+
+
+def restar_vencimientos(filas):
+    """
+    Descuenta del histograma los préstamos devueltos (mismas filas que sumar_vencimientos)
+    Las filas que quedan en cero se eliminan
+    """
+    claves = _claves(filas)
+    for (fecha, genero, sucursal_id), cantidad in claves.items():
+        VencimientoHistograma.objects.filter(fecha=fecha, genero=genero, sucursal_id=sucursal_id).update(
+            cantidad=Greatest(F('cantidad') - cantidad, 0)
+        )
+    if claves:
+        VencimientoHistograma.objects.filter(
+            fecha__in={fecha for fecha, _, _ in claves}, cantidad=0
+        ).delete()
+
+
+def filas_prestamos_activos(libro_ids):
+    """
+    Filas del histograma de los préstamos activos de estos libros (con su género actual)
+    Se usa antes de cambiar el género de libros prestados
+    """
+    return list(
+        Prestamo.objects.filter(
+            libro_id__in=libro_ids,
+            fecha_devolucion_real__isnull=True
+        ).values_list('fecha_devolucion_esperada', 'libro__genero', 'sucursal_id')
+    )
+
+
+def reconstruir_histograma():
+    """
+    Recalcula el histograma completo desde los préstamos activos (una consulta agrupada)
+    Corrige diferencias por cambios hechos fuera de las vistas (admin, update() manuales)
+    Retorna la cantidad de filas del histograma
+    """
+    filas = Prestamo.objects.filter(
+        fecha_devolucion_real__isnull=True
+    ).order_by().values('fecha_devolucion_esperada', 'libro__genero', 'sucursal_id').annotate(total=Count('id'))
+
+    # Lectura y reemplazo en la misma transacción: los lectores nunca ven el histograma
+    # vacío y un préstamo concurrente no se cuela entre el conteo y el bulk_create
+    with transaction.atomic():
+        conteos = Counter()
+        for fila in filas:
+            conteos[(fila['fecha_devolucion_esperada'], fila['libro__genero'], fila['sucursal_id'] or 0)] += fila['total']
+
+        VencimientoHistograma.objects.all().delete()
+        VencimientoHistograma.objects.bulk_create([
+            VencimientoHistograma(fecha=fecha, genero=genero, sucursal_id=sucursal_id, cantidad=cantidad)
+            for (fecha, genero, sucursal_id), cantidad in conteos.items()
+        ], batch_size=1000)
+    return len(conteos)
+
+
+def pronosticar_libros(libro_ids, sucursal_id=None, hoy=None):
+    """
+    Pronóstico de disponibilidad para muchos libros a la vez (3 consultas en total)
+    - Un título puede tener varias copias (libros con el mismo título y autor)
+    - Si alguna copia está disponible, el título está disponible ahora
+    - Si no, la fecha estimada es el vencimiento más próximo entre sus copias prestadas
+      (si ese préstamo ya está atrasado, se informa como atrasado)
+    Retorna {libro_id: {...}} solo para los libros que existen (en la sucursal, si se indica)
+    """
+    hoy = hoy or timezone.now().date()
+    libros = list(
+        filtrar_por_sucursal(Libro.objects.filter(id__in=libro_ids), sucursal_id).values_list('id', 'titulo', 'autor')
+    )
+    if not libros:
+        return {}
+
+    # Todas las copias de los títulos pedidos
+    titulos = {(titulo, autor) for _, titulo, autor in libros}
+    copias = [
+        copia for copia in filtrar_por_sucursal(
+            Libro.objects.filter(titulo__in={titulo for titulo, _ in titulos}), sucursal_id
+        ).values_list('id', 'titulo', 'autor', 'disponible')
+        if (copia[1], copia[2]) in titulos
+    ]
+
+    # Vencimiento del préstamo activo de cada copia (índice parcial prestamo_activo_libro_idx)
+    vencimientos = dict(
+        Prestamo.objects.filter(
+            libro_id__in=[copia_id for copia_id, _, _, _ in copias],
+            fecha_devolucion_real__isnull=True
+        ).values_list('libro_id', 'fecha_devolucion_esperada')
+    )
+
+    por_titulo = {}
+    for copia_id, titulo, autor, disponible in copias:
+        resumen = por_titulo.setdefault((titulo, autor), {'copias': 0, 'disponibles': 0, 'vencimientos': []})
+        resumen['copias'] += 1
+        if copia_id in vencimientos:
+            resumen['vencimientos'].append(vencimientos[copia_id])
+        elif disponible:
+            resumen['disponibles'] += 1
+
+    resultado = {}
+    for libro_id, titulo, autor in libros:
+        resumen = por_titulo[(titulo, autor)]
+        proxima = min(resumen['vencimientos'], default=None)
+        resultado[libro_id] = {
+            'libro_id': libro_id,
+            'titulo': titulo,
+            'autor': autor,
+            'copias': resumen['copias'],
+            'copias_disponibles': resumen['disponibles'],
+            'copias_prestadas': len(resumen['vencimientos']),
+            'disponible_ahora': resumen['disponibles'] > 0,
+            'fecha_estimada': None if resumen['disponibles'] or proxima is None else max(proxima, hoy),
+            'atrasado': not resumen['disponibles'] and proxima is not None and proxima < hoy,
+        }
+    return resultado
+
+
+def vencimientos_por_genero(desde, hasta, genero=None, sucursal_id=None):
+    """
+    Copias que vuelven entre 'desde' y 'hasta' (inclusive), desde el histograma precalculado
+    Retorna el total, el detalle por género y el calendario por día
+    """
+    filas = VencimientoHistograma.objects.filter(fecha__range=(desde, hasta))
+    if genero:
+        filas = filas.filter(genero=genero)
+    if sucursal_id is not None:
+        filas = filas.filter(sucursal_id=sucursal_id)
+
+    nombres = dict(Libro.GENEROS)
+    por_genero = [
+        {'genero': fila['genero'], 'nombre': nombres.get(fila['genero'], fila['genero']), 'cantidad': fila['total']}
+        for fila in filas.order_by().values('genero').annotate(total=Sum('cantidad')).order_by('-total')
+    ]
+    por_dia = {
+        fila['fecha']: fila['total']
+        for fila in filas.order_by().values('fecha').annotate(total=Sum('cantidad'))
+    }
+    calendario = [
+        {'fecha': desde + timedelta(days=dias), 'cantidad': por_dia.get(desde + timedelta(days=dias), 0)}
+        for dias in range((hasta - desde).days + 1)
+    ]
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'total': sum(item['cantidad'] for item in por_genero),
+        'por_genero': por_genero,
+        'por_dia': calendario,
+    }
@@ -0,0 +1,143 @@
+from decimal import Decimal
+from django.db import transaction
+from .models import EstadisticaLibro, EventoCirculacion, Libro, OffsetProyeccion
+
+# Proyecciones registradas: nombre -> instancia
+PROYECCIONES = {}
+
+TAMANO_LOTE = 1000
+
+
+def registrar_proyeccion(clase):
+    """
+    Decorador para registrar una proyección de la bitácora de circulación
+    """
+    PROYECCIONES[clase.nombre] = clase()
+    return clase
+
+
+class Proyeccion:
+    """
+    Almacén derivado que consume la bitácora de forma incremental
+    - procesar(eventos): aplica un lote de eventos (ordenados por ID)
+    - reiniciar(): borra el almacén, para reconstruirlo repitiendo la bitácora
+    """
+    nombre = None
+    tipos = None  # Tipos de evento que le interesan (None = todos)
+
+    def procesar(self, eventos):
+        raise NotImplementedError
+
+    def reiniciar(self):
+        raise NotImplementedError
+
+
+def actualizar_proyeccion(proyeccion, tamano_lote=TAMANO_LOTE):
+    """
+    Procesa los eventos nuevos desde el offset guardado, lote por lote
+    Cada lote y el avance del offset se guardan en la misma transacción,
+    así un fallo a mitad de camino no procesa eventos dos veces
+    Retorna la cantidad de eventos procesados
+    """
+    offset, _ = OffsetProyeccion.objects.get_or_create(nombre=proyeccion.nombre)
+    procesados = 0
+
+    while True:
+        with transaction.atomic():
+            eventos = EventoCirculacion.objects.filter(id__gt=offset.ultimo_evento_id).order_by('id')
+            lote = list(eventos[:tamano_lote])
+            if not lote:
+                break
+            relevantes = [e for e in lote if proyeccion.tipos is None or e.tipo in proyeccion.tipos]
+            if relevantes:
+                proyeccion.procesar(relevantes)
+            offset.ultimo_evento_id = lote[-1].id
+            offset.save(update_fields=['ultimo_evento_id', 'fecha_actualizacion'])
+        procesados += len(lote)
+
+    return procesados
+
+
+def reconstruir_proyeccion(proyeccion, tamano_lote=TAMANO_LOTE):
+    """
+    Borra el almacén derivado y lo vuelve a construir repitiendo toda la bitácora
+    """
+    with transaction.atomic():
+        proyeccion.reiniciar()
+        OffsetProyeccion.objects.update_or_create(nombre=proyeccion.nombre, defaults={'ultimo_evento_id': 0})
+    return actualizar_proyeccion(proyeccion, tamano_lote)
+
+
+@registrar_proyeccion
+class EstadisticasLibros(Proyeccion):
+    """
+    Totales de préstamos, devoluciones y multas por libro
+    """
+    nombre = 'estadisticas_libros'
+    tipos = {EventoCirculacion.PRESTAMO, EventoCirculacion.DEVOLUCION, EventoCirculacion.LIBRO_ELIMINADO}
+
+    def procesar(self, eventos):
+        libro_ids = {e.libro_id for e in eventos if e.libro_id is not None}
+        filas = EstadisticaLibro.objects.in_bulk(libro_ids)
+        eliminados = set()
+
+        for e in eventos:
+            if e.libro_id is None:
+                continue
+            if e.tipo == EventoCirculacion.LIBRO_ELIMINADO:
+                filas.pop(e.libro_id, None)
+                eliminados.add(e.libro_id)
+                continue
+            eliminados.discard(e.libro_id)
+            fila = filas.setdefault(e.libro_id, EstadisticaLibro(libro_id=e.libro_id))
+            if e.tipo == EventoCirculacion.PRESTAMO:
+                fila.prestamos += 1
+                fila.ultimo_prestamo = e.fecha
+            elif e.tipo == EventoCirculacion.DEVOLUCION:
+                fila.devoluciones += 1
+                fila.multas += Decimal(e.datos.get('multa', '0'))
+
+        if eliminados:
+            EstadisticaLibro.objects.filter(libro_id__in=eliminados).delete()
+        if filas:
+            EstadisticaLibro.objects.bulk_create(
+                filas.values(),
+                update_conflicts=True,
+                unique_fields=['libro_id'],
+                update_fields=['prestamos', 'devoluciones', 'multas', 'ultimo_prestamo'],
+            )
+
+    def reiniciar(self):
+        EstadisticaLibro.objects.all().delete()
+
+
+def mas_prestados(libros, limite=10):
+    """
+    Ranking histórico de los libros más prestados entre 'libros' (un queryset de Libro)
+    Lee la proyección EstadisticaLibro, que va como máximo un minuto atrás de la bitácora,
+    en vez de agrupar la tabla de préstamos: 2 consultas
+    """
+    filas = list(
+        EstadisticaLibro.objects
+        .filter(libro_id__in=libros.values('id'), prestamos__gt=0)
+        .order_by('-prestamos', 'libro_id')[:limite]
+    )
+    titulos = dict(Libro.objects.filter(id__in=[f.libro_id for f in filas]).values_list('id', 'titulo'))
+    return [
+        {
+            'libro_id': f.libro_id,
+            'titulo': titulos.get(f.libro_id, ''),
+            'prestamos': f.prestamos,
+            'devoluciones': f.devoluciones,
+            'multas': f.multas,
+            'ultimo_prestamo': f.ultimo_prestamo,
+        }
+        for f in filas
+    ]
+
+
+def actualizar_todas():
+    """
+    Pone al día todas las proyecciones registradas
+    """
+    return {nombre: actualizar_proyeccion(p) for nombre, p in PROYECCIONES.items()}
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .models import Prestamo, Recordatorio
+
+# Préstamos leídos por bloque del iterador y correos enviados por lote
+TAMANO_BLOQUE = 2000
+TAMANO_LOTE_CORREOS = 200
+
+
+def prestamos_a_recordar(hoy, dias_aviso):
+    """
+    Préstamos activos que vencen hasta dentro de 'dias_aviso' días (o ya vencidos)
+    y que todavía no tienen recordatorio enviado hoy
+    Usa el índice parcial prestamo_activo_vence_idx y un anti-join con Recordatorio
+    """
+    ya_enviado = Recordatorio.objects.filter(prestamo=OuterRef('pk'), fecha_envio=hoy)
+
+    return Prestamo.objects.filter(
+        fecha_devolucion_real__isnull=True,
+        fecha_devolucion_esperada__lte=hoy + timedelta(days=dias_aviso),
+    ).exclude(
+        usuario__email=''
+    ).exclude(
+        Exists(ya_enviado)
+    ).order_by('usuario_id', 'fecha_devolucion_esperada').values_list(
+        'id', 'usuario_id', 'usuario__email', 'usuario__first_name', 'usuario__username',
+        'libro__titulo', 'fecha_devolucion_esperada',
+    )
+
+
+def construir_resumen(filas, hoy):
+    """
+    Arma el correo resumen de un usuario a partir de sus filas de préstamos
+    Retorna (mensaje, recordatorios a registrar)
+    """
+    vencidos, por_vencer, recordatorios = [], [], []
+    _, _, email, nombre, username, _, _ = filas[0]
+
+    for prestamo_id, _, _, _, _, titulo, fecha in filas:
+        dias = (fecha - hoy).days
+        if dias < 0:
+            vencidos.append({'titulo': titulo, 'fecha': fecha, 'dias': -dias})
+            tipo = Recordatorio.VENCIDO
+        else:
+            por_vencer.append({'titulo': titulo, 'fecha': fecha, 'dias': dias})
+            tipo = Recordatorio.POR_VENCER
+        recordatorios.append(Recordatorio(prestamo_id=prestamo_id, tipo=tipo, fecha_envio=hoy))
+
+    cuerpo = render_to_string('emails/recordatorio_prestamos.txt', {
+        'nombre': nombre or username,
+        'vencidos': vencidos,
+        'por_vencer': por_vencer,
+    })
+    asunto = 'Tienes préstamos vencidos' if vencidos else 'Tus préstamos están por vencer'
+    mensaje = EmailMessage(f'📚 Biblioteca MJV: {asunto}', cuerpo, settings.DEFAULT_FROM_EMAIL, [email])
+    return mensaje, recordatorios
+
+
+def _enviar_lote(conexion, mensajes, recordatorios):
+    """
+    Envía un lote de correos por la conexión compartida y registra los recordatorios
+    Solo se registran después de enviar, así un fallo permite reintentar el lote
+    """
+    conexion.send_messages(mensajes)
+    Recordatorio.objects.bulk_create(recordatorios, ignore_conflicts=True)
+
+
+def enviar_recordatorios(dias_aviso=2, hoy=None):
+    """
+    Envía UN correo resumen por usuario con sus préstamos vencidos y por vencer
+    - Recorre los préstamos con un iterador por bloques (no carga todo en memoria)
+    - Reutiliza una sola conexión de correo para todo el proceso
+    - Es idempotente: volver a ejecutarlo el mismo día no repite avisos
+    Retorna la cantidad de correos enviados
+    """
+    hoy = hoy or timezone.now().date()
+    filas = prestamos_a_recordar(hoy, dias_aviso).iterator(chunk_size=TAMANO_BLOQUE)
+
+    enviados = 0
+    mensajes, recordatorios = [], []
+    with get_connection() as conexion:
+        # Las filas vienen ordenadas por usuario, así groupby arma un resumen por usuario
+        for _, filas_usuario in groupby(filas, key=lambda fila: fila[1]):
+            mensaje, nuevos = construir_resumen(list(filas_usuario), hoy)
+            mensajes.append(mensaje)
+            recordatorios.extend(nuevos)
+
+            if len(mensajes) >= TAMANO_LOTE_CORREOS:
+                _enviar_lote(conexion, mensajes, recordatorios)
+                enviados += len(mensajes)
+                mensajes, recordatorios = [], []
+
+        if mensajes:
+            _enviar_lote(conexion, mensajes, recordatorios)
+            enviados += len(mensajes)
+
+    return enviados
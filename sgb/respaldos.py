@@ -0,0 +1,254 @@
+"""
+Respaldos en línea de la base de datos SQLite
+
+- Copia la base con la API de backup de SQLite por bloques de páginas, con una pausa
+  entre bloques para que las escrituras (préstamos, devoluciones) no queden esperando
+- Cada respaldo se guarda como un manifiesto (JSON) + bloques de tamaño fijo
+  identificados por su hash: los bloques que no cambiaron se reutilizan (incremental)
+- Los bloques se guardan comprimidos con gzip
+- La retención elimina los manifiestos antiguos y los bloques que ya nadie usa
+- La instantánea y la retención se hacen con un lock de archivo: la tarea diaria y un
+  backup_db manual no pueden borrarse bloques entre sí
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+TAMANO_BLOQUE = 1024 * 1024  # 1 MiB
+
+
+class RespaldoError(Exception):
+    """Error al crear, verificar o restaurar un respaldo"""
+
+
+def ruta_base_datos():
+    base = settings.DATABASES['default']
+    if base['ENGINE'] != 'django.db.backends.sqlite3':
+        raise RespaldoError('Los respaldos en línea solo están disponibles para SQLite')
+    return str(base['NAME'])
+
+
+def directorio_respaldos():
+    return Path(getattr(settings, 'RESPALDOS_DIR', settings.BASE_DIR / 'respaldos'))
+
+
+def copiar_en_linea(origen, destino, paginas=256, pausa=0.005, progreso=None):
+    """
+    Copia la base 'origen' al archivo 'destino' sin detener el tráfico
+    La API de backup reinicia la copia si otra conexión escribe entre pasos,
+    por eso la pausa entre bloques debe ser corta
+    """
+    fuente = sqlite3.connect(origen, timeout=30)
+    copia = sqlite3.connect(destino)
+    try:
+        with copia:
+            fuente.backup(copia, pages=paginas, progress=progreso, sleep=pausa)
+    finally:
+        copia.close()
+        fuente.close()
+
+
+def verificar_integridad(ruta):
+    """
+    Ejecuta PRAGMA integrity_check y retorna la lista de problemas (vacía si está sana)
+    """
+    conexion = sqlite3.connect(ruta)
+    try:
+        resultado = [fila[0] for fila in conexion.execute('PRAGMA integrity_check')]
+    finally:
+        conexion.close()
+    return [] if resultado == ['ok'] else resultado
+
+
+@contextmanager
+def bloqueo_respaldos(directorio):
+    """
+    Lock exclusivo sobre el directorio de respaldos (espera si otro proceso lo tiene)
+    Se libera al salir del bloque o si el proceso termina
+    """
+    with open(directorio / '.bloqueo', 'w') as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def _ruta_bloque(directorio, digest):
+    return directorio / 'bloques' / digest[:2] / f'{digest}.gz'
+
+
+def guardar_instantanea(archivo, directorio, comprimir=True):
+    """
+    Divide el archivo en bloques, guarda solo los bloques nuevos y escribe el manifiesto
+    Retorna (ruta del manifiesto, bloques nuevos, bloques totales)
+    """
+    bloques, nuevos = [], 0
+    hash_total = hashlib.sha256()
+
+    with open(archivo, 'rb') as entrada:
+        while True:
+            datos = entrada.read(TAMANO_BLOQUE)
+            if not datos:
+                break
+            hash_total.update(datos)
+            digest = hashlib.sha256(datos).hexdigest()
+            bloques.append(digest)
+
+            ruta = _ruta_bloque(directorio, digest)
+            if not ruta.exists():
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                temporal = ruta.with_suffix('.tmp')
+                with open(temporal, 'wb') as salida:
+                    salida.write(gzip.compress(datos, compresslevel=6 if comprimir else 0, mtime=0))
+                os.replace(temporal, ruta)
+                nuevos += 1
+
+    fecha = timezone.now()
+    manifiesto = {
+        'fecha': fecha.isoformat(),
+        'tamano': os.path.getsize(archivo),
+        'sha256': hash_total.hexdigest(),
+        'tamano_bloque': TAMANO_BLOQUE,
+        'bloques': bloques,
+    }
+    ruta_manifiesto = directorio / f"respaldo-{fecha:%Y%m%d-%H%M%S-%f}.json"
+    with open(ruta_manifiesto, 'w') as salida:
+        json.dump(manifiesto, salida)
+    return ruta_manifiesto, nuevos, len(bloques)
+
+
+def listar_respaldos(directorio=None):
+    directorio = directorio or directorio_respaldos()
+    return sorted(directorio.glob('respaldo-*.json'))
+
+
+def restaurar(ruta_manifiesto, destino):
+    """
+    Reconstruye el archivo de base de datos de un respaldo y valida su hash
+    No toca la base en uso: escribe en 'destino'
+    """
+    ruta_manifiesto = Path(ruta_manifiesto)
+    with open(ruta_manifiesto) as entrada:
+        manifiesto = json.load(entrada)
+
+    hash_total = hashlib.sha256()
+    with open(destino, 'wb') as salida:
+        for digest in manifiesto['bloques']:
+            ruta = _ruta_bloque(ruta_manifiesto.parent, digest)
+            if not ruta.exists():
+                raise RespaldoError(f'Falta el bloque {digest} del respaldo {ruta_manifiesto.name}')
+            with open(ruta, 'rb') as entrada:
+                datos = gzip.decompress(entrada.read())
+            hash_total.update(datos)
+            salida.write(datos)
+
+    if hash_total.hexdigest() != manifiesto['sha256']:
+        raise RespaldoError(f'El respaldo {ruta_manifiesto.name} está corrupto (hash distinto)')
+    return manifiesto
+
+
+def verificar_restauracion(ruta_manifiesto):
+    """
+    Restaura el respaldo en un archivo temporal y ejecuta el chequeo de integridad
+    Retorna (manifiesto, problemas encontrados, conteo de filas por tabla)
+    """
+    descriptor, temporal = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(descriptor)
+    try:
+        manifiesto = restaurar(ruta_manifiesto, temporal)
+        problemas = verificar_integridad(temporal)
+        conexion = sqlite3.connect(temporal)
+        try:
+            tablas = [fila[0] for fila in conexion.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'sgb_%' ORDER BY name"
+            )]
+            conteos = {tabla: conexion.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0] for tabla in tablas}
+        finally:
+            conexion.close()
+        return manifiesto, problemas, conteos
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(temporal + sufijo):
+                os.remove(temporal + sufijo)
+
+
+def aplicar_retencion(conservar, directorio=None):
+    """
+    Conserva los 'conservar' respaldos más recientes y borra los bloques huérfanos
+    Retorna (manifiestos eliminados, bloques eliminados)
+    """
+    directorio = directorio or directorio_respaldos()
+    manifiestos = listar_respaldos(directorio)
+    antiguos = manifiestos[:-conservar] if conservar > 0 else []
+    for ruta in antiguos:
+        ruta.unlink()
+
+    en_uso = set()
+    for ruta in listar_respaldos(directorio):
+        with open(ruta) as entrada:
+            en_uso.update(json.load(entrada)['bloques'])
+
+    bloques_eliminados = 0
+    for ruta in (directorio / 'bloques').glob('*/*.gz'):
+        if ruta.stem not in en_uso:
+            ruta.unlink()
+            bloques_eliminados += 1
+    return len(antiguos), bloques_eliminados
+
+
+def crear_respaldo(paginas=256, pausa=0.005, comprimir=True, verificar=True, conservar=None):
+    """
+    Respaldo completo del proceso: copia en línea, chequeo de integridad,
+    instantánea incremental y retención
+    Retorna un diccionario con el resumen
+    """
+    directorio = directorio_respaldos()
+    directorio.mkdir(parents=True, exist_ok=True)
+    conservar = getattr(settings, 'RESPALDOS_CONSERVAR', 7) if conservar is None else conservar
+
+    descriptor, temporal = tempfile.mkstemp(suffix='.sqlite3', dir=directorio)
+    os.close(descriptor)
+    inicio = time.monotonic()
+    try:
+        copiar_en_linea(ruta_base_datos(), temporal, paginas=paginas, pausa=pausa)
+        duracion_copia = time.monotonic() - inicio
+
+        if verificar:
+            problemas = verificar_integridad(temporal)
+            if problemas:
+                raise RespaldoError('La copia no pasó el chequeo de integridad: ' + '; '.join(problemas[:5]))
+
+        # Sin el lock, la retención de otro respaldo en curso podría borrar bloques
+        # recién escritos por este antes de que se guarde su manifiesto
+        with bloqueo_respaldos(directorio):
+            manifiesto, nuevos, total = guardar_instantanea(temporal, directorio, comprimir=comprimir)
+            eliminados, bloques_eliminados = aplicar_retencion(conservar, directorio)
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(temporal + sufijo):
+                os.remove(temporal + sufijo)
+
+    return {
+        'manifiesto': manifiesto,
+        'bloques_nuevos': nuevos,
+        'bloques_totales': total,
+        'duracion_copia': duracion_copia,
+        'respaldos_eliminados': eliminados,
+        'bloques_eliminados': bloques_eliminados,
+    }
@@ -0,0 +1,151 @@
+import threading
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import Prestamo, ResumenUsuario
+
+
+def _asegurar_filas(usuario_ids):
+    # INSERT ... ON CONFLICT DO NOTHING: crea las filas que falten sin consultar antes
+    ResumenUsuario.objects.bulk_create(
+        [ResumenUsuario(usuario_id=usuario_id) for usuario_id in usuario_ids],
+        ignore_conflicts=True
+    )
+
+
+def sumar_prestamos(usuario_id, cantidad):
+    """
+    Suma préstamos nuevos al resumen del usuario
+    Debe llamarse dentro de la transacción que crea los préstamos
+    El update() con F() es atómico: dos préstamos simultáneos no se pisan
+    """
+    if not cantidad:
+        return
+    _asegurar_filas([usuario_id])
+    ResumenUsuario.objects.filter(usuario_id=usuario_id).update(
+        prestamos_totales=F('prestamos_totales') + cantidad,
+        prestamos_activos=F('prestamos_activos') + cantidad,
+        fecha_actualizacion=timezone.now()
+    )
+
+
+def restar_devoluciones(usuario_id, vencimientos, multas):
+    """
+    Descuenta devoluciones del resumen del usuario con update() y F(), sin recorrer su historial
+    - vencimientos: fecha de devolución esperada de cada préstamo devuelto
+    - multas: total cobrado en esas devoluciones
+    De 'vencidos' solo se descuentan los préstamos que ya estaban atrasados en el último
+    conteo (vencidos_al); los que vencieron después todavía no se habían sumado
+    Debe llamarse dentro de la transacción que registra las devoluciones
+    """
+    if not vencimientos:
+        return
+    resumen = ResumenUsuario.objects.filter(usuario_id=usuario_id)
+    contados_al = resumen.values_list('vencidos_al', flat=True).first()
+    contados = sum(1 for fecha in vencimientos if contados_al and fecha < contados_al)
+    resumen.update(
+        prestamos_activos=Greatest(F('prestamos_activos') - len(vencimientos), 0),
+        vencidos=Greatest(F('vencidos') - contados, 0),
+        multas_total=F('multas_total') + multas,
+        fecha_actualizacion=timezone.now()
+    )
+
+
+def recalcular_resumenes(usuario_ids=None):
+    """
+    Reconstruye los resúmenes desde la tabla de préstamos con una consulta agrupada
+    - Con usuario_ids: solo esos usuarios (préstamos eliminados)
+    - Sin usuario_ids: todos (python manage.py resumenes, para corregir diferencias)
+    Los usuarios sin préstamos quedan en cero
+    Retorna la cantidad de resúmenes escritos
+    """
+    hoy = timezone.now().date()
+    prestamos = Prestamo.objects.all()
+    if usuario_ids is not None:
+        prestamos = prestamos.filter(usuario_id__in=usuario_ids)
+
+    activos = Q(fecha_devolucion_real__isnull=True)
+    filas = prestamos.order_by().values('usuario_id').annotate(
+        totales=Count('id'),
+        activos=Count('id', filter=activos),
+        vencidos=Count('id', filter=activos & Q(fecha_devolucion_esperada__lt=hoy)),
+        multas=Coalesce(Sum('multa', filter=~activos), Decimal('0.00')),
+    )
+    resumenes = [
+        ResumenUsuario(
+            usuario_id=fila['usuario_id'],
+            prestamos_totales=fila['totales'],
+            prestamos_activos=fila['activos'],
+            vencidos=fila['vencidos'],
+            multas_total=fila['multas'],
+            vencidos_al=hoy,
+            fecha_actualizacion=timezone.now(),
+        )
+        for fila in filas
+    ]
+    ResumenUsuario.objects.bulk_create(
+        resumenes,
+        update_conflicts=True,
+        unique_fields=['usuario'],
+        update_fields=[
+            'prestamos_totales', 'prestamos_activos', 'vencidos', 'multas_total', 'vencidos_al', 'fecha_actualizacion'
+        ],
+    )
+    sin_prestamos = ResumenUsuario.objects.exclude(usuario_id__in=prestamos.values('usuario_id'))
+    if usuario_ids is not None:
+        sin_prestamos = sin_prestamos.filter(usuario_id__in=usuario_ids)
+    sin_prestamos.update(
+        prestamos_totales=0, prestamos_activos=0, vencidos=0, multas_total=Decimal('0.00'), vencidos_al=hoy,
+        fecha_actualizacion=timezone.now()
+    )
+    return len(resumenes)
+
+
+# Préstamos eliminados (en cascada al borrar libros o usuarios, o desde el admin):
+# el resumen de sus usuarios se recalcula una vez al confirmar la transacción
+_pendientes = threading.local()
+
+
+def _recalcular_pendientes():
+    usuario_ids = getattr(_pendientes, 'usuarios', set())
+    _pendientes.usuarios = set()
+    if usuario_ids:
+        recalcular_resumenes(usuario_ids)
+
+
+@receiver(post_delete, sender=Prestamo)
+def _prestamo_eliminado(sender, instance, **kwargs):
+    if not hasattr(_pendientes, 'usuarios'):
+        _pendientes.usuarios = set()
+    _pendientes.usuarios.add(instance.usuario_id)
+    transaction.on_commit(_recalcular_pendientes)
+
+
+def actualizar_vencidos(hoy=None):
+    """
+    Recalcula solo el contador de vencidos (cambia al pasar los días sin que haya operaciones)
+    Usa el índice parcial de préstamos activos; los usuarios sin atrasos quedan en 0
+    Los usuarios con atrasos guardan el día del conteo (vencidos_al), que usa restar_devoluciones
+    Retorna la cantidad de usuarios con préstamos vencidos
+    """
+    hoy = hoy or timezone.now().date()
+    por_usuario = dict(
+        Prestamo.objects.filter(
+            fecha_devolucion_real__isnull=True,
+            fecha_devolucion_esperada__lt=hoy
+        ).order_by().values('usuario_id').annotate(total=Count('id')).values_list('usuario_id', 'total')
+    )
+    ResumenUsuario.objects.exclude(usuario_id__in=list(por_usuario)).exclude(vencidos=0).update(vencidos=0)
+    _asegurar_filas(por_usuario)
+
+    # Un update() por cada cantidad distinta de vencidos, no uno por usuario
+    usuarios_por_total = {}
+    for usuario_id, total in por_usuario.items():
+        usuarios_por_total.setdefault(total, []).append(usuario_id)
+    for total, usuario_ids in usuarios_por_total.items():
+        ResumenUsuario.objects.filter(usuario_id__in=usuario_ids).update(vencidos=total, vencidos_al=hoy)
+    return len(por_usuario)
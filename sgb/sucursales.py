@@ -0,0 +1,17 @@
+def sucursal_del_usuario(usuario):
+    """
+    Retorna el ID de la sucursal del usuario, o None si no tiene una asignada
+    (usuarios sin sucursal, como los administradores, ven todas las sucursales)
+    """
+    perfil = getattr(usuario, 'perfil', None)
+    return perfil.sucursal_id if perfil is not None else None
+
+
+def filtrar_por_sucursal(queryset, sucursal_id, campo='sucursal_id'):
+    """
+    Restringe un queryset a una sucursal usando los índices por sucursal
+    campo permite filtrar a través de relaciones (por ejemplo 'libro__sucursal_id')
+    """
+    if sucursal_id is None:
+        return queryset
+    return queryset.filter(**{campo: sucursal_id})
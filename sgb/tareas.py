@@ -0,0 +1,115 @@
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from tareas.registro import tarea
+from .eventos import evento, registrar_eventos
+from .models import MULTA_POR_DIA, EventoCirculacion, Libro, Prestamo
+from .versionado import incrementar_version
+
+
+@tarea(cada=timedelta(days=1))
+def acumular_multas():
+    """
+    Actualiza la multa acumulada de los préstamos activos vencidos ($1000 por día)
+    Se hace un update() por cada fecha de vencimiento distinta, no uno por préstamo,
+    y cada préstamo cuya multa cambia queda en la bitácora (un solo INSERT)
+    """
+    hoy = timezone.now().date()
+    vencidos = Prestamo.objects.filter(
+        fecha_devolucion_real__isnull=True,
+        fecha_devolucion_esperada__lt=hoy
+    )
+    fechas = vencidos.values_list('fecha_devolucion_esperada', flat=True).distinct().order_by()
+
+    eventos = []
+    with transaction.atomic():
+        for fecha in fechas:
+            multa = MULTA_POR_DIA * (hoy - fecha).days
+            cambian = vencidos.filter(fecha_devolucion_esperada=fecha).exclude(multa=multa)
+            filas = list(cambian.values_list('id', 'usuario_id', 'libro_id', 'sucursal_id'))
+            Prestamo.objects.filter(id__in=[fila[0] for fila in filas]).update(
+                multa=multa,
+                fecha_actualizacion=timezone.now()
+            )
+            eventos.extend(
+                evento(EventoCirculacion.MULTA_ACUMULADA, usuario_id=usuario_id, libro_id=libro_id,
+                       prestamo_id=prestamo_id, sucursal_id=sucursal_id, monto=str(multa))
+                for prestamo_id, usuario_id, libro_id, sucursal_id in filas
+            )
+        if eventos:
+            registrar_eventos(eventos)
+            incrementar_version()
+    return len(eventos)
+
+
+@tarea(cada=timedelta(hours=1))
+def reconciliar_disponibilidad():
+    """
+    Corrige libros marcados como disponibles que tienen un préstamo activo
+    (no toca libros marcados como no disponibles a mano por un bibliotecario)
+    """
+    con_prestamo_activo = Prestamo.objects.filter(
+        fecha_devolucion_real__isnull=True
+    ).values('libro_id')
+    corregidos = Libro.objects.filter(disponible=True, id__in=con_prestamo_activo).update(
+        disponible=False,
+        fecha_actualizacion=timezone.now()
+    )
+    if corregidos:
+        incrementar_version()
+    return corregidos
+
+
+@tarea(cada=timedelta(days=1))
+def enviar_recordatorios_prestamos(dias_aviso=2):
+    """
+    Envía el resumen diario de préstamos vencidos y por vencer a cada usuario
+    """
+    from .recordatorios import enviar_recordatorios
+    return enviar_recordatorios(dias_aviso=dias_aviso)
+
+
+@tarea(cada=timedelta(days=1))
+def actualizar_vencidos_resumen():
+    """
+    Recalcula los préstamos vencidos del resumen de cada usuario (historial y multas)
+    """
+    from .resumenes import actualizar_vencidos
+    return actualizar_vencidos()
+
+
+@tarea(cada=timedelta(days=1))
+def reconstruir_histograma_vencimientos():
+    """
+    Recalcula el histograma de vencimientos (corrige cambios hechos desde el admin)
+    """
+    from .pronostico import reconstruir_histograma
+    return reconstruir_histograma()
+
+
+@tarea(cada=timedelta(days=1))
+def consolidar_analitica():
+    """
+    Consolida los días cerrados en las tablas de resumen de la analítica
+    """
+    from .analitica import consolidar_dias
+    return consolidar_dias()
+
+
+@tarea(cada=timedelta(minutes=1))
+def actualizar_proyecciones():
+    """
+    Pone al día los almacenes derivados con los eventos nuevos de la bitácora
+    """
+    from .proyecciones import actualizar_todas
+    return actualizar_todas()
+
+
+@tarea(cada=timedelta(days=1), max_intentos=2)
+def respaldar_base_datos():
+    """
+    Respaldo diario incremental de la base de datos (con retención)
+    """
+    from .respaldos import crear_respaldo
+    resumen = crear_respaldo()
+    return resumen['manifiesto'].name
@@ -1,3 +1,718 @@
-from django.test import TestCase
+import gzip
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from usuarios.models import PerfilUsuario
+from . import analitica, respaldos
+from .models import (
+    MULTA_POR_DIA, CirculacionDiaria, EstadisticaLibro, EventoCirculacion, Libro, OffsetProyeccion, Prestamo,
+    PrestamosLibroDiario, Recordatorio, ResumenUsuario, Sucursal, VencimientoHistograma
+)
+from .facetas import calcular_facetas, filtrar_busqueda, filtrar_facetas
+from .operaciones_masivas import devolver_libros, editar_libros, eliminar_libros, prestar_libros
+from .pronostico import reconstruir_histograma
+from .proyecciones import PROYECCIONES, actualizar_proyeccion, reconstruir_proyeccion
+from .recordatorios import construir_resumen, enviar_recordatorios
+from .resumenes import actualizar_vencidos, recalcular_resumenes
+from .tareas import acumular_multas
 
-# Create your tests here.
+# Hash barato para que crear usuarios no domine el tiempo de los tests
+HASHERS_RAPIDOS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def crear_usuario(username, rol='lector', sucursal=None):
+    usuario = User.objects.create_user(username, password='clave-segura-123')
+    PerfilUsuario.objects.create(
+        usuario=usuario, rut=f'{username}-K', direccion='Calle 1', telefono='123', rol=rol, sucursal=sucursal
+    )
+    return usuario
+
+
+class RecordatoriosTests(TestCase):
+    """
+    - Correo resumen de préstamos (recordatorios.py)
+    """
+
+    def test_texto_plano_sin_escapar(self):
+        hoy = timezone.now().date()
+        filas = [
+            (1, 1, 'ana@example.com', 'Ana & Luis', 'ana', 'Tom & Jerry "uno"', hoy - timedelta(days=2)),
+            (2, 1, 'ana@example.com', 'Ana & Luis', 'ana', "L'Étranger", hoy + timedelta(days=1)),
+        ]
+        mensaje, recordatorios = construir_resumen(filas, hoy)
+        self.assertIn('Hola Ana & Luis,', mensaje.body)
+        self.assertIn('"Tom & Jerry "uno"": venció', mensaje.body)
+        self.assertIn('"L\'Étranger": debes devolverlo', mensaje.body)
+        self.assertNotIn('&amp;', mensaje.body)
+        self.assertEqual(len(recordatorios), 2)
+
+    @override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+    def test_segunda_ejecucion_del_dia_no_reenvia(self):
+        usuario = crear_usuario('lector')
+        User.objects.filter(id=usuario.id).update(email='lector@example.com')
+        libro = Libro.objects.create(titulo='Dune', autor='Herbert')
+        hoy = timezone.now().date()
+        Prestamo.objects.create(usuario=usuario, libro=libro, fecha_devolucion_esperada=hoy + timedelta(days=1))
+
+        call_command('enviar_recordatorios', stdout=StringIO())
+        call_command('enviar_recordatorios', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Recordatorio.objects.count(), 1)
+
+        # Al día siguiente corresponde un aviso nuevo
+        self.assertEqual(enviar_recordatorios(hoy=hoy + timedelta(days=1)), 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class FacetasTests(TestCase):
+    """
+    - Conteos de facetas del catálogo en una sola consulta (facetas.calcular_facetas)
+    """
+
+    def setUp(self):
+        for genero, disponible, cantidad, autor in (
+            ('ficcion', True, 2, 'Herbert'), ('ficcion', False, 1, 'Herbert'),
+            ('ciencia', True, 1, 'Sagan'), ('ciencia', False, 2, 'Sagan'), ('historia', True, 1, 'Herbert'),
+        ):
+            for i in range(cantidad):
+                Libro.objects.create(titulo=f'{genero} {i}', autor=autor, genero=genero, disponible=disponible)
+
+    def por_genero(self, facetas):
+        return [(item['genero'], item['total'], item['seleccionado']) for item in facetas['por_genero']]
+
+    def test_genero_y_estado_combinados(self):
+        with self.assertNumQueries(1):
+            facetas = calcular_facetas(Libro.objects.all(), genero='ficcion', estado='disponible')
+        # Los conteos por estado respetan el género; los conteos por género respetan el estado
+        self.assertEqual(
+            (facetas['total'], facetas['todos'], facetas['disponibles'], facetas['prestados']), (2, 3, 2, 1)
+        )
+        self.assertEqual(self.por_genero(facetas), [('ficcion', 2, True), ('ciencia', 1, False), ('historia', 1, False)])
+
+    def test_sobre_una_busqueda(self):
+        libros = filtrar_busqueda(Libro.objects.all(), 'herbert')
+        with self.assertNumQueries(1):
+            facetas = calcular_facetas(libros, estado='prestado')
+        self.assertEqual(
+            (facetas['total'], facetas['todos'], facetas['disponibles'], facetas['prestados']), (1, 4, 3, 1)
+        )
+        self.assertEqual(self.por_genero(facetas), [('ficcion', 1, False)])
+        self.assertEqual(filtrar_facetas(libros, estado='prestado').count(), facetas['total'])
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class CatalogoCondicionalTests(TestCase):
+    """
+    - Respuestas 304 del catálogo (versionado.condicional_catalogo)
+    """
+
+    def setUp(self):
+        self.central = Sucursal.objects.create(nombre='Casa Central', codigo='central')
+        self.norte = Sucursal.objects.create(nombre='Norte', codigo='norte')
+        self.usuario = crear_usuario('lector', sucursal=self.central)
+        self.libro = Libro.objects.create(titulo='Dune', autor='Herbert', sucursal=self.central)
+
+    def iniciar_sesion(self):
+        # Por la vista real: rota el token CSRF igual que en el navegador
+        respuesta = self.client.post('/login/', {'username': 'lector', 'password': 'clave-segura-123'})
+        self.assertEqual(respuesta.status_code, 302)
+
+    def test_revisita_sin_cambios_responde_304(self):
+        self.iniciar_sesion()
+        etag = self.client.get('/disponibilidad/')['ETag']
+        respuesta = self.client.get('/disponibilidad/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_cambio_en_el_catalogo_invalida_el_etag(self):
+        self.iniciar_sesion()
+        etag = self.client.get('/disponibilidad/')['ETag']
+        editar_libros({self.libro.id}, genero='ciencia')
+        respuesta = self.client.get('/disponibilidad/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_nuevo_inicio_de_sesion_invalida_formularios_guardados(self):
+        self.iniciar_sesion()
+        self.client.get('/prestamo/')
+        etag = self.client.get('/prestamo/')['ETag']
+        self.client.post('/logout/')
+        self.iniciar_sesion()
+        self.client.get('/prestamo/')  # muestra el mensaje de cierre de sesión
+        respuesta = self.client.get('/prestamo/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'csrfmiddlewaretoken')
+
+    def test_cambio_de_sucursal_invalida_el_etag(self):
+        self.iniciar_sesion()
+        etag = self.client.get('/disponibilidad/')['ETag']
+        PerfilUsuario.objects.filter(usuario=self.usuario).update(sucursal=self.norte)
+        respuesta = self.client.get('/disponibilidad/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotContains(respuesta, 'Dune')
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class OperacionesMasivasTests(TestCase):
+    """
+    - Préstamo y devolución masivos de la mesa de circulación (operaciones_masivas.py)
+    """
+
+    def setUp(self):
+        self.lector = crear_usuario('lector')
+        self.libros = [Libro.objects.create(titulo=f'Libro {i}', autor='Autor') for i in range(4)]
+        self.ids = {libro.id for libro in self.libros}
+
+    def test_prestamo_masivo_omite_no_disponibles(self):
+        Libro.objects.filter(id=self.libros[0].id).update(disponible=False)
+        prestamos, omitidos = prestar_libros(self.lector, self.ids | {9999}, 7)
+        self.assertEqual(len(prestamos), 3)
+        self.assertEqual(omitidos, ['Libro 0', 'ID 9999 (no encontrado)'])
+        self.assertFalse(Libro.objects.filter(id__in=self.ids, disponible=True).exists())
+
+        # Un segundo préstamo de los mismos libros no crea nada
+        prestamos, omitidos = prestar_libros(self.lector, self.ids, 7)
+        self.assertEqual((prestamos, len(omitidos)), ([], 4))
+
+    def test_devolucion_masiva_calcula_multas_por_atraso(self):
+        prestar_libros(self.lector, self.ids, 7)
+        hoy = timezone.now().date()
+        for libro, dias_atraso in zip(self.libros, (0, 1, 3, 3)):
+            Prestamo.objects.filter(libro=libro).update(fecha_devolucion_esperada=hoy - timedelta(days=dias_atraso))
+
+        devueltos, multa_total, omitidos = devolver_libros(self.lector, self.ids | {9999})
+        self.assertEqual((devueltos, omitidos), (4, [9999]))
+        self.assertEqual(multa_total, MULTA_POR_DIA * 7)
+        multas = dict(Prestamo.objects.values_list('libro_id', 'multa'))
+        self.assertEqual(
+            [multas[libro.id] for libro in self.libros],
+            [Decimal('0.00'), MULTA_POR_DIA, MULTA_POR_DIA * 3, MULTA_POR_DIA * 3]
+        )
+        self.assertEqual(Libro.objects.filter(id__in=self.ids, disponible=True).count(), 4)
+        self.assertFalse(Prestamo.objects.filter(fecha_devolucion_real__isnull=True).exists())
+
+    def test_devolucion_de_libros_de_otro_usuario(self):
+        prestar_libros(self.lector, {self.libros[0].id}, 7)
+        otro = crear_usuario('otro')
+        self.assertEqual(devolver_libros(otro, {self.libros[0].id}), (0, Decimal('0.00'), [self.libros[0].id]))
+
+    def test_mesa_requiere_bibliotecario(self):
+        self.client.force_login(self.lector)
+        respuesta = self.client.post('/mesa-circulacion/', {
+            'usuario': 'lector', 'operacion': 'prestamo', 'libros': str(self.libros[0].id),
+        })
+        self.assertRedirects(respuesta, '/dashboard/', fetch_redirect_response=False)
+        self.assertFalse(Prestamo.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class EdicionMasivaTests(TestCase):
+    """
+    - Edición y eliminación masivas del catálogo (operaciones_masivas.py y gestionar_libros)
+    """
+
+    def setUp(self):
+        self.bibliotecario = crear_usuario('bibliotecario', rol='bibliotecario')
+        self.client.force_login(self.bibliotecario)
+        self.libros = [Libro.objects.create(titulo=f'Libro {i}', autor='Autor') for i in range(4)]
+        self.ids = {libro.id for libro in self.libros}
+        prestar_libros(self.bibliotecario, {self.libros[0].id}, 7)
+
+    def sentencias(self, contexto, inicio):
+        return [q['sql'] for q in contexto.captured_queries if q['sql'].startswith(inicio)]
+
+    def test_edicion_con_un_solo_update(self):
+        with CaptureQueriesContext(connection) as contexto:
+            actualizados, omitidos = editar_libros(self.ids, genero='historia', disponible=False)
+        self.assertEqual(len(self.sentencias(contexto, 'UPDATE "sgb_libro"')), 2)  # género y disponibilidad
+        self.assertEqual((actualizados, omitidos), (4, ['Libro 0']))
+        self.assertEqual(set(Libro.objects.values_list('genero', flat=True)), {'historia'})
+        self.assertEqual(Libro.objects.filter(disponible=False).count(), 4)
+
+        with CaptureQueriesContext(connection) as contexto:
+            editar_libros(self.ids, genero='terror')
+        self.assertEqual(len(self.sentencias(contexto, 'UPDATE "sgb_libro"')), 1)
+
+    def test_eliminacion_con_un_solo_delete(self):
+        with CaptureQueriesContext(connection) as contexto:
+            eliminados, omitidos = eliminar_libros(self.ids)
+        self.assertEqual(len(self.sentencias(contexto, 'DELETE FROM "sgb_libro"')), 1)
+        self.assertEqual((eliminados, omitidos), (3, ['Libro 0']))
+        self.assertEqual(list(Libro.objects.values_list('id', flat=True)), [self.libros[0].id])
+
+    def test_reporte_de_omitidos_con_prestamo_activo(self):
+        respuesta = self.client.post('/gestionar-libros/', {
+            'accion': 'eliminar_masivo', 'libros': [str(libro_id) for libro_id in self.ids],
+        }, follow=True)
+        mensajes = [str(m) for m in respuesta.context['messages']]
+        self.assertEqual(mensajes, [
+            '✅ 3 libro(s) eliminado(s).',
+            '⚠️ No se eliminaron 1 libro(s) con préstamos activos: Libro 0',
+        ])
+
+    def test_genero_invalido_se_rechaza(self):
+        respuesta = self.client.post('/gestionar-libros/', {
+            'accion': 'editar_masivo', 'libros': [str(libro_id) for libro_id in self.ids], 'genero_masivo': 'inventado',
+        }, follow=True)
+        self.assertEqual([str(m) for m in respuesta.context['messages']], ['❌ El género seleccionado no es válido.'])
+        self.assertFalse(Libro.objects.filter(genero='inventado').exists())
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class MesaCirculacionSucursalTests(TestCase):
+    """
+    - La mesa de circulación solo presta y devuelve libros de la sucursal del bibliotecario
+    """
+
+    def setUp(self):
+        self.central = Sucursal.objects.create(nombre='Casa Central', codigo='central')
+        self.norte = Sucursal.objects.create(nombre='Norte', codigo='norte')
+        self.lector = crear_usuario('lector', sucursal=self.central)
+        self.bibliotecario = crear_usuario('bibliotecario', rol='bibliotecario', sucursal=self.central)
+        self.local = Libro.objects.create(titulo='Local', autor='Autor', sucursal=self.central)
+        self.ajeno = Libro.objects.create(titulo='Ajeno', autor='Autor', sucursal=self.norte)
+        self.client.force_login(self.bibliotecario)
+
+    def operar(self, operacion, *libros):
+        return self.client.post('/mesa-circulacion/', {
+            'usuario': 'lector', 'operacion': operacion, 'libros': ' '.join(str(libro.id) for libro in libros),
+        })
+
+    def test_prestamo_solo_en_la_sucursal(self):
+        self.operar('prestamo', self.local, self.ajeno)
+        self.assertEqual(list(Prestamo.objects.values_list('libro_id', flat=True)), [self.local.id])
+
+    def test_devolucion_solo_en_la_sucursal(self):
+        prestar_libros(self.lector, {self.local.id, self.ajeno.id}, 7)
+        self.operar('devolucion', self.local, self.ajeno)
+        activos = Prestamo.objects.filter(fecha_devolucion_real__isnull=True)
+        self.assertEqual(list(activos.values_list('libro_id', flat=True)), [self.ajeno.id])
+
+    def test_administrador_sin_sucursal_opera_en_todas(self):
+        administrador = crear_usuario('administrador', rol='administrador')
+        self.client.force_login(administrador)
+        self.operar('prestamo', self.local, self.ajeno)
+        self.assertEqual(Prestamo.objects.count(), 2)
+        self.operar('devolucion', self.local, self.ajeno)
+        self.assertFalse(Prestamo.objects.filter(fecha_devolucion_real__isnull=True).exists())
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class ResumenUsuarioTests(TestCase):
+    """
+    - Contadores de ResumenUsuario (resumenes.py) tras préstamos, devoluciones y eliminaciones
+    """
+
+    def setUp(self):
+        self.usuario = crear_usuario('lector')
+        self.client.force_login(self.usuario)
+        self.libros = [Libro.objects.create(titulo=f'Libro {i}', autor='Autor') for i in range(3)]
+
+    def contadores(self):
+        resumen = ResumenUsuario.objects.get(usuario=self.usuario)
+        return resumen.prestamos_totales, resumen.prestamos_activos, resumen.vencidos, resumen.multas_total
+
+    def atrasar(self, libro, dias):
+        Prestamo.objects.filter(libro=libro, fecha_devolucion_real__isnull=True).update(
+            fecha_devolucion_esperada=timezone.now().date() - timedelta(days=dias)
+        )
+
+    def test_prestamos_y_devoluciones(self):
+        self.client.post('/prestamo/', {'libro_id': self.libros[0].id, 'dias_prestamo': 7})
+        prestar_libros(self.usuario, {self.libros[1].id, self.libros[2].id}, 7)
+        self.assertEqual(self.contadores(), (3, 3, 0, Decimal('0.00')))
+
+        prestamo = Prestamo.objects.get(libro=self.libros[0])
+        self.client.post('/devolucion/', {'prestamo_id': prestamo.id})
+        devolver_libros(self.usuario, {self.libros[1].id})
+        self.assertEqual(self.contadores(), (3, 1, 0, Decimal('0.00')))
+
+    def test_devolucion_de_un_prestamo_vencido_despues_del_conteo_diario(self):
+        prestar_libros(self.usuario, {self.libros[0].id, self.libros[1].id, self.libros[2].id}, 7)
+        self.atrasar(self.libros[0], 5)
+        self.atrasar(self.libros[1], 2)
+        # El último conteo fue hace 3 días: solo el primero ya estaba atrasado
+        actualizar_vencidos(timezone.now().date() - timedelta(days=3))
+        self.assertEqual(self.contadores()[2], 1)
+
+        # Venció después del conteo: al devolverlo no debe descontarse el contado
+        devolver_libros(self.usuario, {self.libros[1].id})
+        self.assertEqual(self.contadores(), (3, 2, 1, Decimal('2000.00')))
+
+        self.client.post('/devolucion/', {'prestamo_id': Prestamo.objects.get(libro=self.libros[0]).id})
+        self.assertEqual(self.contadores(), (3, 1, 0, Decimal('7000.00')))
+
+    def test_devolucion_sin_recorrer_el_historial(self):
+        prestar_libros(self.usuario, {self.libros[0].id, self.libros[1].id}, 7)
+        devolver_libros(self.usuario, {self.libros[0].id})
+        # El resumen se actualiza con F(): un desajuste previo se conserva (no se recalcula)
+        ResumenUsuario.objects.update(prestamos_totales=50)
+        devolver_libros(self.usuario, {self.libros[1].id})
+        self.assertEqual(self.contadores(), (50, 0, 0, Decimal('0.00')))
+
+    def test_prestamos_eliminados_en_cascada(self):
+        prestar_libros(self.usuario, {self.libros[0].id}, 7)
+        devolver_libros(self.usuario, {self.libros[0].id})
+        prestar_libros(self.usuario, {self.libros[1].id}, 7)
+        # El recálculo corre al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            eliminar_libros({self.libros[0].id})
+        self.assertEqual(self.contadores(), (1, 1, 0, Decimal('0.00')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Prestamo.objects.all().delete()
+        self.assertEqual(self.contadores(), (0, 0, 0, Decimal('0.00')))
+
+    def test_recalculo_completo_coincide(self):
+        prestar_libros(self.usuario, {self.libros[0].id, self.libros[1].id}, 7)
+        self.atrasar(self.libros[0], 1)
+        devolver_libros(self.usuario, {self.libros[0].id})
+        antes = self.contadores()
+        ResumenUsuario.objects.update(prestamos_totales=99)
+        recalcular_resumenes()
+        self.assertEqual(self.contadores(), antes)
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class HistogramaVencimientosTests(TestCase):
+    """
+    - El histograma de vencimientos (pronostico.py) sigue a los préstamos activos
+    """
+
+    def setUp(self):
+        self.bibliotecario = crear_usuario('bibliotecario', rol='bibliotecario')
+        self.client.force_login(self.bibliotecario)
+        self.libro = Libro.objects.create(titulo='Dune', autor='Herbert', genero='ficcion')
+        self.otro = Libro.objects.create(titulo='Cosmos', autor='Sagan', genero='ciencia')
+
+    def histograma(self):
+        return sorted(
+            VencimientoHistograma.objects.filter(cantidad__gt=0).values_list('genero', 'cantidad')
+        )
+
+    def assertCoincideConReconstruccion(self):
+        actual = sorted(VencimientoHistograma.objects.filter(cantidad__gt=0).values_list(
+            'fecha', 'genero', 'sucursal_id', 'cantidad'))
+        reconstruir_histograma()
+        self.assertEqual(actual, sorted(VencimientoHistograma.objects.values_list(
+            'fecha', 'genero', 'sucursal_id', 'cantidad')))
+
+    def test_prestamo_y_devolucion(self):
+        self.client.post('/prestamo/', {'libro_id': self.libro.id, 'dias_prestamo': 7})
+        prestar_libros(self.bibliotecario, {self.otro.id}, 7)
+        self.assertEqual(self.histograma(), [('ciencia', 1), ('ficcion', 1)])
+        self.assertCoincideConReconstruccion()
+
+        prestamo = Prestamo.objects.get(libro=self.libro)
+        self.client.post('/devolucion/', {'prestamo_id': prestamo.id})
+        devolver_libros(self.bibliotecario, {self.otro.id})
+        self.assertEqual(self.histograma(), [])
+
+    def test_editar_genero_de_un_libro_prestado(self):
+        self.client.post('/prestamo/', {'libro_id': self.libro.id, 'dias_prestamo': 7})
+        self.client.post('/gestionar-libros/', {
+            'accion': 'editar', 'libro_id': self.libro.id, 'titulo': 'Dune', 'autor': 'Herbert', 'genero': 'terror',
+        })
+        self.assertEqual(self.histograma(), [('terror', 1)])
+        self.assertCoincideConReconstruccion()
+
+        devolver_libros(self.bibliotecario, {self.libro.id})
+        self.assertEqual(self.histograma(), [])
+
+    def test_edicion_masiva_de_genero(self):
+        prestar_libros(self.bibliotecario, {self.libro.id, self.otro.id}, 7)
+        editar_libros({self.libro.id, self.otro.id}, genero='historia')
+        self.assertEqual(self.histograma(), [('historia', 2)])
+        self.assertCoincideConReconstruccion()
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class AnaliticaCirculacionTests(TestCase):
+    """
+    - Consolidación diaria y estadísticas por ventana (analitica.py)
+    """
+
+    def setUp(self):
+        self.usuario = crear_usuario('lector')
+        self.hoy = timezone.now().date()
+        generos = [codigo for codigo, _ in Libro.GENEROS]
+        libros = [Libro.objects.create(titulo=f'Libro {i}', autor='Autor', genero=generos[i % 4]) for i in range(8)]
+        aleatorio = random.Random(7)
+        for _ in range(120):
+            prestamo = Prestamo.objects.create(
+                usuario=self.usuario, libro=aleatorio.choice(libros), fecha_devolucion_esperada=self.hoy
+            )
+            fecha = self.hoy - timedelta(days=aleatorio.randint(2, 80))
+            esperada = fecha + timedelta(days=14)
+            real = fecha + timedelta(days=aleatorio.randint(1, 20))
+            cambios = {'fecha_prestamo': fecha, 'fecha_devolucion_esperada': esperada}
+            if real < self.hoy:
+                cambios.update(fecha_devolucion_real=real, multa=Decimal(max(0, (real - esperada).days) * 500))
+            Prestamo.objects.filter(id=prestamo.id).update(**cambios)
+        cache.clear()
+
+    def resumen(self):
+        return (
+            sorted(CirculacionDiaria.objects.values_list(
+                'fecha', 'genero', 'sucursal_id', 'prestamos', 'devoluciones', 'devoluciones_atrasadas', 'multas')),
+            sorted(PrestamosLibroDiario.objects.values_list('fecha', 'libro_id', 'prestamos')),
+        )
+
+    def test_consolidacion_incremental_e_idempotente(self):
+        ayer = self.hoy - timedelta(days=1)
+        self.assertGreater(analitica.consolidar_dias(hasta=ayer - timedelta(days=10)), 0)
+        self.assertEqual(analitica.consolidar_dias(), 10)
+        self.assertEqual(analitica.consolidar_dias(), 0)
+        antes = self.resumen()
+        analitica.consolidar_dias(desde=ayer - timedelta(days=30))
+        self.assertEqual(self.resumen(), antes)
+
+        estadisticas = analitica.calcular_estadisticas(365)
+        self.assertEqual(estadisticas['totales']['prestamos'], Prestamo.objects.filter(fecha_prestamo__lt=self.hoy).count())
+        self.assertEqual(
+            estadisticas['totales']['devoluciones'], Prestamo.objects.filter(fecha_devolucion_real__lt=self.hoy).count()
+        )
+
+    @skipIf(analitica.np is None, 'NumPy no está instalado')
+    def test_numpy_y_python_puro_coinciden(self):
+        analitica.consolidar_dias()
+        numpy = analitica.np
+        for dias in (30, 90, 365):
+            con_numpy = analitica.calcular_estadisticas(dias)
+            analitica.np = None
+            try:
+                self.assertEqual(analitica.calcular_estadisticas(dias), con_numpy)
+            finally:
+                analitica.np = numpy
+
+    def test_multas_exactas_en_centavos(self):
+        Prestamo.objects.filter(multa__gt=0).update(multa=Decimal('0.10'))
+        analitica.consolidar_dias()
+        esperado = Prestamo.objects.filter(fecha_devolucion_real__lt=self.hoy).aggregate(total=Sum('multa'))['total']
+        numpy = analitica.np
+        for np_ in {numpy, None}:
+            analitica.np = np_
+            try:
+                multas = analitica.calcular_estadisticas(365)['totales']['multas']
+            finally:
+                analitica.np = numpy
+            self.assertEqual((multas, str(multas)), (esperado, f'{esperado:.2f}'))
+
+    def test_ventana_termina_en_el_ultimo_dia_consolidado(self):
+        anteayer = self.hoy - timedelta(days=2)
+        analitica.consolidar_dias(hasta=anteayer)
+        self.assertEqual(analitica.estadisticas_en_cache(30)['hasta'], anteayer)
+
+        # La consolidación nocturna cambia la clave del caché
+        analitica.consolidar_dias()
+        self.assertEqual(analitica.estadisticas_en_cache(30)['hasta'], self.hoy - timedelta(days=1))
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class ProyeccionesTests(TestCase):
+    """
+    - Bitácora de circulación (eventos.py) y proyecciones incrementales (proyecciones.py)
+    """
+
+    def setUp(self):
+        self.usuario = crear_usuario('lector')
+        self.libros = [Libro.objects.create(titulo=f'Libro {i}', autor='Autor') for i in range(3)]
+        self.estadisticas = PROYECCIONES['estadisticas_libros']
+
+    def tipos(self):
+        return list(EventoCirculacion.objects.order_by('id').values_list('tipo', flat=True))
+
+    def filas(self):
+        return sorted(EstadisticaLibro.objects.values_list('libro_id', 'prestamos', 'devoluciones', 'multas'))
+
+    def test_operaciones_se_agregan_a_la_bitacora(self):
+        prestar_libros(self.usuario, {self.libros[0].id}, 7)
+        Prestamo.objects.update(fecha_devolucion_esperada=timezone.now().date() - timedelta(days=2))
+        self.assertEqual(acumular_multas(), 1)
+        self.assertEqual(acumular_multas(), 0)
+        devolver_libros(self.usuario, {self.libros[0].id})
+        self.assertEqual(self.tipos(), [
+            EventoCirculacion.PRESTAMO, EventoCirculacion.MULTA_ACUMULADA,
+            EventoCirculacion.DEVOLUCION, EventoCirculacion.MULTA,
+        ])
+        self.assertEqual(
+            EventoCirculacion.objects.get(tipo=EventoCirculacion.MULTA_ACUMULADA).datos, {'monto': '2000.00'}
+        )
+
+    def test_cambios_del_catalogo_desde_el_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='clave-segura-123'))
+        libro = self.libros[0]
+        self.client.post(f'/admin/sgb/libro/{libro.id}/change/', {
+            'titulo': 'Nuevo', 'autor': 'Autor', 'genero': 'terror', 'disponible': 'on',
+        })
+        self.client.post(f'/admin/sgb/libro/{libro.id}/delete/', {'post': 'yes'})
+        self.client.post('/admin/sgb/libro/', {
+            'action': 'delete_selected', '_selected_action': [self.libros[1].id], 'post': 'yes',
+        })
+        eventos = list(EventoCirculacion.objects.order_by('id').values_list('tipo', 'libro_id'))
+        self.assertEqual(eventos, [
+            (EventoCirculacion.LIBRO_EDITADO, libro.id),
+            (EventoCirculacion.LIBRO_ELIMINADO, libro.id),
+            (EventoCirculacion.LIBRO_ELIMINADO, self.libros[1].id),
+        ])
+        self.assertEqual(EventoCirculacion.objects.first().datos['genero'], 'terror')
+
+    def test_actualizacion_incremental_desde_el_offset(self):
+        prestar_libros(self.usuario, {libro.id for libro in self.libros}, 7)
+        devolver_libros(self.usuario, {self.libros[0].id})
+        self.assertEqual(actualizar_proyeccion(self.estadisticas, tamano_lote=2), 4)
+        self.assertEqual(
+            OffsetProyeccion.objects.get(nombre='estadisticas_libros').ultimo_evento_id,
+            EventoCirculacion.objects.latest('id').id
+        )
+        self.assertEqual(actualizar_proyeccion(self.estadisticas), 0)
+
+        # Solo se procesan los eventos nuevos
+        prestar_libros(self.usuario, {self.libros[0].id}, 7)
+        self.assertEqual(actualizar_proyeccion(self.estadisticas), 1)
+        self.assertEqual(self.filas(), [
+            (self.libros[0].id, 2, 1, Decimal('0.00')),
+            (self.libros[1].id, 1, 0, Decimal('0.00')),
+            (self.libros[2].id, 1, 0, Decimal('0.00')),
+        ])
+
+    def test_reconstruir_repitiendo_la_bitacora(self):
+        prestar_libros(self.usuario, {self.libros[0].id, self.libros[1].id}, 7)
+        Prestamo.objects.filter(libro=self.libros[0]).update(
+            fecha_devolucion_esperada=timezone.now().date() - timedelta(days=3)
+        )
+        devolver_libros(self.usuario, {self.libros[0].id, self.libros[1].id})
+        eliminar_libros({self.libros[1].id})
+        actualizar_proyeccion(self.estadisticas)
+        antes = self.filas()
+        self.assertEqual(antes, [(self.libros[0].id, 1, 1, MULTA_POR_DIA * 3)])
+
+        EstadisticaLibro.objects.update(prestamos=99)
+        self.assertEqual(reconstruir_proyeccion(self.estadisticas, tamano_lote=2), EventoCirculacion.objects.count())
+        self.assertEqual(self.filas(), antes)
+
+    def test_panel_lee_el_ranking_de_la_proyeccion(self):
+        prestar_libros(self.usuario, {self.libros[1].id}, 7)
+        actualizar_proyeccion(self.estadisticas)
+        # El ranking viene de la proyección, no de la tabla de préstamos
+        Prestamo.objects.all().delete()
+
+        self.client.force_login(crear_usuario('bibliotecario', rol='bibliotecario'))
+        respuesta = self.client.get('/panel-bibliotecario/')
+        self.assertEqual(
+            [(item['titulo'], item['prestamos']) for item in respuesta.context['mas_prestados']], [('Libro 1', 1)]
+        )
+
+
+class RespaldosTests(SimpleTestCase):
+    """
+    - Instantáneas por bloques, restauración, retención y lock de respaldos.py
+    """
+
+    def setUp(self):
+        self.directorio = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directorio)
+        self.archivo = self.directorio / 'origen.bin'
+        # 2,5 bloques: el último queda incompleto
+        self.datos = bytearray(os.urandom(respaldos.TAMANO_BLOQUE * 5 // 2))
+        self.escribir()
+
+    def escribir(self):
+        self.archivo.write_bytes(self.datos)
+
+    def bloques(self):
+        return len(list((self.directorio / 'bloques').glob('*/*.gz')))
+
+    def test_instantanea_reutiliza_bloques_sin_cambios(self):
+        _, nuevos, total = respaldos.guardar_instantanea(self.archivo, self.directorio)
+        self.assertEqual((nuevos, total), (3, 3))
+        _, nuevos, total = respaldos.guardar_instantanea(self.archivo, self.directorio)
+        self.assertEqual((nuevos, total), (0, 3))
+
+        self.datos[respaldos.TAMANO_BLOQUE + 10] ^= 0xFF
+        self.escribir()
+        _, nuevos, total = respaldos.guardar_instantanea(self.archivo, self.directorio)
+        self.assertEqual((nuevos, total), (1, 3))
+        self.assertEqual(self.bloques(), 4)
+        self.assertEqual(len(respaldos.listar_respaldos(self.directorio)), 3)
+
+    def test_restauracion_ida_y_vuelta(self):
+        manifiesto, _, _ = respaldos.guardar_instantanea(self.archivo, self.directorio)
+        destino = self.directorio / 'restaurado.bin'
+        respaldos.restaurar(manifiesto, destino)
+        self.assertEqual(destino.read_bytes(), bytes(self.datos))
+
+        # Un bloque alterado o faltante se detecta
+        primero = next((self.directorio / 'bloques').glob('*/*.gz'))
+        primero.write_bytes(gzip.compress(b'otro contenido'))
+        with self.assertRaisesMessage(respaldos.RespaldoError, 'corrupto'):
+            respaldos.restaurar(manifiesto, destino)
+        primero.unlink()
+        with self.assertRaisesMessage(respaldos.RespaldoError, 'Falta el bloque'):
+            respaldos.restaurar(manifiesto, destino)
+
+    def test_retencion_borra_manifiestos_y_bloques_huerfanos(self):
+        for posicion in (0, respaldos.TAMANO_BLOQUE * 2):
+            respaldos.guardar_instantanea(self.archivo, self.directorio)
+            self.datos[posicion] ^= 0xFF
+            self.escribir()
+        ultimo, _, _ = respaldos.guardar_instantanea(self.archivo, self.directorio)
+        self.assertEqual(self.bloques(), 5)
+
+        self.assertEqual(respaldos.aplicar_retencion(1, self.directorio), (2, 2))
+        self.assertEqual(respaldos.listar_respaldos(self.directorio), [ultimo])
+        self.assertEqual(self.bloques(), 3)
+        respaldos.restaurar(ultimo, self.directorio / 'restaurado.bin')
+        self.assertEqual((self.directorio / 'restaurado.bin').read_bytes(), bytes(self.datos))
+
+    @skipIf(respaldos.fcntl is None, 'Sin fcntl no hay lock entre procesos')
+    def test_lock_serializa_los_respaldos(self):
+        adquirido = threading.Event()
+
+        def otro_respaldo():
+            with respaldos.bloqueo_respaldos(self.directorio):
+                adquirido.set()
+
+        with respaldos.bloqueo_respaldos(self.directorio):
+            hilo = threading.Thread(target=otro_respaldo)
+            hilo.start()
+            self.assertFalse(adquirido.wait(0.2))
+        self.assertTrue(adquirido.wait(5))
+        hilo.join()
+
+    def test_respaldo_completo_de_una_base_sqlite(self):
+        base = self.directorio / 'base.sqlite3'
+        conexion = sqlite3.connect(base)
+        with conexion:
+            conexion.execute('CREATE TABLE sgb_libro (id INTEGER PRIMARY KEY, titulo TEXT)')
+            conexion.executemany('INSERT INTO sgb_libro (titulo) VALUES (?)', [(f'Libro {i}',) for i in range(50)])
+        conexion.close()
+
+        respaldo = self.directorio / 'respaldos'
+        with override_settings(RESPALDOS_DIR=respaldo), \
+                mock.patch('sgb.respaldos.ruta_base_datos', return_value=str(base)):
+            primero = respaldos.crear_respaldo(pausa=0, conservar=1)
+            segundo = respaldos.crear_respaldo(pausa=0, conservar=1)
+
+        self.assertEqual(segundo['bloques_nuevos'], 0)
+        self.assertEqual((segundo['respaldos_eliminados'], segundo['bloques_eliminados']), (1, 0))
+        self.assertEqual(respaldos.listar_respaldos(respaldo), [segundo['manifiesto']])
+        self.assertFalse(primero['manifiesto'].exists())
+        _, problemas, conteos = respaldos.verificar_restauracion(segundo['manifiesto'])
+        self.assertEqual((problemas, conteos), ([], {'sgb_libro': 50}))
@@ -9,9 +9,11 @@ urlpatterns = [
     # Funcionalidades de préstamos (Lectores)
     path('prestamo/', views.registrar_prestamo, name='registrar_prestamo'),
     path('devolucion/', views.registrar_devolucion, name='registrar_devolucion'),
+    path('historial/', views.historial_prestamos, name='historial_prestamos'),
     path('disponibilidad/', views.disponibilidad_libros, name='disponibilidad_libros'),
     
     # Panel de Bibliotecario
     path('panel-bibliotecario/', views.panel_bibliotecario, name='panel_bibliotecario'),
     path('gestionar-libros/', views.gestionar_libros, name='gestionar_libros'),  # Vista unificada
+    path('mesa-circulacion/', views.mesa_circulacion, name='mesa_circulacion'),  # Préstamos/devoluciones masivas
 ]
\ No newline at end of file
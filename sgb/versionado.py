@@ -0,0 +1,92 @@
+import hashlib
+from functools import wraps
+from django.contrib import messages
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.views.decorators.http import condition
+from .models import Libro, Prestamo, VersionCatalogo
+from .sucursales import sucursal_del_usuario
+
+VERSION_ID = 1
+
+
+def incrementar_version():
+    """
+    Incrementa el contador de generación del catálogo
+    Debe llamarse después de cualquier update()/bulk_create() sobre Libro o Prestamo,
+    porque esas operaciones no disparan las señales de save/delete
+    """
+    actualizadas = VersionCatalogo.objects.filter(id=VERSION_ID).update(
+        version=F('version') + 1,
+        fecha_actualizacion=timezone.now()
+    )
+    if not actualizadas:
+        VersionCatalogo.objects.get_or_create(id=VERSION_ID, defaults={'version': 1})
+
+
+def obtener_version(request):
+    """
+    Retorna (versión, fecha de última modificación) del catálogo
+    Se guarda en el request para que ETag y Last-Modified usen una sola consulta
+    """
+    if not hasattr(request, '_version_catalogo'):
+        fila = VersionCatalogo.objects.filter(id=VERSION_ID).values_list('version', 'fecha_actualizacion').first()
+        request._version_catalogo = fila or (0, None)
+    return request._version_catalogo
+
+
+def _hay_mensajes_pendientes(request):
+    # len() carga los mensajes sin marcarlos como leídos
+    return len(messages.get_messages(request)) > 0
+
+
+def etag_catalogo(request):
+    """
+    ETag de una página del catálogo: versión del catálogo + usuario que la ve
+    (la barra superior muestra el nombre del usuario) + su sucursal (filtra el listado)
+    + el secreto CSRF, que cambia al iniciar sesión: las páginas con formularios
+    incluyen el token y una copia guardada con un token viejo haría fallar el POST
+    Si hay mensajes pendientes no se usa caché, porque deben mostrarse en la página
+    """
+    if _hay_mensajes_pendientes(request):
+        return None
+    version, _ = obtener_version(request)
+    sucursal_id = sucursal_del_usuario(request.user) or 0
+    # Solo un resumen del secreto: el ETag viaja en las respuestas
+    csrf = hashlib.sha256(request.META.get('CSRF_COOKIE', '').encode()).hexdigest()[:12]
+    return f'catalogo-{version}-u{request.user.pk or 0}-s{sucursal_id}-{csrf}'
+
+
+def ultima_modificacion_catalogo(request):
+    if _hay_mensajes_pendientes(request):
+        return None
+    _, fecha = obtener_version(request)
+    return fecha
+
+
+def condicional_catalogo(vista):
+    """
+    Decorador para vistas de lectura del catálogo (páginas o futuros endpoints de la API)
+    Responde 304 Not Modified si el catálogo no cambió desde la última visita del cliente,
+    sin ejecutar las consultas del listado ni renderizar el template
+    """
+    vista_condicional = condition(etag_func=etag_catalogo, last_modified_func=ultima_modificacion_catalogo)(vista)
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        response = vista_condicional(request, *args, **kwargs)
+        # El navegador debe revalidar siempre; el ETag hace que esa revalidación sea barata
+        if request.method in ('GET', 'HEAD'):
+            response.headers.setdefault('Cache-Control', 'private, no-cache')
+        return response
+    return envoltura
+
+
+@receiver(post_save, sender=Libro)
+@receiver(post_save, sender=Prestamo)
+@receiver(post_delete, sender=Libro)
+@receiver(post_delete, sender=Prestamo)
+def _catalogo_modificado(sender, **kwargs):
+    incrementar_version()
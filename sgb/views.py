@@ -1,11 +1,23 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta, datetime
 from decimal import Decimal
-from .models import Libro, Prestamo
-from django.db.models import Q, Count
+from .models import EventoCirculacion, Libro, Prestamo, ResumenUsuario
+from .eventos import datos_libro, evento, eventos_devolucion, eventos_prestamo, registrar_eventos
+from django.db.models import Q
+from .proyecciones import mas_prestados
+from .pronostico import filas_prestamos_activos, restar_vencimientos, sumar_vencimientos
+from .resumenes import restar_devoluciones, sumar_prestamos
+from .facetas import calcular_facetas, filtrar_busqueda, filtrar_facetas
+from .sucursales import filtrar_por_sucursal, sucursal_del_usuario
+from .versionado import condicional_catalogo
+from .operaciones_masivas import (
+    OperacionMasivaError, devolver_libros, editar_libros, eliminar_libros, parsear_ids, prestar_libros
+)
 
 def home(request):
     """Vista de inicio/home"""
@@ -22,10 +34,14 @@ def dashboard(request):
     if hasattr(request.user, 'perfil'):
         perfil = request.user.perfil
     
-    # Estadísticas generales
-    total_libros = Libro.objects.count()
-    libros_disponibles = Libro.objects.filter(disponible=True).count()
-    prestamos_activos_totales = Prestamo.objects.filter(fecha_devolucion_real__isnull=True).count()
+    # Estadísticas generales (de la sucursal del usuario)
+    sucursal_id = sucursal_del_usuario(request.user)
+    libros = filtrar_por_sucursal(Libro.objects.all(), sucursal_id)
+    total_libros = libros.count()
+    libros_disponibles = libros.filter(disponible=True).count()
+    prestamos_activos_totales = filtrar_por_sucursal(
+        Prestamo.objects.filter(fecha_devolucion_real__isnull=True), sucursal_id
+    ).count()
     
     # Préstamos activos del usuario actual (para lectores)
     mis_prestamos = Prestamo.objects.filter(
@@ -52,6 +68,7 @@ def dashboard(request):
     return render(request, 'dashboard.html', context)
 
 @login_required
+@condicional_catalogo
 def registrar_prestamo(request):
     """
     Funcionalidad 1: Registro de Préstamo con filtro de búsqueda
@@ -59,13 +76,15 @@ def registrar_prestamo(request):
     - Valida que el libro esté disponible antes de prestar
     - Cambia el estado del libro a "Prestado"
     """
+    sucursal_id = sucursal_del_usuario(request.user)
+    
     if request.method == 'POST':
         libro_id = request.POST.get('libro_id')
         dias_prestamo = int(request.POST.get('dias_prestamo', 7))
         
-        # VALIDACIÓN 1: Verificar que el libro existe
+        # VALIDACIÓN 1: Verificar que el libro existe (en la sucursal del usuario)
         try:
-            libro = Libro.objects.get(id=libro_id)
+            libro = filtrar_por_sucursal(Libro.objects.all(), sucursal_id).get(id=libro_id)
         except Libro.DoesNotExist:
             messages.error(request, '❌ El libro seleccionado no existe.')
             return redirect('registrar_prestamo')
@@ -99,15 +118,22 @@ def registrar_prestamo(request):
         # Todas las validaciones pasaron: Crear el préstamo
         fecha_devolucion_esperada = timezone.now().date() + timedelta(days=dias_prestamo)
         
-        Prestamo.objects.create(
-            usuario=request.user,
-            libro=libro,
-            fecha_devolucion_esperada=fecha_devolucion_esperada
-        )
-        
-        # Control de Disponibilidad: Cambiar estado del libro a NO disponible
-        libro.disponible = False
-        libro.save()
+        with transaction.atomic():
+            prestamo = Prestamo.objects.create(
+                usuario=request.user,
+                libro=libro,
+                sucursal_id=libro.sucursal_id,
+                fecha_devolucion_esperada=fecha_devolucion_esperada
+            )
+            
+            # Control de Disponibilidad: Cambiar estado del libro a NO disponible
+            libro.disponible = False
+            libro.save()
+            
+            # Bitácora de circulación y resumen del usuario (misma transacción)
+            registrar_eventos([eventos_prestamo(prestamo)])
+            sumar_prestamos(request.user.id, 1)
+            sumar_vencimientos([(fecha_devolucion_esperada, libro.genero, libro.sucursal_id)])
         
         messages.success(request, f'✅ Préstamo registrado exitosamente. Libro: "{libro.titulo}". Debes devolver antes del {fecha_devolucion_esperada.strftime("%d/%m/%Y")}')
         return redirect('dashboard')
@@ -115,8 +141,8 @@ def registrar_prestamo(request):
     # Mostrar SOLO libros disponibles
     busqueda = request.GET.get('buscar', '')
     
-    # Filtro base: Solo libros con disponible=True Y sin préstamos activos
-    libros_disponibles = Libro.objects.filter(disponible=True)
+    # Filtro base: Solo libros de la sucursal con disponible=True Y sin préstamos activos
+    libros_disponibles = filtrar_por_sucursal(Libro.objects.filter(disponible=True), sucursal_id)
     
     # Excluir libros con préstamos activos (doble validación)
     libros_con_prestamos_activos = Prestamo.objects.filter(
@@ -180,12 +206,20 @@ def registrar_devolucion(request):
             prestamo.multa = Decimal('0.00')
             messages.success(request, '✅ Devolución a tiempo. Sin multa.')
         
-        prestamo.save()
-        
-        # Control de Disponibilidad: Devolver libro a estado DISPONIBLE
-        libro = prestamo.libro
-        libro.disponible = True
-        libro.save()
+        with transaction.atomic():
+            prestamo.save()
+            
+            # Control de Disponibilidad: Devolver libro a estado DISPONIBLE
+            libro = prestamo.libro
+            libro.disponible = True
+            libro.save()
+            
+            # Bitácora de circulación y resumen del usuario (misma transacción)
+            registrar_eventos(eventos_devolucion(
+                prestamo.id, prestamo.usuario_id, prestamo.libro_id, prestamo.sucursal_id, prestamo.multa
+            ))
+            restar_devoluciones(prestamo.usuario_id, [prestamo.fecha_devolucion_esperada], prestamo.multa)
+            restar_vencimientos([(prestamo.fecha_devolucion_esperada, libro.genero, prestamo.sucursal_id)])
         
         return redirect('registrar_devolucion')
     
@@ -200,7 +234,48 @@ def registrar_devolucion(request):
     }
     return render(request, 'registrar_devolucion.html', context)
 
+# Préstamos por página en el historial
+HISTORIAL_POR_PAGINA = 20
+
+@login_required
+def historial_prestamos(request):
+    """
+    Historial de préstamos y multas del usuario
+    - Los totales salen del resumen precalculado (una fila), no de agregar sus préstamos
+    - Paginación por cursor (keyset): ?antes=<id> trae los préstamos con ID menor,
+      usando el índice de usuario; cada página cuesta lo mismo sin importar el largo del historial
+    """
+    resumen = ResumenUsuario.objects.filter(usuario=request.user).first() or ResumenUsuario(usuario=request.user)
+    
+    try:
+        antes = int(request.GET.get('antes', 0))
+    except ValueError:
+        antes = 0
+    
+    prestamos = Prestamo.objects.filter(usuario=request.user).select_related('libro').order_by('-id')
+    if antes:
+        prestamos = prestamos.filter(id__lt=antes)
+    
+    # Se pide uno extra para saber si hay una página siguiente sin hacer count()
+    pagina = list(prestamos[:HISTORIAL_POR_PAGINA + 1])
+    hay_mas = len(pagina) > HISTORIAL_POR_PAGINA
+    pagina = pagina[:HISTORIAL_POR_PAGINA]
+    
+    fecha_actual = timezone.now().date()
+    for prestamo in pagina:
+        prestamo.esta_activo = prestamo.fecha_devolucion_real is None
+        prestamo.esta_vencido = prestamo.esta_activo and prestamo.fecha_devolucion_esperada < fecha_actual
+    
+    context = {
+        'resumen': resumen,
+        'prestamos': pagina,
+        'siguiente': pagina[-1].id if hay_mas else None,
+        'es_primera_pagina': not antes,
+    }
+    return render(request, 'historial_prestamos.html', context)
+
 @login_required
+@condicional_catalogo
 def disponibilidad_libros(request):
     """
     Funcionalidad 3: Consulta de Disponibilidad con filtro de búsqueda
@@ -210,31 +285,32 @@ def disponibilidad_libros(request):
     """
     # Filtro de búsqueda
     busqueda = request.GET.get('buscar', '')
-    libros = Libro.objects.all()
+    genero = request.GET.get('genero', '')
+    estado = request.GET.get('estado', '')
+    libros = filtrar_por_sucursal(Libro.objects.all(), sucursal_del_usuario(request.user))
+    libros = filtrar_busqueda(libros, busqueda)
     
-    if busqueda:
-        libros = libros.filter(
-            Q(titulo__icontains=busqueda) |
-            Q(autor__icontains=busqueda) |
-            Q(genero__icontains=busqueda)
-        )
+    # Contar estadísticas y facetas en una sola consulta
+    facetas = calcular_facetas(libros, genero=genero, estado=estado)
     
-    # Contar estadísticas
-    total_libros = libros.count()
-    libros_disponibles = libros.filter(disponible=True).count()
-    libros_prestados = libros.filter(disponible=False).count()
+    # Aplicar las facetas seleccionadas al listado
+    libros = filtrar_facetas(libros, genero=genero, estado=estado)
     
     context = {
         'libros': libros,
-        'total_libros': total_libros,
-        'libros_disponibles': libros_disponibles,
-        'libros_prestados': libros_prestados,
+        'total_libros': facetas['todos'],
+        'libros_disponibles': facetas['disponibles'],
+        'libros_prestados': facetas['prestados'],
+        'facetas': facetas,
         'busqueda': busqueda
     }
     return render(request, 'disponibilidad_libros.html', context)
 
 # ==================== PANEL DE BIBLIOTECARIO ====================
 
+# Ventanas (en días) disponibles para la analítica del panel
+VENTANAS_ANALITICA = [30, 90, 180, 365]
+
 @login_required
 def panel_bibliotecario(request):
     """
@@ -246,20 +322,43 @@ def panel_bibliotecario(request):
         messages.error(request, '❌ No tienes permisos para acceder a esta sección.')
         return redirect('dashboard')
     
-    # Estadísticas generales
-    total_libros = Libro.objects.count()
-    libros_por_genero = Libro.objects.values('genero').annotate(total=Count('genero')).order_by('-total')
-    prestamos_activos = Prestamo.objects.filter(fecha_devolucion_real__isnull=True).count()
-    prestamos_vencidos = Prestamo.objects.filter(
-        fecha_devolucion_real__isnull=True,
+    # Estadísticas generales (de la sucursal del bibliotecario)
+    sucursal_id = sucursal_del_usuario(request.user)
+    facetas = calcular_facetas(filtrar_por_sucursal(Libro.objects.all(), sucursal_id))
+    total_libros = facetas['total']
+    libros_por_genero = facetas['por_genero']
+    activos = filtrar_por_sucursal(Prestamo.objects.filter(fecha_devolucion_real__isnull=True), sucursal_id)
+    prestamos_activos = activos.count()
+    prestamos_vencidos = activos.filter(
         fecha_devolucion_esperada__lt=timezone.now().date()
     ).count()
     
+    # Analítica por ventana de tiempo (tablas de resumen consolidadas cada noche)
+    # Se importa aquí: carga NumPy, que solo necesita esta vista
+    from .analitica import estadisticas_en_cache, geometria_barras, geometria_linea
+    try:
+        dias = int(request.GET.get('dias', 90))
+    except ValueError:
+        dias = 90
+    if dias not in VENTANAS_ANALITICA:
+        dias = 90
+    analitica = estadisticas_en_cache(dias, sucursal_id)
+    
+    # Ranking histórico desde la proyección de la bitácora (no recorre los préstamos)
+    mas_prestados_historico = mas_prestados(filtrar_por_sucursal(Libro.objects.all(), sucursal_id))
+    
     context = {
         'total_libros': total_libros,
         'libros_por_genero': libros_por_genero,
         'prestamos_activos': prestamos_activos,
         'prestamos_vencidos': prestamos_vencidos,
+        'analitica': analitica,
+        'mas_prestados': mas_prestados_historico,
+        'ventanas': VENTANAS_ANALITICA,
+        'grafico_semanal': geometria_barras(analitica['prestamos_semanales']),
+        'grafico_multas': geometria_barras(analitica['multas_semanales']),
+        'linea_prestamos_7_dias': geometria_linea(analitica['prestamos_7_dias']),
+        'linea_tasa_atraso': geometria_linea(analitica['tasa_atraso_28_dias'], maximo=1),
     }
     return render(request, 'panel_bibliotecario.html', context)
 
@@ -271,6 +370,7 @@ def gestionar_libros(request):
     - Listar libros (tabla)
     - Editar libros (modal o formulario inline)
     - Eliminar libros
+    - Editar y eliminar varios libros a la vez (acciones masivas)
     """
     # Verificar permisos
     if not hasattr(request.user, 'perfil') or request.user.perfil.rol not in ['bibliotecario', 'administrador']:
@@ -280,6 +380,10 @@ def gestionar_libros(request):
     # Variable para saber si estamos editando
     libro_editar = None
     
+    # Los bibliotecarios solo gestionan los libros de su sucursal
+    sucursal_id = sucursal_del_usuario(request.user)
+    libros_sucursal = filtrar_por_sucursal(Libro.objects.all(), sucursal_id)
+    
     # AGREGAR LIBRO
     if request.method == 'POST' and 'accion' in request.POST and request.POST['accion'] == 'agregar':
         titulo = request.POST.get('titulo')
@@ -290,25 +394,40 @@ def gestionar_libros(request):
         if not titulo or not autor:
             messages.error(request, '❌ El título y el autor son obligatorios.')
         else:
-            Libro.objects.create(
-                titulo=titulo,
-                autor=autor,
-                genero=genero,
-                disponible=disponible
-            )
+            with transaction.atomic():
+                libro = Libro.objects.create(
+                    titulo=titulo,
+                    autor=autor,
+                    genero=genero,
+                    disponible=disponible,
+                    sucursal_id=sucursal_id
+                )
+                registrar_eventos([evento(
+                    EventoCirculacion.LIBRO_CREADO, usuario_id=request.user.id,
+                    libro_id=libro.id, sucursal_id=sucursal_id, **datos_libro(libro)
+                )])
             messages.success(request, f'✅ Libro "{titulo}" agregado exitosamente.')
             return redirect('gestionar_libros')
     
     # EDITAR LIBRO
     if request.method == 'POST' and 'accion' in request.POST and request.POST['accion'] == 'editar':
         libro_id = request.POST.get('libro_id')
-        libro = get_object_or_404(Libro, id=libro_id)
+        libro = get_object_or_404(libros_sucursal, id=libro_id)
         
         libro.titulo = request.POST.get('titulo')
         libro.autor = request.POST.get('autor')
         libro.genero = request.POST.get('genero')
         libro.disponible = request.POST.get('disponible') == 'on'
-        libro.save()
+        with transaction.atomic():
+            # Si cambia el género, su préstamo activo se mueve en el histograma de vencimientos
+            movidos = [fila for fila in filas_prestamos_activos([libro.id]) if fila[1] != libro.genero]
+            libro.save()
+            restar_vencimientos(movidos)
+            sumar_vencimientos([(fecha, libro.genero, sucursal) for fecha, _, sucursal in movidos])
+            registrar_eventos([evento(
+                EventoCirculacion.LIBRO_EDITADO, usuario_id=request.user.id,
+                libro_id=libro.id, sucursal_id=libro.sucursal_id, **datos_libro(libro)
+            )])
         
         messages.success(request, f'✅ Libro "{libro.titulo}" actualizado exitosamente.')
         return redirect('gestionar_libros')
@@ -316,12 +435,12 @@ def gestionar_libros(request):
     # PREPARAR FORMULARIO DE EDICIÓN
     if request.method == 'GET' and 'editar' in request.GET:
         libro_id = request.GET.get('editar')
-        libro_editar = get_object_or_404(Libro, id=libro_id)
+        libro_editar = get_object_or_404(libros_sucursal, id=libro_id)
     
     # ELIMINAR LIBRO
     if request.method == 'POST' and 'accion' in request.POST and request.POST['accion'] == 'eliminar':
         libro_id = request.POST.get('libro_id')
-        libro = get_object_or_404(Libro, id=libro_id)
+        libro = get_object_or_404(libros_sucursal, id=libro_id)
         
         # Verificar si tiene préstamos activos
         prestamos_activos = Prestamo.objects.filter(libro=libro, fecha_devolucion_real__isnull=True).exists()
@@ -330,14 +449,57 @@ def gestionar_libros(request):
             messages.error(request, f'❌ No se puede eliminar "{libro.titulo}" porque tiene préstamos activos.')
         else:
             titulo = libro.titulo
-            libro.delete()
+            with transaction.atomic():
+                registrar_eventos([evento(
+                    EventoCirculacion.LIBRO_ELIMINADO, usuario_id=request.user.id,
+                    libro_id=libro.id, sucursal_id=libro.sucursal_id, titulo=titulo
+                )])
+                libro.delete()
             messages.success(request, f'✅ Libro "{titulo}" eliminado exitosamente.')
         
         return redirect('gestionar_libros')
     
+    # EDICIÓN MASIVA (género y/o disponibilidad de varios libros)
+    if request.method == 'POST' and request.POST.get('accion') == 'editar_masivo':
+        ids = parsear_ids(request.POST.getlist('libros'))
+        genero = request.POST.get('genero_masivo') or None
+        estado = request.POST.get('disponible_masivo')
+        disponible = {'si': True, 'no': False}.get(estado)
+        
+        if not ids:
+            messages.error(request, '❌ Debes seleccionar al menos un libro.')
+        elif genero is None and disponible is None:
+            messages.error(request, '❌ Debes indicar el género o la disponibilidad a aplicar.')
+        elif genero is not None and genero not in dict(Libro.GENEROS):
+            # update() no pasa por la validación de choices del modelo
+            messages.error(request, '❌ El género seleccionado no es válido.')
+        else:
+            actualizados, omitidos = editar_libros(
+                ids, genero=genero, disponible=disponible, sucursal_id=sucursal_id, usuario_id=request.user.id
+            )
+            messages.success(request, f'✅ {actualizados} libro(s) actualizado(s).')
+            if omitidos:
+                messages.warning(request, f'⚠️ No se cambió la disponibilidad de {len(omitidos)} libro(s) con préstamos activos: {", ".join(omitidos)}')
+        
+        return redirect('gestionar_libros')
+    
+    # ELIMINACIÓN MASIVA
+    if request.method == 'POST' and request.POST.get('accion') == 'eliminar_masivo':
+        ids = parsear_ids(request.POST.getlist('libros'))
+        
+        if not ids:
+            messages.error(request, '❌ Debes seleccionar al menos un libro.')
+        else:
+            eliminados, omitidos = eliminar_libros(ids, sucursal_id=sucursal_id, usuario_id=request.user.id)
+            messages.success(request, f'✅ {eliminados} libro(s) eliminado(s).')
+            if omitidos:
+                messages.warning(request, f'⚠️ No se eliminaron {len(omitidos)} libro(s) con préstamos activos: {", ".join(omitidos)}')
+        
+        return redirect('gestionar_libros')
+    
     # LISTAR LIBROS CON BÚSQUEDA
     busqueda = request.GET.get('buscar', '')
-    libros = Libro.objects.all().order_by('titulo')
+    libros = libros_sucursal.order_by('titulo')
     
     if busqueda:
         libros = libros.filter(
@@ -351,4 +513,63 @@ def gestionar_libros(request):
         'generos': Libro.GENEROS,
         'libro_editar': libro_editar,  # Para mostrar el formulario de edición
     }
-    return render(request, 'gestionar_libros.html', context)
\ No newline at end of file
+    return render(request, 'gestionar_libros.html', context)
+
+@login_required
+def mesa_circulacion(request):
+    """
+    Mesa de circulación (exclusiva para bibliotecarios)
+    - Registra el préstamo o la devolución de VARIOS libros para un mismo usuario
+    - Los IDs de los libros se ingresan (o escanean) en un solo formulario
+    - Cada operación es atómica: se valida y se guarda todo el lote de una vez
+    """
+    # Verificar permisos
+    if not hasattr(request.user, 'perfil') or request.user.perfil.rol not in ['bibliotecario', 'administrador']:
+        messages.error(request, '❌ No tienes permisos para acceder a esta sección.')
+        return redirect('dashboard')
+    
+    if request.method == 'POST':
+        identificador = request.POST.get('usuario', '').strip()
+        operacion = request.POST.get('operacion')
+        ids = parsear_ids([request.POST.get('libros', '')])
+        
+        # Buscar al usuario por nombre de usuario o RUT
+        usuario = User.objects.filter(
+            Q(username=identificador) | Q(perfil__rut=identificador)
+        ).first() if identificador else None
+        
+        if usuario is None:
+            messages.error(request, '❌ No existe un usuario con ese nombre de usuario o RUT.')
+            return redirect('mesa_circulacion')
+        
+        if not ids:
+            messages.error(request, '❌ Debes ingresar al menos un ID de libro.')
+            return redirect('mesa_circulacion')
+        
+        if operacion == 'prestamo':
+            try:
+                dias_prestamo = int(request.POST.get('dias_prestamo', 7))
+                prestamos, omitidos = prestar_libros(usuario, ids, dias_prestamo, sucursal_id=sucursal_del_usuario(request.user))
+            except (ValueError, OperacionMasivaError) as e:
+                messages.error(request, f'❌ No se registró ningún préstamo: {e}')
+                return redirect('mesa_circulacion')
+            
+            messages.success(request, f'✅ {len(prestamos)} préstamo(s) registrado(s) para {usuario.username}.')
+            if omitidos:
+                messages.warning(request, f'⚠️ Libros no prestados (no disponibles): {", ".join(omitidos)}')
+        
+        elif operacion == 'devolucion':
+            devueltos, multa_total, omitidos = devolver_libros(usuario, ids, sucursal_id=sucursal_del_usuario(request.user))
+            
+            messages.success(request, f'✅ {devueltos} devolución(es) registrada(s) para {usuario.username}.')
+            if multa_total > 0:
+                messages.warning(request, f'⚠️ Multa total por atrasos: ${multa_total}')
+            if omitidos:
+                messages.warning(request, f'⚠️ IDs sin préstamo activo de este usuario en tu sucursal: {", ".join(str(i) for i in omitidos)}')
+        
+        else:
+            messages.error(request, '❌ Operación no válida.')
+        
+        return redirect('mesa_circulacion')
+    
+    return render(request, 'mesa_circulacion.html')
@@ -0,0 +1,20 @@
+from django.contrib import admin
+from .models import Tarea, TareaPeriodica
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    # Campos a mostrar en la lista
+    list_display = ('nombre', 'estado', 'intentos', 'max_intentos', 'ejecutar_despues', 'fecha_actualizacion')
+    # Filtros laterales
+    list_filter = ('estado', 'nombre')
+    # Barra de búsqueda
+    search_fields = ('nombre',)
+    # Campos de solo lectura
+    readonly_fields = ('fecha_creacion', 'fecha_actualizacion', 'ultimo_error')
+    # Ordenar por fecha más reciente
+    ordering = ('-fecha_creacion',)
+
+@admin.register(TareaPeriodica)
+class TareaPeriodicaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'intervalo_segundos', 'proxima_ejecucion', 'activa')
+    list_editable = ('activa',)
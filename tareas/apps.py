@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class TareasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tareas'
+
+    def ready(self):
+        # Importar el módulo tareas.py de cada app para registrar sus tareas
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tareas')
@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand
+from tareas.worker import crear_executor, liberar_huerfanas, procesar_lote, sincronizar_periodicas
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta el worker de tareas en segundo plano (cola en la base de datos, sin broker externo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=4,
+                            help='Cantidad de hilos del pool (por defecto 4)')
+        parser.add_argument('--intervalo', type=float, default=5,
+                            help='Segundos de espera cuando la cola está vacía (por defecto 5)')
+        parser.add_argument('--lote', type=int, default=20,
+                            help='Máximo de tareas reclamadas por ciclo (por defecto 20)')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa la cola una sola vez y termina')
+
+    def handle(self, *args, **options):
+        sincronizar_periodicas()
+        liberadas = liberar_huerfanas()
+        if liberadas:
+            self.stdout.write(f'{liberadas} tarea(s) huérfana(s) devueltas a la cola')
+
+        self.stdout.write(self.style.SUCCESS(f"Worker iniciado con {options['hilos']} hilo(s)"))
+
+        with crear_executor(options['hilos']) as executor:
+            try:
+                while True:
+                    ejecutadas = procesar_lote(executor, options['lote'])
+                    if ejecutadas:
+                        self.stdout.write(f'{ejecutadas} tarea(s) ejecutada(s)')
+                    if options['una_vez']:
+                        # Seguir mientras quede trabajo disponible
+                        if not ejecutadas:
+                            break
+                        continue
+                    if not ejecutadas:
+                        time.sleep(options['intervalo'])
+            except KeyboardInterrupt:
+                self.stdout.write('Worker detenido')
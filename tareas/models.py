@@ -0,0 +1,57 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tarea(models.Model):
+    """
+    Cola de trabajos en segundo plano guardada en la base de datos
+    Cada fila es una ejecución pendiente (o ya procesada) de una tarea registrada
+    """
+    PENDIENTE = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_PROCESO, 'En proceso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=3)
+    ejecutar_despues = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.get_estado_display()})"
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        indexes = [
+            # El worker busca siempre: estado pendiente y fecha de ejecución ya cumplida
+            models.Index(fields=['estado', 'ejecutar_despues'], name='tarea_estado_fecha_idx'),
+        ]
+
+
+class TareaPeriodica(models.Model):
+    """
+    Programación de una tarea que debe encolarse cada cierto intervalo
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    intervalo_segundos = models.PositiveIntegerField()
+    proxima_ejecucion = models.DateTimeField(default=timezone.now)
+    activa = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.nombre} (cada {self.intervalo_segundos} s)"
+
+    class Meta:
+        verbose_name = "Tarea Periódica"
+        verbose_name_plural = "Tareas Periódicas"
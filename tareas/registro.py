@@ -0,0 +1,43 @@
+from datetime import timedelta
+from django.utils import timezone
+from .models import Tarea
+
+# Tareas registradas: nombre -> (función, opciones)
+TAREAS = {}
+
+
+def tarea(nombre=None, max_intentos=3, cada=None):
+    """
+    Decorador para registrar una función como tarea en segundo plano
+    - nombre: identificador de la tarea (por defecto 'modulo.funcion')
+    - max_intentos: reintentos antes de marcarla como fallida
+    - cada: timedelta opcional para ejecutarla periódicamente
+    """
+    def decorador(funcion):
+        nombre_tarea = nombre or f"{funcion.__module__}.{funcion.__name__}"
+        TAREAS[nombre_tarea] = {
+            'funcion': funcion,
+            'max_intentos': max_intentos,
+            'cada': cada,
+        }
+        funcion.nombre_tarea = nombre_tarea
+        funcion.encolar = lambda retraso=0, **argumentos: encolar(nombre_tarea, retraso=retraso, **argumentos)
+        return funcion
+    return decorador
+
+
+def encolar(nombre, retraso=0, **argumentos):
+    """
+    Agrega una ejecución de la tarea a la cola
+    retraso: segundos a esperar antes de que el worker la tome
+    Los argumentos deben ser serializables a JSON
+    """
+    if nombre not in TAREAS:
+        raise KeyError(f"La tarea '{nombre}' no está registrada")
+
+    return Tarea.objects.create(
+        nombre=nombre,
+        argumentos=argumentos,
+        max_intentos=TAREAS[nombre]['max_intentos'],
+        ejecutar_despues=timezone.now() + timedelta(seconds=retraso),
+    )
@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import Tarea
+from .registro import tarea
+
+
+@tarea(cada=timedelta(days=1))
+def purgar_tareas():
+    """
+    Archiva la cola: elimina las tareas completadas más antiguas que TAREAS_DIAS_RETENCION
+    """
+    limite = timezone.now() - timedelta(days=getattr(settings, 'TAREAS_DIAS_RETENCION', 7))
+    eliminadas, _ = Tarea.objects.filter(
+        estado=Tarea.COMPLETADA,
+        fecha_actualizacion__lt=limite
+    ).delete()
+    return eliminadas
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .models import Tarea, TareaPeriodica
+from .registro import encolar, tarea
+from .worker import calcular_espera, ejecutar_tarea, programar_periodicas, reclamar_tareas
+
+EJECUCIONES = []
+
+
+@tarea(nombre='pruebas.anotar', cada=timedelta(minutes=10))
+def anotar(valor=None):
+    EJECUCIONES.append(valor)
+
+
+@tarea(nombre='pruebas.fallar', max_intentos=2)
+def fallar():
+    raise RuntimeError('falla de prueba')
+
+
+# close_old_connections() cerraría la conexión de la transacción de cada test
+@mock.patch('tareas.worker.close_old_connections', mock.Mock())
+@override_settings(TAREAS_BACKOFF_BASE=30, TAREAS_BACKOFF_MAXIMO=3600)
+class WorkerTests(TestCase):
+    """
+    - Reclamo, ejecución, reintentos y programación periódica de la cola (worker.py)
+    """
+
+    def setUp(self):
+        EJECUCIONES.clear()
+
+    def test_reclamo_sin_repetir_tareas(self):
+        ids = {encolar('pruebas.anotar', valor=i).id for i in range(4)}
+        primero = reclamar_tareas(3)
+        segundo = reclamar_tareas(3)
+        self.assertEqual(len(primero), 3)
+        self.assertEqual(set(primero) | set(segundo), ids)
+        self.assertEqual(reclamar_tareas(3), [])
+        self.assertEqual(Tarea.objects.filter(estado=Tarea.EN_PROCESO).count(), 4)
+
+    def test_otro_worker_reclama_la_misma_tarea(self):
+        disputada = encolar('pruebas.anotar')
+        libre = encolar('pruebas.anotar', retraso=-1)
+
+        # Otro worker la toma entre la lectura de candidatas y el update condicional
+        def otro_worker(execute, sql, params, many, context):
+            if sql.startswith('UPDATE') and not otro_worker.hecho:
+                otro_worker.hecho = True
+                Tarea.objects.filter(id=disputada.id).update(estado=Tarea.EN_PROCESO)
+            return execute(sql, params, many, context)
+        otro_worker.hecho = False
+
+        with connection.execute_wrapper(otro_worker):
+            reclamadas = reclamar_tareas(10)
+        # La más antigua (libre) se intenta primero: el otro worker gana la segunda
+        self.assertEqual(reclamadas, [libre.id])
+
+    def test_ejecucion_exitosa(self):
+        pendiente = encolar('pruebas.anotar', valor='hola')
+        self.assertEqual(ejecutar_tarea(pendiente.id), Tarea.COMPLETADA)
+        self.assertEqual(EJECUCIONES, ['hola'])
+        pendiente.refresh_from_db()
+        self.assertEqual((pendiente.intentos, pendiente.ultimo_error), (1, ''))
+
+    def test_reintento_con_backoff(self):
+        self.assertEqual([calcular_espera(i) for i in (1, 2, 3, 10)], [30, 60, 120, 3600])
+
+        fallida = encolar('pruebas.fallar')
+        antes = timezone.now()
+        self.assertEqual(ejecutar_tarea(fallida.id), Tarea.PENDIENTE)
+        fallida.refresh_from_db()
+        self.assertEqual(fallida.intentos, 1)
+        self.assertIn('falla de prueba', fallida.ultimo_error)
+        self.assertGreaterEqual(fallida.ejecutar_despues, antes + timedelta(seconds=30))
+        self.assertLess(fallida.ejecutar_despues, antes + timedelta(seconds=60))
+        # El backoff la deja fuera de la cola hasta que se cumpla la espera
+        self.assertEqual(reclamar_tareas(10), [])
+
+    def test_fallida_al_agotar_los_intentos(self):
+        fallida = encolar('pruebas.fallar')
+        ejecutar_tarea(fallida.id)
+        self.assertEqual(ejecutar_tarea(fallida.id), Tarea.FALLIDA)
+        fallida.refresh_from_db()
+        self.assertEqual((fallida.estado, fallida.intentos, fallida.max_intentos), (Tarea.FALLIDA, 2, 2))
+
+    def test_tarea_no_registrada(self):
+        huerfana = Tarea.objects.create(nombre='pruebas.inexistente', max_intentos=1)
+        self.assertEqual(ejecutar_tarea(huerfana.id), Tarea.FALLIDA)
+
+    def test_reprogramacion_periodica(self):
+        ahora = timezone.now()
+        periodica = TareaPeriodica.objects.create(
+            nombre='pruebas.anotar', intervalo_segundos=600, proxima_ejecucion=ahora - timedelta(seconds=5)
+        )
+        # Las demás periódicas (de las apps) no vencen durante el test
+        TareaPeriodica.objects.exclude(id=periodica.id).update(proxima_ejecucion=ahora + timedelta(days=1))
+
+        self.assertEqual(programar_periodicas(), 1)
+        self.assertEqual(programar_periodicas(), 0)
+        periodica.refresh_from_db()
+        self.assertGreaterEqual(periodica.proxima_ejecucion, ahora + timedelta(seconds=600))
+        self.assertEqual(list(Tarea.objects.values_list('nombre', flat=True)), ['pruebas.anotar'])
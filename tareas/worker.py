@@ -0,0 +1,142 @@
+import logging
+import traceback
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import Tarea, TareaPeriodica
+from .registro import TAREAS, encolar
+
+logger = logging.getLogger(__name__)
+
+
+def calcular_espera(intentos):
+    """
+    Backoff exponencial: base * 2^(intentos-1), limitado por un máximo
+    """
+    base = getattr(settings, 'TAREAS_BACKOFF_BASE', 30)
+    maximo = getattr(settings, 'TAREAS_BACKOFF_MAXIMO', 3600)
+    return min(base * 2 ** max(intentos - 1, 0), maximo)
+
+
+def sincronizar_periodicas():
+    """
+    Crea (o actualiza) una TareaPeriodica por cada tarea registrada con 'cada'
+    """
+    for nombre, opciones in TAREAS.items():
+        if opciones['cada'] is None:
+            continue
+        TareaPeriodica.objects.update_or_create(
+            nombre=nombre,
+            defaults={'intervalo_segundos': int(opciones['cada'].total_seconds())},
+        )
+
+
+def programar_periodicas():
+    """
+    Encola las tareas periódicas cuya próxima ejecución ya se cumplió
+    El avance de proxima_ejecucion es un update condicional, así dos workers
+    no encolan la misma ejecución
+    """
+    ahora = timezone.now()
+    encoladas = 0
+    vencidas = TareaPeriodica.objects.filter(activa=True, proxima_ejecucion__lte=ahora)
+
+    for periodica in vencidas:
+        if periodica.nombre not in TAREAS:
+            continue
+        siguiente = ahora + timedelta(seconds=periodica.intervalo_segundos)
+        with transaction.atomic():
+            tomada = TareaPeriodica.objects.filter(
+                id=periodica.id,
+                proxima_ejecucion=periodica.proxima_ejecucion
+            ).update(proxima_ejecucion=siguiente)
+            if tomada:
+                encolar(periodica.nombre)
+                encoladas += 1
+    return encoladas
+
+
+def liberar_huerfanas():
+    """
+    Devuelve a la cola las tareas que quedaron 'en proceso' por un worker caído
+    Se consideran huérfanas si no se actualizan hace más de TAREAS_TIEMPO_MAXIMO segundos
+    """
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'TAREAS_TIEMPO_MAXIMO', 1800))
+    return Tarea.objects.filter(
+        estado=Tarea.EN_PROCESO,
+        fecha_actualizacion__lt=limite
+    ).update(estado=Tarea.PENDIENTE, fecha_actualizacion=timezone.now())
+
+
+def reclamar_tareas(limite):
+    """
+    Toma hasta 'limite' tareas pendientes y las marca como en proceso
+    SQLite no soporta SELECT ... FOR UPDATE SKIP LOCKED, por eso cada tarea
+    se reclama con un update condicional sobre su estado
+    """
+    candidatas = Tarea.objects.filter(
+        estado=Tarea.PENDIENTE,
+        ejecutar_despues__lte=timezone.now()
+    ).order_by('ejecutar_despues').values_list('id', flat=True)[:limite]
+
+    reclamadas = []
+    for tarea_id in candidatas:
+        tomada = Tarea.objects.filter(id=tarea_id, estado=Tarea.PENDIENTE).update(
+            estado=Tarea.EN_PROCESO,
+            fecha_actualizacion=timezone.now()
+        )
+        if tomada:
+            reclamadas.append(tarea_id)
+    return reclamadas
+
+
+def ejecutar_tarea(tarea_id):
+    """
+    Ejecuta una tarea ya reclamada y registra el resultado
+    - Éxito: estado completada
+    - Error: se reprograma con backoff, o queda fallida al agotar los intentos
+    """
+    close_old_connections()
+    try:
+        tarea = Tarea.objects.get(id=tarea_id)
+        tarea.intentos += 1
+        registrada = TAREAS.get(tarea.nombre)
+
+        try:
+            if registrada is None:
+                raise KeyError(f"La tarea '{tarea.nombre}' no está registrada")
+            registrada['funcion'](**tarea.argumentos)
+        except Exception:
+            tarea.ultimo_error = traceback.format_exc()
+            if tarea.intentos < tarea.max_intentos:
+                tarea.estado = Tarea.PENDIENTE
+                tarea.ejecutar_despues = timezone.now() + timedelta(seconds=calcular_espera(tarea.intentos))
+            else:
+                tarea.estado = Tarea.FALLIDA
+            logger.warning("Tarea %s (%s) falló en el intento %s", tarea.id, tarea.nombre, tarea.intentos)
+        else:
+            tarea.estado = Tarea.COMPLETADA
+            tarea.ultimo_error = ''
+
+        tarea.save()
+        return tarea.estado
+    finally:
+        close_old_connections()
+
+
+def procesar_lote(executor, limite):
+    """
+    Un ciclo del worker: programa las periódicas, reclama un lote y lo ejecuta en el pool
+    Retorna la cantidad de tareas ejecutadas
+    """
+    programar_periodicas()
+    reclamadas = reclamar_tareas(limite)
+    # list() espera a que terminen todas las tareas del lote
+    list(executor.map(ejecutar_tarea, reclamadas))
+    return len(reclamadas)
+
+
+def crear_executor(hilos):
+    return ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='tareas')
@@ -0,0 +1,56 @@
+"""
+Limitador de intentos de inicio de sesión
+- Cuenta los intentos fallidos por nombre de usuario y por IP en el caché de Django
+- Si se supera el límite, el login se rechaza ANTES de autenticar, sin calcular el hash
+  de la contraseña (lo más costoso de cada intento)
+- Ventana fija: el contador expira LOGIN_VENTANA segundos después del primer fallo
+Con varios procesos el caché debe ser compartido (Redis o Memcached) para que el límite sea global
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _clave(tipo, valor):
+    return f'login-fallos:{tipo}:{valor}'
+
+
+def _claves(username, ip):
+    return {
+        _clave('usuario', (username or '').strip().lower()): settings.LOGIN_MAXIMO_FALLOS_USUARIO,
+        _clave('ip', ip or 'desconocida'): settings.LOGIN_MAXIMO_FALLOS_IP,
+    }
+
+
+def obtener_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def acceso_bloqueado(username, ip):
+    """
+    Retorna True si el usuario o la IP superaron el máximo de fallos en la ventana actual
+    Una sola lectura al caché (get_many) para ambos contadores
+    """
+    limites = _claves(username, ip)
+    fallos = cache.get_many(limites.keys())
+    return any(fallos.get(clave, 0) >= limite for clave, limite in limites.items())
+
+
+def registrar_fallo(username, ip):
+    """
+    Suma un fallo a los contadores del usuario y de la IP
+    add() crea el contador con su expiración solo si no existía; incr() es atómico
+    """
+    for clave in _claves(username, ip):
+        if not cache.add(clave, 1, settings.LOGIN_VENTANA):
+            try:
+                cache.incr(clave)
+            except ValueError:
+                # El contador expiró entre add() e incr()
+                cache.add(clave, 1, settings.LOGIN_VENTANA)
+
+
+def limpiar_fallos(username):
+    """
+    Un login exitoso reinicia el contador del usuario (el de la IP se mantiene)
+    """
+    cache.delete(_clave('usuario', (username or '').strip().lower()))
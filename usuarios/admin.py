@@ -9,7 +9,7 @@ class PerfilUsuarioInline(admin.StackedInline):
     can_delete = False
     verbose_name_plural = 'Perfil'
     # Campos que se mostrarán al crear/editar usuario
-    fields = ('rut', 'direccion', 'telefono', 'rol')
+    fields = ('rut', 'direccion', 'telefono', 'rol', 'sucursal')
 
 # Extender el admin de User para incluir el perfil
 class UserAdmin(BaseUserAdmin):
@@ -40,8 +40,8 @@ admin.site.register(User, UserAdmin)
 # Registro simple del modelo PerfilUsuario (por si se quiere acceder directamente)
 @admin.register(PerfilUsuario)
 class PerfilUsuarioAdmin(admin.ModelAdmin):
-    list_display = ('usuario', 'rut', 'telefono', 'rol')
-    list_filter = ('rol',)
+    list_display = ('usuario', 'rut', 'telefono', 'rol', 'sucursal')
+    list_filter = ('rol', 'sucursal')
     search_fields = ('usuario__username', 'rut', 'usuario__first_name', 'usuario__last_name')
     # Campos de solo lectura
     readonly_fields = ('usuario',)
\ No newline at end of file
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2ConfigurablePasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 con la cantidad de iteraciones tomada de PASSWORD_ITERACIONES
+    Conserva el nombre de algoritmo 'pbkdf2_sha256', así los hashes existentes siguen
+    siendo válidos; Django los recalcula con el nuevo costo en el siguiente login exitoso
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_ITERACIONES', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0006_sucursales'),
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='perfiles', to='sgb.sucursal'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def asignar_sucursal_central(apps, schema_editor):
+    """
+    Asigna los perfiles existentes a la sucursal 'Casa Central' (si existe)
+    Los administradores quedan sin sucursal: ven todas las sucursales
+    """
+    Sucursal = apps.get_model('sgb', 'Sucursal')
+    PerfilUsuario = apps.get_model('usuarios', 'PerfilUsuario')
+
+    central = Sucursal.objects.filter(codigo='central').first()
+    if central is not None:
+        PerfilUsuario.objects.filter(sucursal__isnull=True).exclude(rol='administrador').update(sucursal=central)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0007_sucursal_central'),
+        ('usuarios', '0002_perfilusuario_sucursal'),
+    ]
+
+    operations = [
+        migrations.RunPython(asignar_sucursal_central, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgb', '0013_resumen_vencidos_al'),
+        ('usuarios', '0003_perfil_sucursal_central'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='perfilusuario',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='perfiles', to='sgb.sucursal'),
+        ),
+    ]
@@ -14,6 +14,8 @@ class PerfilUsuario(models.Model):
     direccion = models.CharField(max_length=200)
     telefono = models.CharField(max_length=15)
     rol = models.CharField(max_length=20, choices=ROLES, default='lector')
+    # Sin sucursal se ven todas: borrar una sucursal no debe dejar a sus usuarios sin ella
+    sucursal = models.ForeignKey('sgb.Sucursal', on_delete=models.PROTECT, null=True, blank=True, related_name='perfiles')
     
     def __str__(self):
         return f"{self.usuario.get_full_name()} - {self.get_rol_display()}"
@@ -1,3 +1,115 @@
-from django.test import TestCase
+import os
+from unittest import mock, skipIf
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import ProtectedError
+from django.test import TestCase, override_settings
+from sgb.models import Sucursal
+from .hashers import PBKDF2ConfigurablePasswordHasher
+from .models import PerfilUsuario
 
-# Create your tests here.
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RegistroTests(TestCase):
+    """
+    - Registro de lectores (registro_view)
+    """
+
+    def registrar(self, username='lector', rut='11111111-1'):
+        return self.client.post('/registro/', {
+            'username': username, 'password': 'clave-segura-123', 'password2': 'clave-segura-123',
+            'first_name': 'Ana', 'last_name': 'Pérez', 'email': 'ana@example.com',
+            'rut': rut, 'direccion': 'Calle 1', 'telefono': '123',
+        })
+
+    def test_lector_nuevo_queda_en_la_sucursal_central(self):
+        central = Sucursal.objects.create(nombre='Casa Central', codigo='central')
+        Sucursal.objects.create(nombre='Norte', codigo='norte')
+        self.assertRedirects(self.registrar(), '/login/', fetch_redirect_response=False)
+        perfil = PerfilUsuario.objects.get(usuario__username='lector')
+        self.assertEqual((perfil.rol, perfil.sucursal), ('lector', central))
+
+    def test_sin_sucursal_central(self):
+        self.registrar()
+        self.assertIsNone(PerfilUsuario.objects.get(usuario__username='lector').sucursal)
+
+    def test_no_se_borra_una_sucursal_con_usuarios(self):
+        central = Sucursal.objects.create(nombre='Casa Central', codigo='central')
+        self.registrar()
+        with self.assertRaises(ProtectedError):
+            central.delete()
+        self.assertEqual(PerfilUsuario.objects.get(usuario__username='lector').sucursal, central)
+
+    def test_rut_duplicado(self):
+        self.registrar()
+        self.registrar(username='otro')
+        self.assertFalse(PerfilUsuario.objects.filter(usuario__username='otro').exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LimiteIntentosTests(TestCase):
+    """
+    - Limitador de intentos de login (acceso.py) y respuesta 429 antes de autenticar
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        User.objects.create_user('lector', password='clave-segura-123')
+
+    def entrar(self, password, username='lector', ip='10.0.0.1'):
+        return self.client.post('/login/', {'username': username, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_bloqueo_tras_cinco_fallos_incluso_con_la_clave_correcta(self):
+        for _ in range(settings.LOGIN_MAXIMO_FALLOS_USUARIO):
+            self.assertEqual(self.entrar('incorrecta').status_code, 200)
+
+        with mock.patch('usuarios.views.authenticate') as autenticar:
+            respuesta = self.entrar('clave-segura-123')
+        self.assertEqual(respuesta.status_code, 429)
+        autenticar.assert_not_called()
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        # Desde otra IP el usuario sigue bloqueado
+        self.assertEqual(self.entrar('clave-segura-123', ip='10.0.0.2').status_code, 429)
+
+    def test_login_exitoso_reinicia_el_contador(self):
+        for _ in range(settings.LOGIN_MAXIMO_FALLOS_USUARIO - 1):
+            self.entrar('incorrecta')
+        self.assertRedirects(self.entrar('clave-segura-123'), '/dashboard/', fetch_redirect_response=False)
+        self.client.logout()
+        self.assertEqual(self.entrar('incorrecta').status_code, 200)
+        self.assertEqual(self.entrar('incorrecta').status_code, 200)
+
+    @override_settings(LOGIN_MAXIMO_FALLOS_IP=3)
+    def test_bloqueo_por_ip(self):
+        for username in ('a', 'b', 'c'):
+            self.entrar('x', username=username)
+        self.assertEqual(self.entrar('clave-segura-123').status_code, 429)
+        self.assertRedirects(
+            self.entrar('clave-segura-123', ip='10.0.0.2'), '/dashboard/', fetch_redirect_response=False
+        )
+
+
+class HasherConfigurableTests(TestCase):
+    """
+    - Iteraciones de PBKDF2 según PASSWORD_ITERACIONES (hashers.py)
+    """
+
+    @skipIf('SGB_PASSWORD_ITERACIONES' in os.environ, 'Iteraciones fijadas por variable de entorno')
+    def test_un_millon_de_iteraciones_por_defecto(self):
+        self.assertEqual(settings.PASSWORD_ITERACIONES, 1_000_000)
+        self.assertEqual(PBKDF2ConfigurablePasswordHasher().iterations, 1_000_000)
+
+    @override_settings(PASSWORD_HASHERS=['usuarios.hashers.PBKDF2ConfigurablePasswordHasher'], PASSWORD_ITERACIONES=1000)
+    def test_se_recalcula_el_hash_al_cambiar_las_iteraciones(self):
+        cache.clear()
+        usuario = User.objects.create_user('lector', password='clave-segura-123')
+        self.assertTrue(usuario.password.startswith('pbkdf2_sha256$1000$'))
+
+        with self.settings(PASSWORD_ITERACIONES=2000):
+            self.client.post('/login/', {'username': 'lector', 'password': 'clave-segura-123'})
+        usuario.refresh_from_db()
+        self.assertTrue(usuario.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(usuario.check_password('clave-segura-123'))
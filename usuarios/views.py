@@ -2,26 +2,56 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from sgb.models import Sucursal
+from .acceso import acceso_bloqueado, limpiar_fallos, obtener_ip, registrar_fallo
 from .models import PerfilUsuario
 
+# Sucursal de los lectores que se registran por su cuenta
+SUCURSAL_CENTRAL = 'central'
+
 def login_view(request):
     """Vista de Login"""
     if request.method == "POST":
         username = request.POST.get("username")
         password = request.POST.get("password")
+        ip = obtener_ip(request)
+
+        # Se rechaza antes de authenticate() para no calcular el hash de la contraseña
+        if acceso_bloqueado(username, ip):
+            messages.error(request, "⚠️ Demasiados intentos fallidos. Intenta nuevamente en unos minutos.")
+            return render(request, "login.html", status=429)
 
         user = authenticate(request, username=username, password=password)
 
         if user is not None:
+            limpiar_fallos(username)
             login(request, user)
             return redirect("dashboard")
         else:
+            registrar_fallo(username, ip)
             messages.error(request, "❌ Credenciales inválidas")
             return render(request, "login.html")
 
     return render(request, "login.html")
 
 
+def _buscar_duplicado(username, rut):
+    """
+    Busca en UNA consulta si el nombre de usuario o el RUT ya existen
+    Retorna el mensaje de error correspondiente, o None si ambos están libres
+    """
+    existentes = list(
+        User.objects.filter(Q(username=username) | Q(perfil__rut=rut)).values_list('username', 'perfil__rut')[:2]
+    )
+    if any(existente_username == username for existente_username, _ in existentes):
+        return "❌ El nombre de usuario ya existe"
+    if any(existente_rut == rut for _, existente_rut in existentes):
+        return "❌ El RUT ya está registrado"
+    return None
+
+
 def registro_view(request):
     """Vista de Registro de Nuevos Usuarios (Lectores)"""
     if request.method == "POST":
@@ -43,35 +73,41 @@ def registro_view(request):
             messages.error(request, "❌ Las contraseñas no coinciden")
             return render(request, "registro.html")
         
-        if User.objects.filter(username=username).exists():
-            messages.error(request, "❌ El nombre de usuario ya existe")
+        # Una sola consulta para ambos campos únicos (antes de calcular el hash)
+        duplicado = _buscar_duplicado(username, rut)
+        if duplicado:
+            messages.error(request, duplicado)
             return render(request, "registro.html")
         
-        if PerfilUsuario.objects.filter(rut=rut).exists():
-            messages.error(request, "❌ El RUT ya está registrado")
-            return render(request, "registro.html")
-        
-        # Crear usuario
+        # Crear usuario y perfil en una transacción: si otro registro se adelanta,
+        # las restricciones únicas lo detectan y no queda un usuario sin perfil
         try:
-            user = User.objects.create_user(
-                username=username,
-                password=password,
-                first_name=first_name,
-                last_name=last_name,
-                email=email
-            )
-            
-            # Crear perfil con rol "lector" por defecto
-            PerfilUsuario.objects.create(
-                usuario=user,
-                rut=rut,
-                direccion=direccion,
-                telefono=telefono,
-                rol='lector'
-            )
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=username,
+                    password=password,
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=email
+                )
+                
+                # Crear perfil con rol "lector" por defecto, en la sucursal central
+                # (un lector sin sucursal vería el catálogo de todas las sucursales)
+                PerfilUsuario.objects.create(
+                    usuario=user,
+                    rut=rut,
+                    direccion=direccion,
+                    telefono=telefono,
+                    rol='lector',
+                    sucursal=Sucursal.objects.filter(codigo=SUCURSAL_CENTRAL).first()
+                )
             
             messages.success(request, "✅ Cuenta creada exitosamente. Ya puedes iniciar sesión.")
             return redirect("login")
+        
+        except IntegrityError:
+            messages.error(request, _buscar_duplicado(username, rut) or "❌ El usuario o el RUT ya están registrados")
+            return render(request, "registro.html")
             
         except Exception as e:
             messages.error(request, f"❌ Error al crear la cuenta: {str(e)}")